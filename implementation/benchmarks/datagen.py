@@ -0,0 +1,159 @@
+# Reproducible synthetic data for benchmarks and load tests
+# Generates N VPPs, M sites with batteries and K events spread over a date
+# range, with a configurable share of invalid rows. The same seed always
+# produces the same files.
+#   python -m benchmarks.datagen --out data --vpps 5 --sites 10000 --events 1000000
+import argparse
+import csv
+import os
+import random
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import List, Tuple
+
+MANUFACTURERS = ("Tesla", "Sonnen", "LG", "BYD", "Enphase")
+# an invalid row is one of these, in equal proportions
+INVALID_KINDS = ("unknown_nmi", "invalid_event_type", "invalid_date", "invalid_number")
+
+
+@dataclass
+class DatasetSpec:
+    vpps: int = 2
+    sites: int = 100
+    events: int = 10000
+    start: date = date(2025, 1, 1)
+    days: int = 365
+    invalid_ratio: float = 0.01
+    batteries_per_site: Tuple[int, int] = (1, 3)
+    seed: int = 42
+
+
+@dataclass
+class Dataset:
+    spec: DatasetSpec
+    # (name, revenue_percentage, daily_fee_aud)
+    vpps: List[Tuple[str, float, float]] = field(default_factory=list)
+    # (vpp_name, nmi, address)
+    sites: List[Tuple[str, str, str]] = field(default_factory=list)
+    # (site_nmi, manufacturer, serial, capacity_kwh)
+    batteries: List[Tuple[str, str, str, float]] = field(default_factory=list)
+
+    def populate(self, utils):
+        """Create the dataset's VPPs, sites and batteries on a Utils implementation."""
+        for name, revenue_percentage, daily_fee_aud in self.vpps:
+            utils.create_update_vpp(name, revenue_percentage, daily_fee_aud)
+        for vpp_name, nmi, address in self.sites:
+            utils.create_update_site(vpp_name, nmi, address)
+        for site_nmi, manufacturer, serial, capacity_kwh in self.batteries:
+            utils.create_update_battery(site_nmi, manufacturer, serial, capacity_kwh)
+
+
+def generate_entities(spec: DatasetSpec) -> Dataset:
+    rng = random.Random(spec.seed)
+    dataset = Dataset(spec)
+    for v in range(spec.vpps):
+        dataset.vpps.append((f"VPP {v + 1}", float(rng.choice((10, 15, 20, 25))), rng.choice((0.25, 0.3, 0.5))))
+    for s in range(spec.sites):
+        nmi = str(6000000000 + s)
+        dataset.sites.append((dataset.vpps[s % spec.vpps][0], nmi, f"{s + 1} Synthetic St Newcastle NSW 2300"))
+        for b in range(rng.randint(*spec.batteries_per_site)):
+            dataset.batteries.append((nmi, rng.choice(MANUFACTURERS), f"SN{s:08d}{b:02d}", rng.choice((5.0, 9.8, 13.5))))
+    return dataset
+
+
+def write_events(path: str, dataset: Dataset):
+    """Write the spec's events to a CSV; returns the number of invalid rows written."""
+    spec = dataset.spec
+    rng = random.Random(spec.seed + 1)
+    nmis = [nmi for _, nmi, _ in dataset.sites]
+    dates = [(spec.start + timedelta(days=d)).isoformat() for d in range(spec.days)]
+    invalid = 0
+    with open(path, "w", encoding="utf-8", newline="") as fh:
+        fh.write("NMI,DATE,EVENT_TYPE,ENERGY,TARIFF\n")
+        lines = []
+        for _ in range(spec.events):
+            nmi, day = rng.choice(nmis), rng.choice(dates)
+            event_type = "Discharge" if rng.random() < 0.5 else "Charge"
+            energy, tariff = f"{rng.uniform(0.1, 15):.3f}", f"{rng.uniform(-10, 60):.2f}"
+            if rng.random() < spec.invalid_ratio:
+                invalid += 1
+                kind = INVALID_KINDS[invalid % len(INVALID_KINDS)]
+                if kind == "unknown_nmi":
+                    nmi = "0000000000"
+                elif kind == "invalid_event_type":
+                    event_type = "Idle"
+                elif kind == "invalid_date":
+                    day = "2025-02-30"
+                else:
+                    energy = "n/a"
+            lines.append(f"{nmi},{day},{event_type},{energy},{tariff}\n")
+            if len(lines) == 10000:
+                fh.writelines(lines)
+                lines.clear()
+        fh.writelines(lines)
+    return invalid
+
+
+def write_entities(sites_path: str, batteries_path: str, dataset: Dataset):
+    """Write the sites and batteries as CSV files for `Load Sites:` / `Load Batteries:`."""
+    with open(sites_path, "w", encoding="utf-8", newline="") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(("VPP_NAME", "NMI", "ADDRESS"))
+        writer.writerows(dataset.sites)
+    with open(batteries_path, "w", encoding="utf-8", newline="") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(("NMI", "MANUFACTURER", "SERIAL", "CAPACITY_KWH"))
+        writer.writerows(dataset.batteries)
+
+
+def write_commands(path: str, dataset: Dataset, month: str, events_file: str, sites_file: str = None,
+                   batteries_file: str = None):
+    """Write a report_generator command script that builds the dataset and reports on every VPP.
+
+    With `sites_file` and `batteries_file` the entities are bulk loaded from
+    those CSVs, otherwise there is one create command per entity.
+    """
+    with open(path, "w", encoding="utf-8") as fh:
+        for name, revenue_percentage, daily_fee_aud in dataset.vpps:
+            fh.write(f"Create VPP: {name}, {revenue_percentage}, {daily_fee_aud}\n")
+        if sites_file and batteries_file:
+            fh.write(f"Load Sites: {sites_file}\nLoad Batteries: {batteries_file}\n")
+        else:
+            for vpp_name, nmi, address in dataset.sites:
+                fh.write(f"Create Site: {vpp_name}, {nmi}, {address}\n")
+            for site_nmi, manufacturer, serial, capacity_kwh in dataset.batteries:
+                fh.write(f"Create Battery: {site_nmi}, {manufacturer}, {serial}, {capacity_kwh}\n")
+        fh.write(f"Import Events: {events_file}\n")
+        fh.write(f"Create Reports: {month}\n")
+        fh.write("Exit\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic VPP dataset")
+    parser.add_argument("--out", default="synthetic")
+    parser.add_argument("--vpps", type=int, default=2)
+    parser.add_argument("--sites", type=int, default=100)
+    parser.add_argument("--events", type=int, default=10000)
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2025, 1, 1))
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--invalid-ratio", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-bulk", action="store_true", help="one Create command per site and battery")
+    args = parser.parse_args(argv)
+    spec = DatasetSpec(vpps=args.vpps, sites=args.sites, events=args.events, start=args.start, days=args.days,
+                       invalid_ratio=args.invalid_ratio, seed=args.seed)
+    os.makedirs(args.out, exist_ok=True)
+    dataset = generate_entities(spec)
+    events_file = os.path.join(args.out, "events.csv")
+    invalid = write_events(events_file, dataset)
+    if args.no_bulk:
+        write_commands(os.path.join(args.out, "commands.txt"), dataset, args.start.strftime("%Y-%m"), "events.csv")
+    else:
+        write_entities(os.path.join(args.out, "sites.csv"), os.path.join(args.out, "batteries.csv"), dataset)
+        write_commands(os.path.join(args.out, "commands.txt"), dataset, args.start.strftime("%Y-%m"), "events.csv",
+                       "sites.csv", "batteries.csv")
+    print(f"Wrote {spec.events} events ({invalid} invalid) for {spec.sites} sites to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# Benchmark suite for import and reporting
+# Measures, for each scale:
+#   import_rows_per_sec      VPPUtils.import_events on a generated file
+#   report_ms_p50 / _max     create_report latency with the report cache cleared
+#   report_cached_ms_p50     create_report latency served from the report cache
+#   peak_bytes_per_million   tracemalloc peak while importing, per million events
+# and, for one VPP at the scale of the largest ones, create_report latency in
+# one process and sharded over each number of report workers:
+#   sharded_report_ms_p50    by workers, 1 is in process; the pool is started
+#                            before the runs (its start is pool_start_ms)
+#   coordinator_cpu_ms_p50   CPU time of the reporting process alone, the part
+#                            more cores cannot shorten
+# Results are written as JSON, tagged with the git commit, so runs can be
+# compared across commits.
+#   python -m benchmarks.run_benchmarks --scales 100x10000,1000x100000 --output bench_results.json
+#   python -m benchmarks.run_benchmarks --scales "" --shard-scale 300000x300000 --shard-workers 2,4
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import List
+from benchmarks.datagen import DatasetSpec, generate_entities, write_events
+from utils.vpp_utils import VPPUtils
+
+DEFAULT_SCALES = "100x10000,1000x100000"
+DEFAULT_SHARD_SCALE = "300000x300000"
+DEFAULT_SHARD_WORKERS = "2,4"
+
+
+@contextlib.contextmanager
+def _quiet():
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        yield
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def bench_scale(sites: int, events: int, workdir: str, report_runs: int = 5, vpps: int = 2) -> dict:
+    spec = DatasetSpec(vpps=vpps, sites=sites, events=events, days=365, invalid_ratio=0.01)
+    dataset = generate_entities(spec)
+    events_file = os.path.join(workdir, f"events_{sites}_{events}.csv")
+    write_events(events_file, dataset)
+
+    utils = VPPUtils()
+    with _quiet():
+        dataset.populate(utils)
+        started = time.perf_counter()
+        result = utils.import_events(events_file)
+        import_s = time.perf_counter() - started
+
+        vpp_name, month = dataset.vpps[0][0], spec.start.strftime("%Y-%m")
+        latencies = []
+        for _ in range(report_runs):
+            utils.report_cache.clear()
+            started = time.perf_counter()
+            utils.create_report(vpp_name, month)
+            latencies.append(time.perf_counter() - started)
+        cached = []
+        for _ in range(report_runs):
+            started = time.perf_counter()
+            utils.create_report(vpp_name, month)
+            cached.append(time.perf_counter() - started)
+
+        # memory is measured on a separate import, tracemalloc slows everything down
+        fresh = VPPUtils()
+        dataset.populate(fresh)
+        tracemalloc.start()
+        fresh.import_events(events_file)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    os.remove(events_file)
+
+    return {
+        "sites": sites,
+        "events": events,
+        "imported": result.imported,
+        "skipped": result.skipped,
+        "import_seconds": round(import_s, 4),
+        "import_rows_per_sec": round((result.imported + result.skipped) / import_s, 1),
+        "report_ms_p50": round(statistics.median(latencies) * 1000, 3),
+        "report_ms_max": round(max(latencies) * 1000, 3),
+        "report_cached_ms_p50": round(statistics.median(cached) * 1000, 4),
+        "peak_bytes_per_million_events": round(peak / max(result.imported, 1) * 1_000_000),
+    }
+
+
+def bench_sharded_report(sites: int, events: int, workdir: str, workers: List[int], report_runs: int = 3) -> dict:
+    spec = DatasetSpec(vpps=1, sites=sites, events=events, days=28, invalid_ratio=0)
+    dataset = generate_entities(spec)
+    events_file = os.path.join(workdir, f"shard_events_{sites}_{events}.csv")
+    write_events(events_file, dataset)
+
+    utils = VPPUtils()
+    # every report of the VPP is sent to the pool
+    utils.shard_pool.min_sites = 1
+    latencies, coordinator, pool_start = {}, {}, {}
+    try:
+        with _quiet():
+            dataset.populate(utils)
+            utils.import_events(events_file)
+            vpp_name, month = dataset.vpps[0][0], spec.start.strftime("%Y-%m")
+            expected = utils.create_report(vpp_name, month)
+            for n in [1, *workers]:
+                if n > 1:
+                    started = time.perf_counter()
+                    for started_worker in [w.submit(abs, 0) for w in utils.shard_pool.executors(n, sites)]:
+                        started_worker.result()
+                    pool_start[str(n)] = round((time.perf_counter() - started) * 1000, 3)
+                runs, cpu = [], []
+                for _ in range(report_runs):
+                    utils.report_cache.clear()
+                    started, started_cpu = time.perf_counter(), time.process_time()
+                    report = utils.create_report(vpp_name, month, workers=n)
+                    runs.append(time.perf_counter() - started)
+                    cpu.append(time.process_time() - started_cpu)
+                if report != expected:
+                    raise AssertionError(f"sharded report over {n} workers differs from the sequential one")
+                latencies[str(n)] = round(statistics.median(runs) * 1000, 3)
+                coordinator[str(n)] = round(statistics.median(cpu) * 1000, 3)
+    finally:
+        utils.close()
+        os.remove(events_file)
+
+    return {
+        "sites": sites,
+        "events": events,
+        "sharded_report_ms_p50": latencies,
+        "coordinator_cpu_ms_p50": coordinator,
+        "pool_start_ms": pool_start,
+        "speedup": {n: round(latencies["1"] / ms, 2) for n, ms in latencies.items()},
+    }
+
+
+def parse_scales(scales: str) -> List[tuple]:
+    """'100x10000,1000x100000' -> [(100, 10000), (1000, 100000)] as (sites, events)."""
+    return [tuple(int(n) for n in scale.split("x", 1)) for scale in scales.split(",") if scale]
+
+
+def run(scales: str = DEFAULT_SCALES, report_runs: int = 5, shard_scale: str = DEFAULT_SHARD_SCALE,
+        shard_workers: str = DEFAULT_SHARD_WORKERS) -> dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [bench_scale(sites, events, workdir, report_runs) for sites, events in parse_scales(scales)]
+        workers = [int(n) for n in shard_workers.split(",") if n]
+        sharded = [bench_sharded_report(sites, events, workdir, workers) for sites, events in parse_scales(shard_scale)]
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "results": results,
+        "sharded_reports": sharded,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark VPP import and reporting")
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help="comma separated SITESxEVENTS scales")
+    parser.add_argument("--report-runs", type=int, default=5)
+    parser.add_argument("--shard-scale", default=DEFAULT_SHARD_SCALE,
+                        help="SITESxEVENTS of the one VPP whose report is sharded, empty to skip")
+    parser.add_argument("--shard-workers", default=DEFAULT_SHARD_WORKERS, help="comma separated report worker counts")
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args(argv)
+    results = run(args.scales, args.report_runs, args.shard_scale, args.shard_workers)
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(results, fh, indent=2)
+    for row in results["results"] + results["sharded_reports"]:
+        print(json.dumps(row))
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
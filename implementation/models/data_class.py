@@ -1,7 +1,11 @@
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import List
-from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from datetime import date, datetime
+from array import array
+from itertools import compress, repeat
+from operator import and_, mul, not_
+from models.money import VALUE_SCALE, event_value_units, kwh_to_wh
 
 
 class EventType(Enum):
@@ -9,6 +13,13 @@ class EventType(Enum):
     DISCHARGE = "Discharge"
 
 
+# small int codes used by the columnar event store
+EVENT_TYPE_CODES = {EventType.CHARGE: 0, EventType.DISCHARGE: 1}
+EVENT_TYPES_BY_CODE = (EventType.CHARGE, EventType.DISCHARGE)
+EVENT_TYPE_CODES_BY_NAME = {e.value.lower(): code for e, code in EVENT_TYPE_CODES.items()}
+DISCHARGE_CODE = EVENT_TYPE_CODES[EventType.DISCHARGE]
+
+
 @dataclass
 class Event:
     nmi: str
@@ -18,6 +29,188 @@ class Event:
     tariff_cents_per_kwh: float
 
 
+def month_key(year: int, month: int) -> int:
+    """Index of a (year, month) pair; consecutive months have consecutive keys."""
+    return year * 12 + month - 1
+
+
+class EventColumns:
+    """Parallel typed arrays holding a block of events.
+
+    Each event is one slot in every array: the date as its ordinal day number,
+    the event type code, the energy and the tariff. Blocks loaded from a
+    snapshot hold read-only memoryviews instead, copied into arrays on the
+    first write.
+    """
+
+    __slots__ = ("dates", "types", "energies", "tariffs")
+
+    def __init__(self):
+        self.dates = array("i")
+        self.types = array("b")
+        self.energies = array("d")
+        self.tariffs = array("d")
+
+    def __len__(self):
+        return len(self.dates)
+
+    def _own(self):
+        self.dates, self.types = array("i", self.dates), array("b", self.types)
+        self.energies, self.tariffs = array("d", self.energies), array("d", self.tariffs)
+
+    def add_row(self, day: int, type_code: int, energy_kwh: float, tariff_cents_per_kwh: float):
+        if not isinstance(self.dates, array):
+            self._own()
+        self.dates.append(day)
+        self.types.append(type_code)
+        self.energies.append(energy_kwh)
+        self.tariffs.append(tariff_cents_per_kwh)
+
+    def extend(self, other: "EventColumns"):
+        if not isinstance(self.dates, array):
+            self._own()
+        self.dates.extend(other.dates)
+        self.types.extend(other.types)
+        self.energies.extend(other.energies)
+        self.tariffs.extend(other.tariffs)
+
+    def totals(self):
+        """Return (revenue, vpp_cost_only) of the events in the block, in money units.
+
+        Discharge events with a negative value are 100% VPP cost, every other
+        event is revenue contributed by the site. Each value is rounded to the
+        unit as in `event_value_units`, so the sums are exact integers.
+        """
+        values = list(map(round, map(mul, map(mul, self.tariffs, self.energies), repeat(VALUE_SCALE))))
+        is_cost = list(map(and_, map((0).__gt__, values), map(DISCHARGE_CODE.__eq__, self.types)))
+        cost_only = sum(compress(values, is_cost))
+        revenue = sum(compress(values, map(not_, is_cost)))
+        return revenue, cost_only
+
+
+class EventStore:
+    """Columnar storage for the events of a single site, partitioned by month.
+
+    Events of each (year, month) live in their own `EventColumns` block keyed
+    by `month_key`, so a monthly report only touches that month's block. The
+    NMI is the same for every event of the store so it is kept once.
+    `Event` objects are only materialised when the store is indexed or iterated,
+    in month order.
+
+    The (revenue, vpp_cost_only) sums of every month, integer money units (see
+    models/money.py), are kept up to date as events are added, so reports never have to rescan a month. Events must be
+    added through the store (`add_row`, `append`, `extend_month`) for these
+    sums to stay correct. `on_change(nmi, key)` is called whenever the events
+    of month `key` change.
+    """
+
+    def __init__(self, nmi: str = ""):
+        self.nmi = nmi
+        self.months: Dict[int, EventColumns] = {}
+        self.totals: Dict[int, Tuple[int, int]] = {}
+        self.on_change: Optional[Callable[[str, int], None]] = None
+
+    def __len__(self):
+        return sum(len(block) for block in self.months.values())
+
+    def __getitem__(self, i: int) -> Event:
+        if i < 0:
+            i += len(self)
+        for key in sorted(self.months):
+            block = self.months[key]
+            if 0 <= i < len(block):
+                return Event(
+                    nmi=self.nmi,
+                    date=date.fromordinal(block.dates[i]),
+                    event_type=EVENT_TYPES_BY_CODE[block.types[i]],
+                    energy_kwh=block.energies[i],
+                    tariff_cents_per_kwh=block.tariffs[i],
+                )
+            i -= len(block)
+        raise IndexError("event index out of range")
+
+    def __iter__(self) -> Iterator[Event]:
+        for key in sorted(self.months):
+            block = self.months[key]
+            for i in range(len(block)):
+                yield Event(self.nmi, date.fromordinal(block.dates[i]), EVENT_TYPES_BY_CODE[block.types[i]],
+                            block.energies[i], block.tariffs[i])
+
+    def month(self, key: int) -> Optional[EventColumns]:
+        return self.months.get(key)
+
+    def add_row(self, day: int, type_code: int, energy_kwh: float, tariff_cents_per_kwh: float, key: Optional[int] = None):
+        if key is None:
+            d = date.fromordinal(day)
+            key = month_key(d.year, d.month)
+        value = event_value_units(tariff_cents_per_kwh, energy_kwh)
+        block = self.months.get(key)
+        if block is None:
+            block = self.months[key] = EventColumns()
+        block.add_row(day, type_code, energy_kwh, tariff_cents_per_kwh)
+        if value < 0 and type_code == DISCHARGE_CODE:
+            self._add_totals(key, 0, value)
+        else:
+            self._add_totals(key, value, 0)
+
+    def append(self, event: Event):
+        self.add_row(event.date.toordinal(), EVENT_TYPE_CODES[event.event_type],
+                     event.energy_kwh, event.tariff_cents_per_kwh,
+                     key=month_key(event.date.year, event.date.month))
+
+    def extend_month(self, key: int, block: EventColumns):
+        """Append a block of events that all fall in month `key`."""
+        # summed first, so a block that cannot be valued leaves the store as it was
+        revenue, cost_only = block.totals()
+        current = self.months.get(key)
+        if current is None:
+            self.months[key] = block
+        else:
+            current.extend(block)
+        self._add_totals(key, revenue, cost_only)
+
+    def _add_totals(self, key: int, revenue: int, cost_only: int):
+        month_revenue, month_cost_only = self.totals.get(key, (0, 0))
+        self.totals[key] = (month_revenue + revenue, month_cost_only + cost_only)
+        if self.on_change is not None:
+            self.on_change(self.nmi, key)
+
+    def month_totals(self, key: int) -> Tuple[int, int]:
+        """Return (revenue, vpp_cost_only) units for the month `key`, (0, 0) if it has no events."""
+        return self.totals.get(key, (0, 0))
+
+
+@dataclass
+class ImportResult:
+    imported: int = 0
+    skipped: int = 0
+    skipped_by_reason: Dict[str, int] = field(default_factory=dict)
+    elapsed_s: float = field(default=0.0, compare=False)
+
+    @property
+    def rows_per_sec(self) -> float:
+        rows = self.imported + self.skipped
+        return rows / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+    def skip(self, reason: str):
+        self.skipped += 1
+        self.skipped_by_reason[reason] = self.skipped_by_reason.get(reason, 0) + 1
+
+    def merge(self, other: "ImportResult"):
+        self.imported += other.imported
+        self.skipped += other.skipped
+        for reason, count in other.skipped_by_reason.items():
+            self.skipped_by_reason[reason] = self.skipped_by_reason.get(reason, 0) + count
+
+    def as_dict(self) -> dict:
+        return {
+            "imported": self.imported,
+            "skipped": self.skipped,
+            "skipped_by_reason": dict(self.skipped_by_reason),
+            "rows_per_sec": round(self.rows_per_sec, 1),
+        }
+
+
 @dataclass
 class Battery:
     manufacturer: str
@@ -25,18 +218,123 @@ class Battery:
     capacity_kwh: float
 
 
+class BatteryList(list):
+    """A site's batteries; every change re-indexes the site, see `Site`."""
+
+    def __init__(self, site: "Site", batteries=()):
+        super().__init__(batteries)
+        self.site = site
+
+    def _changed(method):
+        def wrapper(self, *args):
+            # apply the change to a copy first, so a bad list or capacity raises before anything changes
+            staged = list(self)
+            method(staged, *args)
+            capacity = Site.capacity_of(staged)
+            out = method(self, *args)
+            self.site._batteries_changed(capacity)
+            return out
+        return wrapper
+
+    append = _changed(list.append)
+    extend = _changed(list.extend)
+    insert = _changed(list.insert)
+    remove = _changed(list.remove)
+    pop = _changed(list.pop)
+    clear = _changed(list.clear)
+    __setitem__ = _changed(list.__setitem__)
+    __delitem__ = _changed(list.__delitem__)
+    __iadd__ = _changed(list.__iadd__)
+    del _changed
+
+
 @dataclass
 class Site:
+    """A site and its batteries.
+
+    Batteries are indexed by serial and the site's total capacity, in whole
+    Wh, is kept up to date whenever the `batteries` list changes; a battery
+    changed in place must go through `update_battery`.
+    `on_capacity_change(nmi, delta_wh)` is called whenever the capacity changes.
+    """
     vpp_name: str
     nmi: str
     address: str
     batteries: List[Battery] = field(default_factory=list)
-    events: List[Event] = field(default_factory=list)
+    events: EventStore = field(default_factory=EventStore)
+
+    def __post_init__(self):
+        self.events.nmi = self.nmi
+        self.on_capacity_change: Optional[Callable[[str, int], None]] = None
+        self.capacity_wh = 0
+        self.batteries = BatteryList(self, self.batteries)
+        self._batteries_changed()
+
+    @staticmethod
+    def capacity_of(batteries: Iterable[Battery]) -> int:
+        return sum(kwh_to_wh(b.capacity_kwh) for b in batteries)
+
+    def _batteries_changed(self, capacity: Optional[int] = None):
+        # a site has a handful of batteries, re-indexing them all is cheap
+        if capacity is None:
+            capacity = self.capacity_of(self.batteries)
+        self._by_serial: Dict[str, Battery] = {b.serial: b for b in self.batteries}
+        delta, self.capacity_wh = capacity - self.capacity_wh, capacity
+        if delta and self.on_capacity_change is not None:
+            self.on_capacity_change(self.nmi, delta)
+
+    @property
+    def capacity_kwh(self) -> float:
+        return self.capacity_wh / 1000
+
+    def battery(self, serial: str) -> Optional[Battery]:
+        return self._by_serial.get(serial)
+
+    def add_battery(self, battery: Battery):
+        self.batteries.append(battery)
+
+    def update_battery(self, serial: str, manufacturer: str, capacity_kwh: float) -> Battery:
+        battery = self._by_serial[serial]
+        # the new capacity is worked out before the battery is touched
+        capacity = self.capacity_wh - kwh_to_wh(battery.capacity_kwh) + kwh_to_wh(capacity_kwh)
+        battery.manufacturer = manufacturer
+        battery.capacity_kwh = capacity_kwh
+        self._batteries_changed(capacity)
+        return battery
+
+    def remove_battery(self, serial: str) -> Battery:
+        battery = self._by_serial[serial]
+        self.batteries.remove(battery)
+        return battery
 
 
 @dataclass
 class VPP:
+    """A VPP and its member sites, keyed by NMI, with their total battery capacity in Wh.
+
+    Membership changes go through `add_site` and `remove_site`; capacity
+    changes of a member site are added with `capacity_changed`.
+    """
     name: str
     revenue_percentage: float
     daily_fee_aud: float
-    sites: List[Site] = field(default_factory=list)
+    sites: Dict[str, Site] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self.capacity_wh = sum(site.capacity_wh for site in self.sites.values())
+
+    @property
+    def capacity_kwh(self) -> float:
+        return self.capacity_wh / 1000
+
+    def add_site(self, site: Site):
+        self.sites[site.nmi] = site
+        self.capacity_wh += site.capacity_wh
+
+    def remove_site(self, nmi: str) -> Site:
+        site = self.sites.pop(nmi)
+        self.capacity_wh -= site.capacity_wh
+        return site
+
+    def capacity_changed(self, delta_wh: int):
+        self.capacity_wh += delta_wh
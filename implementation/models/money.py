@@ -0,0 +1,79 @@
+# Fixed-point money
+# Amounts are integers of 1e-6 AUD ("units") and battery capacities integers
+# of Wh, so sums are exact whatever their order: sequential, sharded,
+# incremental or in SQL. Every place a value is rounded is listed here, and
+# every rounding is half to even:
+#   1. event value      tariff (c/kWh) * energy (kWh) / 100 AUD, to the unit   (event_value_units)
+#   2. settings         daily fee to the unit, revenue percentage to 1/100 %,
+#                       battery capacity to the Wh                             (aud_to_units, percent_to_bp, kwh_to_wh)
+#   3. VPP margin       revenue * percentage, to the unit                      (div_round)
+#   4. site shares      each of the 80% and 20% parts of a site's share, to the unit
+#   5. output           units to cents, and Wh to 1/100 kWh, only when the report is written
+# Daily fees, totals and revenue after fees are sums and differences of the
+# above, so they need no rounding. Values fit in int64 (9.2e12 AUD): event
+# rows are only accepted within MAX_EVENT_ENERGY_KWH and
+# MAX_TARIFF_CENTS_PER_KWH, so one event is worth at most 1e7 AUD, and
+# capacities within MAX_CAPACITY_KWH; every backend rejects the same rows.
+# Intermediate products of the share split are Python ints and never overflow.
+
+import math
+
+UNITS_PER_AUD = 1_000_000
+UNITS_PER_CENT = UNITS_PER_AUD // 100
+WH_PER_KWH = 1000
+BP_PER_PERCENT = 100
+# tariff * energy is in cents, times this scale is in units
+VALUE_SCALE = float(UNITS_PER_CENT)
+# largest accepted magnitudes, see the header; nan and inf are outside them too
+MAX_EVENT_ENERGY_KWH = 10_000
+MAX_TARIFF_CENTS_PER_KWH = 100_000
+MAX_CAPACITY_KWH = 1_000_000
+
+
+def div_round(numerator: int, denominator: int) -> int:
+    """numerator / denominator rounded half to even, for a positive denominator."""
+    q, r = divmod(numerator, denominator)
+    twice = 2 * r
+    if twice > denominator or (twice == denominator and q & 1):
+        q += 1
+    return q
+
+
+def event_value_units(tariff_cents_per_kwh: float, energy_kwh: float) -> int:
+    # keep the operation order in step with EventColumns.totals, which maps the same steps over columns
+    return round(tariff_cents_per_kwh * energy_kwh * VALUE_SCALE)
+
+
+def aud_to_units(aud: float) -> int:
+    return round(aud * UNITS_PER_AUD)
+
+
+def percent_to_bp(percent: float) -> int:
+    """A percentage in 1/100 %, i.e. 12.5 -> 1250."""
+    return round(percent * BP_PER_PERCENT)
+
+
+def kwh_to_wh(kwh: float) -> int:
+    return round(kwh * WH_PER_KWH)
+
+
+def valid_vpp_settings(revenue_percentage: float, daily_fee_aud: float) -> bool:
+    """Settings every report can be computed from: both finite."""
+    return math.isfinite(revenue_percentage) and math.isfinite(daily_fee_aud)
+
+
+def valid_capacity_kwh(kwh: float) -> bool:
+    """A capacity that can be held in whole Wh: finite, not negative and within MAX_CAPACITY_KWH."""
+    return 0 <= kwh <= MAX_CAPACITY_KWH
+
+
+# Below 2**53 the float quotient of an integer by 10**k is never mistaken for a
+# half, so round() of it is the exact half-even division, without div_round's cost.
+def units_to_aud(units: int) -> float:
+    """Units rounded to the cent, as the AUD float written to reports."""
+    return round(units / UNITS_PER_CENT) / 100
+
+
+def wh_to_kwh(wh: int) -> float:
+    """Wh rounded to 1/100 kWh, as written to reports."""
+    return round(wh / (WH_PER_KWH // 100)) / 100
@@ -1,59 +1,213 @@
 
-# Main service: 
-# gets the STDIN as an in put, gets the action and variables, 
+# Main service:
+# gets the STDIN as an in put, gets the action and variables,
 #  for each action calls the relevant method from the utils
+# With --batch FILE the commands of FILE are run without prompts or per-command
+# output, and a summary per command is printed at the end.
 
 from utils.vpp_utils import VPPUtils
+from utils.sqlite_utils import SQLiteVPPUtils
+from utils.metrics import metrics_for
+from utils.pricing_simulator import scenario_grid
+from utils.report_shards import SHARD_MIN_SITES
+from collections import Counter
+import argparse
+import contextlib
+import io
 import json
+import logging
+import re
+import sys
+import time
 
-def main():
-    utils = VPPUtils()
-    report_file = "vpp_report.json"
-    print("Enter commands (one per line). Type 'Exit' to quit:")
+REPORT_FILE = "vpp_report.json"
+SIMULATION_FILE = "vpp_simulation.json"
+# errors listed in a batch summary, the rest are only counted
+MAX_BATCH_ERRORS = 20
+
+
+def report_file_for(vpp_name: str, month_yyyy_mm: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", vpp_name).strip("_")
+    return f"vpp_report_{slug}_{month_yyyy_mm}.json"
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="VPP revenue-sharing report generator")
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory",
+                        help="keep state in memory (default) or in a SQLite database")
+    parser.add_argument("--db", default="vpp.db", help="SQLite database file for --backend sqlite")
+    parser.add_argument("--batch", help="run the commands of this file ('-' for STDIN) without prompts")
+    parser.add_argument("--verbose", action="store_true", help="in batch mode, also print each command's output")
+    parser.add_argument("--metrics", help="write stage timings, counters and report latencies to this file")
+    parser.add_argument("--metrics-format", choices=["json", "prometheus"], default="json")
+    parser.add_argument("--report-workers", type=int,
+                        help=f"worker processes for the reports of VPPs with at least {SHARD_MIN_SITES} sites")
+    parser.add_argument("--log-level", default="WARNING",
+                        help="logging level, DEBUG also logs every skipped event row")
+    return parser.parse_args(argv)
 
+def parse_command(line: str):
+    if ":" not in line:
+        raise ValueError("Invalid command format. Use Action: param1, param2, ...")
+    action, params = line.split(":", 1)
+    return action.strip().lower(), [p.strip() for p in params.split(",")]
+
+def run_command(utils, action: str, params, metrics):
+    """Run one command; errors are raised to the caller."""
+    if action == "create vpp":
+        name, revenue_percentage, daily_fee = params
+        utils.create_update_vpp(name, float(revenue_percentage), float(daily_fee))
+    elif action == "create site":
+        vpp_name, nmi, address = params
+        utils.create_update_site(vpp_name, nmi, address)
+    elif action == "create battery":
+        site_nmi, manufacturer, serial, capacity = params
+        utils.create_update_battery(site_nmi, manufacturer, serial, float(capacity))
+    elif action == "remove battery":
+        site_nmi, serial = params
+        utils.remove_battery(site_nmi, serial)
+    elif action == "load sites":
+        # CSV with VPP_NAME, NMI, ADDRESS columns
+        utils.load_sites(params[0])
+    elif action == "load batteries":
+        # CSV with NMI, MANUFACTURER, SERIAL, CAPACITY_KWH columns
+        utils.load_batteries(params[0])
+    elif action == "import events":
+        # a file, a directory or a glob pattern, optionally followed by the number of worker processes
+        # and/or "resume" to checkpoint the import and pick up where a previous run stopped,
+        # or "follow" to keep importing the rows appended to the files until Ctrl-C
+        file_path, options = params[0], [p.lower() for p in params[1:]]
+        workers = next((int(p) for p in options if p not in ("resume", "follow")), None)
+        utils.import_events(file_path, workers=workers, resume="resume" in options, follow="follow" in options)
+        metrics.flush()
+    elif action == "create report":
+        # a month, YYYY-MM, or a range of months, YYYY-MM..YYYY-MM
+        vpp_name, month_yyyy_mm = params
+        if ".." in month_yyyy_mm:
+            report = utils.create_range_report(vpp_name, *month_yyyy_mm.split("..", 1))
+        else:
+            report = utils.create_report(vpp_name, month_yyyy_mm)
+        print(report)
+        with open(REPORT_FILE, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        metrics.flush()
+    elif action == "export report":
+        # streamed to FILE one site at a time: .json, .ndjson, optionally .gz compressed
+        vpp_name, month_yyyy_mm, file_path = params
+        utils.export_report(vpp_name, month_yyyy_mm, file_path)
+        metrics.flush()
+    elif action == "create reports":
+        # one report file per VPP, all computed in one pass over the sites
+        month_yyyy_mm = params[0]
+        reports = utils.create_reports(month_yyyy_mm)
+        for vpp_name, report in reports.items():
+            vpp_report_file = report_file_for(vpp_name, month_yyyy_mm)
+            with open(vpp_report_file, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"Report for VPP '{vpp_name}' written to {vpp_report_file}")
+        metrics.flush()
+    elif action == "simulate pricing":
+        # what-if totals, nothing is changed: space separated revenue percentages and daily fees,
+        # every combination is a scenario, i.e. Simulate Pricing: VPP1, 2025-09, 15 20, 0.25 0.3
+        vpp_name, month_yyyy_mm, percentages, fees = params
+        scenarios = scenario_grid([float(p) for p in percentages.split()], [float(f) for f in fees.split()])
+        simulation = utils.simulate_pricing(vpp_name, month_yyyy_mm, scenarios)
+        for scenario in simulation["scenarios"]:
+            totals = scenario["totals"]
+            print(f"{scenario['revenue_percentage']:g}%, {scenario['daily_fee_aud']:g} AUD/day: "
+                  f"VPP total revenue={totals['vpp_total_revenue']}, "
+                  f"site revenue after fees={totals['site_total_revenue_after_fees']}, "
+                  f"sites at fee cap={scenario['sites_at_fee_cap']}")
+        with open(SIMULATION_FILE, "w", encoding="utf-8") as f:
+            json.dump(simulation, f, indent=2)
+        metrics.flush()
+    elif action == "save snapshot":
+        utils.save_snapshot(params[0])
+    elif action == "load snapshot":
+        utils.load_snapshot(params[0])
+    else:
+        raise ValueError(f"Unknown action: {action}")
+
+def run_interactive(utils, metrics):
+    print("Enter commands (one per line). Type 'Exit' to quit:")
     while True:
         try:
             line = input("> ").strip()
-            if not line:
-                continue
+        except EOFError:
+            break
+        if not line:
+            continue
+        if line.lower() == "exit":
+            break
+        try:
+            action, params = parse_command(line)
+            if action == "exit":
+                break
+            run_command(utils, action, params, metrics)
+        except Exception as e:
+            print(f"Error processing command: {e}")
+    utils.exit()
+    metrics.flush()
 
+def run_batch(utils, lines, metrics, verbose: bool = False) -> int:
+    """Run every command of `lines` and print a per-command summary; returns the number of failed commands."""
+    ok, failed = Counter(), Counter()
+    errors = []
+    started = time.perf_counter()
+    # per-command output is dropped unless asked for, it is what makes large scripts slow
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with output as captured:
+        for number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
             if line.lower() == "exit":
-                utils.exit()
                 break
+            action = line.split(":", 1)[0].strip().lower()
+            try:
+                action, params = parse_command(line)
+                if action == "exit":
+                    break
+                run_command(utils, action, params, metrics)
+                ok[action] += 1
+            except Exception as e:
+                failed[action] += 1
+                if len(errors) < MAX_BATCH_ERRORS:
+                    errors.append(f"line {number}: {line[:80]}: {e}")
+            if captured is not None:
+                # keep the buffer from growing with the script
+                captured.seek(0)
+                captured.truncate()
 
-            if ":" not in line:
-                print("Invalid command format. Use Action: param1, param2, ...")
-                continue
+    total = sum(ok.values()) + sum(failed.values())
+    print(f"Batch finished: {total} commands in {time.perf_counter() - started:.2f}s")
+    for action in sorted(set(ok) | set(failed)):
+        print(f"  {action}: {ok[action]} ok, {failed[action]} failed")
+    if errors:
+        print(f"Errors ({sum(failed.values())}, first {len(errors)} shown):")
+        for error in errors:
+            print(f"  {error}")
+    utils.exit()
+    metrics.flush()
+    return sum(failed.values())
 
-            action, params = line.split(":", 1)
-            action = action.strip().lower()
-            params = [p.strip() for p in params.split(",")]
-
-            if action == "create vpp":
-                name, revenue_percentage, daily_fee = params
-                utils.create_update_vpp(name, float(revenue_percentage), float(daily_fee))
-            elif action == "create site":
-                vpp_name, nmi, address = params
-                utils.create_update_site(vpp_name, nmi, address)
-            elif action == "create battery":
-                site_nmi, manufacturer, serial, capacity = params
-                utils.create_update_battery(site_nmi, manufacturer, serial, float(capacity))
-            elif action == "import events":
-                file_path = params[0]
-                utils.import_events(file_path)
-            elif action == "create report":
-                vpp_name, month_yyyy_mm = params
-                report = utils.create_report(vpp_name, month_yyyy_mm)
-                print(report)
-                with open(report_file, "w", encoding="utf-8") as f:
-                    json.dump(report, f, indent=2)
-                    
-            elif action == 'exit':
-                utils.exit()
-            else:
-                print(f"Unknown action: {action}")
-        except Exception as e:
-            print(f"Error processing command: {e}")
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(levelname)s %(name)s: %(message)s")
+    metrics = metrics_for(args.metrics, args.metrics_format)
+    if args.backend == "sqlite":
+        utils = SQLiteVPPUtils(args.db, metrics=metrics, report_workers=args.report_workers)
+    else:
+        utils = VPPUtils(metrics=metrics, report_workers=args.report_workers)
+    try:
+        if not args.batch:
+            run_interactive(utils, metrics)
+            return 0
+        if args.batch == "-":
+            return 1 if run_batch(utils, sys.stdin, metrics, args.verbose) else 0
+        with open(args.batch, encoding="utf-8") as fh:
+            return 1 if run_batch(utils, fh, metrics, args.verbose) else 0
+    finally:
+        utils.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
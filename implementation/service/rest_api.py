@@ -0,0 +1,420 @@
+# REST service over VPPUtils
+# A small asyncio HTTP/1.1 server (standard library only) exposing the
+# operations of the report generator as the endpoints described in the Readme:
+#   POST /vpps                                  {name, revenue_percentage, daily_fee_aud?}
+#   PUT  /vpps/{name}                           {revenue_percentage, daily_fee_aud?}
+#   POST /sites                                 {vpp_name, nmi, address}
+#   PUT  /sites/{nmi}                           {vpp_name?, address?}
+#   POST /sites/{nmi}/assign-vpp/{vpp_name}
+#   POST /sites/{nmi}/batteries                 {manufacturer, serial, capacity_kwh}
+#   PUT  /sites/{nmi}/batteries/{serial}        {manufacturer, capacity_kwh}
+#   DELETE /sites/{nmi}/batteries/{serial}
+#   POST /import-events                         CSV body, parsed as it streams in
+#   POST /generate-report/{vpp_name}?month=YYYY-MM      or month=YYYY-MM..YYYY-MM for a range
+#   POST /simulate-pricing/{vpp_name}?month=YYYY-MM      {revenue_percentages, daily_fees_aud}
+#   GET  /metrics[?format=prometheus]          when started with --metrics
+# Business rules stay in VPPUtils; this module only maps HTTP to method calls.
+# Reports run in a thread executor so they never stall the event loop; a lock
+# keeps them from reading the model while a request is changing it.
+# With --follow the service also polls a drop directory (or file, or glob) in
+# the background and appends new event rows as they arrive, so reports for the
+# current month include them within one poll interval.
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import threading
+import time
+from typing import AsyncIterator, Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+from models.data_class import ImportResult
+from utils.event_follower import DEFAULT_POLL_SECONDS
+from utils.event_ingest import EventCsvParser, record_import_metrics
+from utils.metrics import Metrics
+from utils.pricing_simulator import scenario_grid
+from utils.report_shards import SHARD_MIN_SITES
+from utils.vpp_utils import VPPUtils
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_BYTES = 64 * 1024
+MAX_JSON_BYTES = 1024 * 1024
+BODY_CHUNK_BYTES = 256 * 1024
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class Request:
+    def __init__(self, method: str, path: str, query: Dict[str, list], headers: Dict[str, str], reader: asyncio.StreamReader):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.reader = reader
+        self.body_consumed = (self.headers.get("transfer-encoding", "").lower() != "chunked"
+                              and int(self.headers.get("content-length", 0)) == 0)
+
+    @property
+    def keep_alive(self) -> bool:
+        return self.headers.get("connection", "").lower() != "close"
+
+    async def iter_body(self) -> AsyncIterator[bytes]:
+        """Yield the body as it arrives, for both Content-Length and chunked transfer encoding."""
+        if self.headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size_line = await self.reader.readuntil(b"\r\n")
+                size = int(size_line.split(b";", 1)[0], 16)
+                if size == 0:
+                    # trailers end with an empty line
+                    while await self.reader.readuntil(b"\r\n") != b"\r\n":
+                        pass
+                    break
+                remaining = size
+                while remaining:
+                    data = await self.reader.read(min(remaining, BODY_CHUNK_BYTES))
+                    if not data:
+                        raise asyncio.IncompleteReadError(b"", remaining)
+                    remaining -= len(data)
+                    yield data
+                await self.reader.readexactly(2)
+        else:
+            remaining = int(self.headers.get("content-length", 0))
+            while remaining:
+                data = await self.reader.read(min(remaining, BODY_CHUNK_BYTES))
+                if not data:
+                    raise asyncio.IncompleteReadError(b"", remaining)
+                remaining -= len(data)
+                yield data
+        self.body_consumed = True
+
+    async def json(self) -> dict:
+        body = bytearray()
+        async for data in self.iter_body():
+            body += data
+            if len(body) > MAX_JSON_BYTES:
+                raise HTTPError(413, "Request body too large")
+        if not body:
+            return {}
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
+            raise HTTPError(400, f"Invalid JSON body: {e}")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "JSON body must be an object")
+        return payload
+
+
+def _field(payload: dict, name: str, cast=str, default=None):
+    value = payload.get(name, default)
+    if value is None:
+        raise HTTPError(400, f"Missing field '{name}'")
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        raise HTTPError(400, f"Invalid value for '{name}'")
+
+
+class VPPService:
+
+    def __init__(self, utils: Optional[VPPUtils] = None):
+        self.utils = utils or VPPUtils()
+        self.lock = threading.Lock()
+        # (method, path pattern) -> handler, None in a pattern captures that path segment
+        self.routes = [
+            ("POST", ("vpps",), self.create_vpp),
+            ("PUT", ("vpps", None), self.update_vpp),
+            ("POST", ("sites",), self.create_site),
+            ("PUT", ("sites", None), self.update_site),
+            ("POST", ("sites", None, "assign-vpp", None), self.assign_site),
+            ("POST", ("sites", None, "batteries"), self.create_battery),
+            ("PUT", ("sites", None, "batteries", None), self.update_battery),
+            ("DELETE", ("sites", None, "batteries", None), self.remove_battery),
+            ("POST", ("import-events",), self.import_events),
+            ("POST", ("generate-report", None), self.generate_report),
+            ("POST", ("simulate-pricing", None), self.simulate_pricing),
+            ("GET", ("metrics",), self.get_metrics),
+        ]
+
+    @contextlib.asynccontextmanager
+    async def locked(self):
+        # take the lock without blocking the event loop when a report is holding it
+        if not self.lock.acquire(blocking=False):
+            await asyncio.get_running_loop().run_in_executor(None, self.lock.acquire)
+        try:
+            yield
+        finally:
+            self.lock.release()
+
+    # ===================== endpoints =====================
+    async def create_vpp(self, request: Request):
+        payload = await request.json()
+        name = _field(payload, "name")
+        async with self.locked():
+            self.utils.create_update_vpp(name, _field(payload, "revenue_percentage", float),
+                                         _field(payload, "daily_fee_aud", float, 0.0))
+        return 201, self._vpp(name)
+
+    async def update_vpp(self, request: Request, name: str):
+        payload = await request.json()
+        if name not in self.utils.vpps:
+            raise HTTPError(404, f"VPP '{name}' not found")
+        vpp = self.utils.vpps[name]
+        async with self.locked():
+            self.utils.create_update_vpp(name, _field(payload, "revenue_percentage", float, vpp.revenue_percentage),
+                                         _field(payload, "daily_fee_aud", float, vpp.daily_fee_aud))
+        return 200, self._vpp(name)
+
+    async def create_site(self, request: Request):
+        payload = await request.json()
+        nmi = _field(payload, "nmi")
+        async with self.locked():
+            self.utils.create_update_site(_field(payload, "vpp_name"), nmi, _field(payload, "address"))
+        return 201, self._site(nmi)
+
+    async def update_site(self, request: Request, nmi: str):
+        payload = await request.json()
+        site = self._existing_site(nmi)
+        async with self.locked():
+            self.utils.create_update_site(_field(payload, "vpp_name", str, site.vpp_name), nmi,
+                                          _field(payload, "address", str, site.address))
+        return 200, self._site(nmi)
+
+    async def assign_site(self, request: Request, nmi: str, vpp_name: str):
+        await request.json()
+        site = self._existing_site(nmi)
+        async with self.locked():
+            self.utils.create_update_site(vpp_name, nmi, site.address)
+        return 200, self._site(nmi)
+
+    async def create_battery(self, request: Request, nmi: str):
+        payload = await request.json()
+        async with self.locked():
+            self.utils.create_update_battery(nmi, _field(payload, "manufacturer"), _field(payload, "serial"),
+                                             _field(payload, "capacity_kwh", float))
+        return 201, self._site(nmi)
+
+    async def update_battery(self, request: Request, nmi: str, serial: str):
+        payload = await request.json()
+        site = self._existing_site(nmi)
+        battery = site.battery(serial)
+        if battery is None:
+            raise HTTPError(404, f"Battery serial={serial} not found at site {nmi}")
+        async with self.locked():
+            self.utils.create_update_battery(nmi, _field(payload, "manufacturer", str, battery.manufacturer), serial,
+                                             _field(payload, "capacity_kwh", float, battery.capacity_kwh))
+        return 200, self._site(nmi)
+
+    async def remove_battery(self, request: Request, nmi: str, serial: str):
+        await request.json()
+        async with self.locked():
+            self.utils.remove_battery(nmi, serial)
+        return 200, self._site(nmi)
+
+    async def import_events(self, request: Request):
+        # the CSV is parsed as it arrives; each parsed piece is appended straight away
+        result = ImportResult()
+        parser = EventCsvParser(self.utils.sites, result, self.utils.metrics)
+        started = time.perf_counter()
+        try:
+            async for data in request.iter_body():
+                batch = parser.feed(data)
+                if batch:
+                    async with self.locked():
+                        self.utils.append_event_batch(batch)
+            async with self.locked():
+                self.utils.append_event_batch(parser.finish())
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        result.elapsed_s = time.perf_counter() - started
+        record_import_metrics(self.utils.metrics, result)
+        return 200, result.as_dict()
+
+    async def generate_report(self, request: Request, vpp_name: str):
+        await request.json()
+        month = request.query.get("month", [None])[0]
+        if not month:
+            raise HTTPError(400, "Missing query parameter 'month'")
+        report = await asyncio.get_running_loop().run_in_executor(None, self._report, vpp_name, month)
+        if report is None:
+            raise HTTPError(404, f"VPP '{vpp_name}' has no sites to report on")
+        return 200, report
+
+    async def simulate_pricing(self, request: Request, vpp_name: str):
+        # every combination of the two lists is a scenario; the VPP itself is not changed
+        payload = await request.json()
+        month = request.query.get("month", [None])[0]
+        if not month:
+            raise HTTPError(400, "Missing query parameter 'month'")
+        percentages = _field(payload, "revenue_percentages", list)
+        fees = _field(payload, "daily_fees_aud", list)
+        try:
+            scenarios = scenario_grid([float(p) for p in percentages], [float(f) for f in fees])
+        except (TypeError, ValueError):
+            raise HTTPError(400, "Scenario values must be numbers")
+        return 200, await asyncio.get_running_loop().run_in_executor(None, self._simulate, vpp_name, month, scenarios)
+
+    async def get_metrics(self, request: Request):
+        metrics = self.utils.metrics
+        if not metrics.enabled:
+            raise HTTPError(404, "Metrics are disabled, start the service with --metrics")
+        if request.query.get("format", ["json"])[0] == "prometheus":
+            return 200, metrics.to_prometheus()
+        return 200, metrics.as_dict()
+
+    async def follow_events(self, file_path: str, poll_seconds: float = DEFAULT_POLL_SECONDS):
+        # polls run in the thread executor; only appending a micro-batch takes the lock
+        follower = self.utils.event_follower(file_path)
+        follower.apply_batch = self._append_followed
+        loop = asyncio.get_running_loop()
+        while True:
+            result = await loop.run_in_executor(None, follower.poll)
+            record_import_metrics(self.utils.metrics, result)
+            await asyncio.sleep(poll_seconds)
+
+    def _append_followed(self, job, batch):
+        with self.lock:
+            self.utils.append_checkpointed_batch(job, batch)
+
+    def _simulate(self, vpp_name: str, month: str, scenarios):
+        with self.lock:
+            return self.utils.simulate_pricing(vpp_name, month, scenarios)
+
+    def _report(self, vpp_name: str, month: str):
+        with self.lock:
+            if ".." in month:
+                return self.utils.create_range_report(vpp_name, *month.split("..", 1))
+            return self.utils.create_report(vpp_name, month)
+
+    # ===================== helpers =====================
+    def _vpp(self, name: str) -> dict:
+        vpp = self.utils.vpps[name]
+        return {"name": vpp.name, "revenue_percentage": vpp.revenue_percentage, "daily_fee_aud": vpp.daily_fee_aud}
+
+    def _existing_site(self, nmi: str):
+        site = self.utils.sites.get(nmi)
+        if site is None:
+            raise HTTPError(404, f"Site with NMI {nmi} not found")
+        return site
+
+    def _site(self, nmi: str) -> dict:
+        site = self.utils.sites[nmi]
+        return {
+            "nmi": site.nmi,
+            "vpp_name": site.vpp_name,
+            "address": site.address,
+            "batteries": [{"manufacturer": b.manufacturer, "serial": b.serial, "capacity_kwh": b.capacity_kwh}
+                          for b in site.batteries],
+        }
+
+    def route(self, method: str, path: str):
+        parts = [unquote(p) for p in path.strip("/").split("/")]
+        path_matched = False
+        for route_method, pattern, handler in self.routes:
+            if len(pattern) != len(parts) or any(p is not None and p != part for p, part in zip(pattern, parts)):
+                continue
+            path_matched = True
+            if route_method == method:
+                return handler, [part for p, part in zip(pattern, parts) if p is None]
+        raise HTTPError(405 if path_matched else 404, f"No route for {method} {path}")
+
+    # ===================== HTTP =====================
+    async def dispatch(self, request: Request) -> Tuple[int, object]:
+        try:
+            handler, args = self.route(request.method, request.path)
+            return await handler(request, *args)
+        except HTTPError as e:
+            return e.status, {"error": str(e)}
+        except ValueError as e:
+            # validation errors raised by VPPUtils, missing parents are reported as such
+            return (404 if "not found" in str(e) else 400), {"error": str(e)}
+        except Exception:
+            # anything else is a bug, answer it rather than drop the connection
+            logger.exception("%s %s failed", request.method, request.path)
+            return 500, {"error": REASONS[500]}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                status, payload = await self.dispatch(request)
+                keep_alive = request.keep_alive and request.body_consumed
+                # text payloads (Prometheus metrics) are sent as is, everything else as JSON
+                if isinstance(payload, str):
+                    body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4"
+                else:
+                    body, content_type = json.dumps(payload).encode("utf-8"), "application/json"
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    lines = head.decode("latin-1").split("\r\n")
+    method, target, _ = lines[0].split(" ", 2)
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    url = urlsplit(target)
+    return Request(method.upper(), url.path, parse_qs(url.query), headers, reader)
+
+
+async def serve(host: str = "127.0.0.1", port: int = 8080, service: Optional[VPPService] = None,
+                follow: Optional[str] = None, poll_seconds: float = DEFAULT_POLL_SECONDS):
+    service = service or VPPService()
+    server = await asyncio.start_server(service.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+    print(f"Serving VPP API on http://{host}:{port}")
+    if follow:
+        # keep a reference, the event loop only holds tasks weakly
+        following = asyncio.create_task(service.follow_events(follow, poll_seconds))
+        print(f"Following {follow} for new events every {poll_seconds:g}s")
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="VPP REST API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--snapshot", help="load this snapshot before serving")
+    parser.add_argument("--metrics", action="store_true", help="collect metrics and serve them at GET /metrics")
+    parser.add_argument("--follow", help="import the event rows appended to this file, directory or glob as they arrive")
+    parser.add_argument("--poll-seconds", type=float, default=DEFAULT_POLL_SECONDS, help="how often --follow looks for new rows")
+    parser.add_argument("--report-workers", type=int,
+                        help=f"worker processes for the reports of VPPs with at least {SHARD_MIN_SITES} sites")
+    args = parser.parse_args(argv)
+    utils = VPPUtils(metrics=Metrics() if args.metrics else None, report_workers=args.report_workers)
+    if args.snapshot:
+        utils.load_snapshot(args.snapshot)
+    try:
+        asyncio.run(serve(args.host, args.port, VPPService(utils), args.follow, args.poll_seconds))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        utils.close()
+
+
+if __name__ == "__main__":
+    main()
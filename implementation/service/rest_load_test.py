@@ -0,0 +1,59 @@
+# Local load test for the REST service
+# Opens CONNECTIONS keep-alive connections and sends small create/update
+# requests as fast as the server answers, then prints the request rate.
+#   python -m service.rest_api --port 8080 &
+#   python -m service.rest_load_test --port 8080 --requests 20000 --connections 16
+import argparse
+import asyncio
+import json
+import time
+
+
+async def _client(host: str, port: int, worker: int, count: int, latencies: list):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for i in range(count):
+            # alternate creating and updating the worker's own VPP
+            body = json.dumps({"name": f"load-{worker}", "revenue_percentage": 20 + i % 5, "daily_fee_aud": 0.3}).encode()
+            method, path = ("POST", "/vpps") if i == 0 else ("PUT", f"/vpps/load-{worker}")
+            started = time.perf_counter()
+            writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = int(next(line.split(b":", 1)[1] for line in head.split(b"\r\n")
+                              if line.lower().startswith(b"content-length")))
+            await reader.readexactly(length)
+            if not head.startswith(b"HTTP/1.1 20"):
+                raise RuntimeError(head.split(b"\r\n", 1)[0].decode())
+            latencies.append(time.perf_counter() - started)
+    finally:
+        writer.close()
+
+
+async def run(host: str, port: int, requests: int, connections: int) -> dict:
+    latencies: list = []
+    per_connection = max(1, requests // connections)
+    started = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, w, per_connection, latencies) for w in range(connections)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the VPP REST API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--connections", type=int, default=16)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(run(args.host, args.port, args.requests, args.connections))))
+
+
+if __name__ == "__main__":
+    main()
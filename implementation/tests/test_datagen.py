@@ -0,0 +1,25 @@
+from benchmarks.datagen import DatasetSpec, generate_entities, write_events
+from utils.vpp_utils import VPPUtils
+
+
+def test_generator_is_deterministic(tmp_path):
+    spec = DatasetSpec(vpps=2, sites=10, events=500, invalid_ratio=0.1, seed=7)
+    first, second = tmp_path / "a.csv", tmp_path / "b.csv"
+    dataset = generate_entities(spec)
+    assert generate_entities(spec) == dataset
+    assert write_events(str(first), dataset) == write_events(str(second), generate_entities(spec))
+    assert first.read_bytes() == second.read_bytes()
+
+
+def test_generated_events_import_with_invalid_rows(tmp_path):
+    spec = DatasetSpec(vpps=2, sites=10, events=500, invalid_ratio=0.1, seed=7)
+    dataset = generate_entities(spec)
+    path = tmp_path / "events.csv"
+    invalid = write_events(str(path), dataset)
+    utils = VPPUtils()
+    dataset.populate(utils)
+    result = utils.import_events(str(path))
+    assert invalid > 0
+    assert result.skipped == invalid
+    assert result.imported == spec.events - invalid
+    assert sum(len(site.events) for site in utils.sites.values()) == result.imported
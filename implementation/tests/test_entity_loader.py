@@ -0,0 +1,64 @@
+import pytest
+from utils.sqlite_utils import SQLiteVPPUtils
+from utils.vpp_utils import VPPUtils
+
+SITES_CSV = """VPP_NAME,NMI,ADDRESS
+VPP1,111,"1 Test St, Newcastle"
+VPP1,222,2 Test St
+NOPE,333,3 Test St
+VPP1,,4 Test St
+VPP1
+"""
+
+BATTERIES_CSV = """NMI,MANUFACTURER,SERIAL,CAPACITY_KWH
+111,Tesla,B1,13.5
+111,Tesla,B2,5
+222,LG,B3,abc
+999,LG,B4,1
+222,LG,,1
+111,TeslaX,B1,10
+222,LG,B5,nan
+222,LG,B6,inf
+222,LG,B7,-1
+222,LG,B8,1e20
+"""
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def utils(request, tmp_path):
+    if request.param == "memory":
+        yield VPPUtils()
+    else:
+        utils = SQLiteVPPUtils(str(tmp_path / "vpp.db"))
+        yield utils
+        utils.close()
+
+
+def test_load_sites_and_batteries(utils, tmp_path, capsys):
+    (tmp_path / "sites.csv").write_text(SITES_CSV)
+    (tmp_path / "batteries.csv").write_text(BATTERIES_CSV)
+    utils.create_update_vpp("VPP1", 20.0, 0.5)
+    capsys.readouterr()
+
+    sites = utils.load_sites(str(tmp_path / "sites.csv"))
+    batteries = utils.load_batteries(str(tmp_path / "batteries.csv"))
+
+    out = capsys.readouterr().out
+    assert "Created Site" not in out and "Created Battery" not in out
+    assert "Imported=2, Skipped=3" in out
+    assert sites.skipped_by_reason == {"unknown_vpp": 1, "missing_nmi": 1, "malformed_row": 1}
+    assert batteries.imported == 3
+    assert batteries.skipped_by_reason == {"invalid_number": 5, "unknown_nmi": 1, "missing_serial": 1}
+
+    report = utils.create_report("VPP1", "2025-09")
+    assert report["sites"]["111"]["address"] == "1 Test St, Newcastle"
+    # the later B1 row updates the battery loaded earlier in the file
+    assert report["sites"]["111"]["site_capacity_kwh"] == 15.0
+    assert report["sites"]["222"]["site_capacity_kwh"] == 0
+
+
+def test_load_sites_requires_columns(utils, tmp_path):
+    (tmp_path / "sites.csv").write_text("NMI,ADDRESS\n111,1 Test St\n")
+    with pytest.raises(ValueError) as excinfo:
+        utils.load_sites(str(tmp_path / "sites.csv"))
+    assert "missing columns: VPP_NAME" in str(excinfo.value)
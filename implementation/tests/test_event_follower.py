@@ -0,0 +1,104 @@
+import os
+from utils.sqlite_utils import SQLiteVPPUtils
+from utils.vpp_utils import VPPUtils
+
+HEADER = "NMI,DATE,EVENT_TYPE,ENERGY,TARIFF\n"
+
+def setup_sites(utils):
+    utils.create_update_vpp("VPP1", 20.0, 0.3)
+    utils.create_update_site("VPP1", "111", "1 Test St")
+    utils.create_update_battery("111", "Tesla", "BAT1", 13.5)
+    return utils
+
+def append(path, text):
+    with open(path, "a", encoding="utf-8") as fh:
+        fh.write(text)
+
+def test_follower_imports_only_complete_new_lines(tmp_path):
+    utils = setup_sites(VPPUtils())
+    path = str(tmp_path / "events.csv")
+    append(path, HEADER + "111,2025-09-01,Charge,10,20\n111,2025-09-02,Charge,1")
+    follower = utils.event_follower(path)
+
+    assert follower.poll().imported == 1
+    revenue_before = utils.create_report("VPP1", "2025-09")["totals"]["total_revenue"]
+
+    # the rest of the partial line arrives, then one more row
+    append(path, "0,20\n999,2025-09-03,Charge,1,1\n")
+    result = follower.poll()
+    assert (result.imported, result.skipped_by_reason) == (1, {"unknown_nmi": 1})
+    assert follower.poll().imported == 0
+    assert sorted(e.energy_kwh for e in utils.sites["111"].events) == [10, 10]
+    assert utils.create_report("VPP1", "2025-09")["totals"]["total_revenue"] == revenue_before * 2
+
+def test_follower_picks_up_new_files_and_a_new_follower_carries_on(tmp_path):
+    drop = tmp_path / "drop"
+    drop.mkdir()
+    utils = setup_sites(VPPUtils())
+    follower = utils.event_follower(str(drop))
+    assert follower.poll().imported == 0
+
+    append(str(drop / "a.csv"), HEADER + "111,2025-09-01,Charge,1,20\n")
+    assert follower.poll().imported == 1
+    append(str(drop / "a.csv"), "111,2025-09-02,Charge,2,20\n")
+    append(str(drop / "b.csv"), HEADER + "111,2025-09-03,Charge,3,20\n")
+
+    # a new follower of the same state starts from the checkpoints of the previous one
+    again = utils.event_follower(str(drop))
+    assert again.poll().imported == 2
+    assert sorted(e.energy_kwh for e in utils.sites["111"].events) == [1, 2, 3]
+    assert sorted(p.name for p in drop.iterdir()) == ["a.csv", "b.csv"]
+
+def test_follower_after_a_restart_imports_what_the_memory_lost(tmp_path):
+    drop = tmp_path / "drop"
+    drop.mkdir()
+    append(str(drop / "a.csv"), HEADER + "111,2025-09-01,Charge,1,20\n111,2025-09-02,Charge,2,20\n")
+    setup_sites(VPPUtils()).event_follower(str(drop)).poll()
+
+    restarted = setup_sites(VPPUtils())
+    assert restarted.event_follower(str(drop)).poll().imported == 2
+    assert len(restarted.sites["111"].events) == 2
+
+def test_follower_after_loading_a_snapshot_skips_only_its_events(tmp_path):
+    drop = tmp_path / "drop"
+    drop.mkdir()
+    utils = setup_sites(VPPUtils())
+    append(str(drop / "a.csv"), HEADER + "111,2025-09-01,Charge,1,20\n")
+    utils.event_follower(str(drop)).poll()
+    snapshot = str(tmp_path / "state.snap")
+    utils.save_snapshot(snapshot)
+    append(str(drop / "a.csv"), "111,2025-09-02,Charge,2,20\n")
+
+    restarted = VPPUtils()
+    restarted.load_snapshot(snapshot)
+    assert restarted.event_follower(str(drop)).poll().imported == 1
+    assert sorted(e.energy_kwh for e in restarted.sites["111"].events) == [1, 2]
+
+def test_follower_stops_following_a_truncated_file(tmp_path, capsys):
+    utils = setup_sites(VPPUtils())
+    path = str(tmp_path / "events.csv")
+    append(path, HEADER + "111,2025-09-01,Charge,1,20\n")
+    follower = utils.event_follower(path)
+    follower.poll()
+
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(HEADER)
+    assert follower.poll().imported == 0
+    assert "Stopped following" in capsys.readouterr().out
+    assert follower.stopped == {path}
+
+def test_sqlite_follower_commits_each_micro_batch(tmp_path):
+    db_path = str(tmp_path / "vpp.db")
+    path = str(tmp_path / "events.csv")
+    utils = setup_sites(SQLiteVPPUtils(db_path))
+    append(path, HEADER + "111,2025-09-01,Charge,1,20\n")
+    assert utils.follow_events(path, poll_seconds=0, max_polls=2).imported == 1
+    utils.close()
+
+    append(path, "111,2025-09-02,Charge,2,20\n")
+    restarted = SQLiteVPPUtils(db_path)
+    assert restarted.event_follower(path).poll().imported == 1
+    (count,) = restarted.conn.execute("SELECT COUNT(*) FROM events").fetchone()
+    assert count == 2
+    assert not os.path.exists(f"{path}.checkpoint.json")
+    restarted.close()
@@ -0,0 +1,102 @@
+import pytest
+from models.data_class import ImportResult, month_key
+from utils.event_ingest import EventCsvParser, read_event_batches, resolve_event_files
+
+CSV_CONTENT = """NMI,DATE,EVENT_TYPE,ENERGY,TARIFF
+111,2025-09-01,Charge,5.0,20
+111,2025-10-02,discharge,3.0,25
+999,2025-09-03,Charge,2.0,15
+111,2025-09-04,InvalidType,1.0,10
+111,2025-13-04,Charge,1.0,10
+111,2025-09-05,Charge,abc,10
+111,2025-09-06
+"""
+
+@pytest.fixture
+def events_file(tmp_path):
+    path = tmp_path / "events.csv"
+    path.write_text(CSV_CONTENT, encoding="utf-8")
+    return str(path)
+
+def test_read_event_batches_tallies_skips_by_reason(events_file):
+    result = ImportResult()
+    batches = list(read_event_batches(events_file, {"111"}, result))
+
+    assert result.imported == 2
+    assert result.skipped == 5
+    assert result.skipped_by_reason == {
+        "unknown_nmi": 1,
+        "invalid_event_type": 1,
+        "invalid_date": 1,
+        "invalid_number": 1,
+        "malformed_row": 1,
+    }
+    keys = {key for batch in batches for key in batch}
+    assert keys == {("111", month_key(2025, 9)), ("111", month_key(2025, 10))}
+
+def test_parser_skips_numbers_that_are_not_finite_or_out_of_bounds():
+    result = ImportResult()
+    parser = EventCsvParser({"111"}, result)
+    batch = parser.feed(b"NMI,DATE,EVENT_TYPE,ENERGY,TARIFF\n"
+                        b"111,2025-09-01,Charge,nan,20\n"
+                        b"111,2025-09-01,Charge,5,inf\n"
+                        b"111,2025-09-01,Discharge,-inf,20\n"
+                        b"111,2025-09-01,Charge,1e20,20\n"
+                        b"111,2025-09-01,Charge,5,-1e9\n"
+                        b"111,2025-09-01,Charge,10000,-100000\n")
+    assert result.imported == 1
+    assert result.skipped_by_reason == {"invalid_number": 5}
+    assert list(batch[("111", month_key(2025, 9))].energies) == [10000.0]
+
+def test_parser_accepts_the_same_dates_and_lines_as_the_csv_module():
+    result = ImportResult()
+    parser = EventCsvParser({"111"}, result)
+    batch = parser.feed("NMI,DATE,EVENT_TYPE,ENERGY,TARIFF\r\n"
+                        "111,2025-09-01,Charge,1,20\r\n"
+                        "111,2025-9-2,Charge,2,20\n"
+                        "111,20250903,Charge,3,20\n"
+                        "111,2025-W36-4,Charge,4,20\n"
+                        "111,2025-09-05T00:00,Charge,5,20\n"
+                        "111 \x0b,2025-09-06,Charge,6,20\n"
+                        "111,2025-09-07,Charge\u2028,7,20\n".encode("utf-8"))
+    assert result.skipped_by_reason == {"invalid_date": 3}
+    # a \x0b or \u2028 inside a field stays in its row, where it is stripped like other whitespace
+    assert list(batch[("111", month_key(2025, 9))].energies) == [1.0, 2.0, 6.0, 7.0]
+
+def test_read_event_batches_is_independent_of_chunk_size(events_file):
+    expected = ImportResult()
+    whole = [b for b in read_event_batches(events_file, {"111"}, expected) if b]
+    for chunk_bytes in (1, 7, 64):
+        result = ImportResult()
+        rows = []
+        for batch in read_event_batches(events_file, {"111"}, result, chunk_bytes=chunk_bytes):
+            for (nmi, key), block in batch.items():
+                rows.extend(zip(block.dates, block.types, block.energies, block.tariffs))
+        assert result.skipped_by_reason == expected.skipped_by_reason
+        assert len(rows) == sum(len(block) for batch in whole for block in batch.values())
+
+def test_parser_rejects_missing_columns():
+    parser = EventCsvParser({"111"}, ImportResult())
+    with pytest.raises(ValueError) as excinfo:
+        parser.feed(b"NMI,DATE,ENERGY\n111,2025-09-01,1\n")
+    assert "EVENT_TYPE" in str(excinfo.value)
+    assert "TARIFF" in str(excinfo.value)
+
+def test_parser_keeps_partial_line_until_next_feed():
+    result = ImportResult()
+    parser = EventCsvParser({"111"}, result)
+    parser.feed(b"NMI,DATE,EVENT_TYPE,ENERGY,TARIFF\n111,2025-09-01,Cha")
+    assert result.imported == 0
+    batch = parser.feed(b"rge,5.0,20\n")
+    assert result.imported == 1
+    assert list(batch[("111", month_key(2025, 9))].energies) == [5.0]
+
+def test_resolve_event_files(tmp_path):
+    for name in ("b.csv", "a.csv", "notes.txt"):
+        (tmp_path / name).write_text("NMI,DATE,EVENT_TYPE,ENERGY,TARIFF\n", encoding="utf-8")
+
+    assert resolve_event_files(str(tmp_path)) == [str(tmp_path / "a.csv"), str(tmp_path / "b.csv")]
+    assert resolve_event_files(str(tmp_path / "*.txt")) == [str(tmp_path / "notes.txt")]
+    assert resolve_event_files("single.csv") == ["single.csv"]
+    with pytest.raises(FileNotFoundError):
+        resolve_event_files(str(tmp_path / "*.json"))
@@ -0,0 +1,71 @@
+from datetime import date
+import pytest
+from models.data_class import Event, EventColumns, EventStore, EventType, month_key
+
+
+def test_event_store_round_trips_events():
+    store = EventStore("123")
+    store.append(Event("123", date(2025, 9, 1), EventType.CHARGE, 5.0, 20))
+    store.append(Event("123", date(2025, 9, 2), EventType.DISCHARGE, 3.0, 25))
+
+    assert len(store) == 2
+    block = store.month(month_key(2025, 9))
+    assert block.dates[0] == date(2025, 9, 1).toordinal()
+    assert list(block.types) == [0, 1]
+    assert store[1] == Event("123", date(2025, 9, 2), EventType.DISCHARGE, 3.0, 25.0)
+    assert [e.event_type for e in store] == [EventType.CHARGE, EventType.DISCHARGE]
+
+def test_event_store_month_totals_split_discharge_cost():
+    store = EventStore("123")
+    store.append(Event("123", date(2025, 9, 1), EventType.CHARGE, 10, 20))
+    store.append(Event("123", date(2025, 9, 2), EventType.DISCHARGE, 10, -5))
+    store.append(Event("123", date(2025, 9, 3), EventType.CHARGE, 10, -5))
+    store.append(Event("123", date(2025, 10, 1), EventType.CHARGE, 10, 20))
+
+    revenue, cost_only = store.month_totals(month_key(2025, 9))
+    # money units of 1e-6 AUD
+    assert revenue == 1_500_000
+    assert cost_only == -500_000
+    assert store.month_totals(month_key(2025, 11)) == (0, 0)
+
+def test_event_store_partitions_by_month():
+    store = EventStore("123")
+    store.append(Event("123", date(2025, 10, 1), EventType.CHARGE, 1, 1))
+    store.append(Event("123", date(2024, 10, 31), EventType.CHARGE, 2, 1))
+    store.append(Event("123", date(2025, 10, 31), EventType.CHARGE, 3, 1))
+
+    assert sorted(store.months) == [month_key(2024, 10), month_key(2025, 10)]
+    assert len(store.month(month_key(2025, 10))) == 2
+    # iteration and indexing walk the partitions in month order
+    assert [e.energy_kwh for e in store] == [2, 1, 3]
+    assert store[-1].date == date(2025, 10, 31)
+
+def test_event_store_keeps_month_totals_up_to_date():
+    store = EventStore("123")
+    key = month_key(2025, 9)
+    store.append(Event("123", date(2025, 9, 1), EventType.CHARGE, 10, 20))
+    assert store.totals[key] == (2_000_000, 0)
+
+    block = EventColumns()
+    block.add_row(date(2025, 9, 2).toordinal(), 1, 10, -5)
+    block.add_row(date(2025, 9, 3).toordinal(), 1, 10, 10)
+    store.extend_month(key, block)
+
+    assert store.month_totals(key) == (3_000_000, -500_000)
+    assert store.month_totals(key) == store.month(key).totals()
+
+
+def test_event_store_is_unchanged_by_events_that_cannot_be_valued():
+    store = EventStore("123")
+    key = month_key(2025, 9)
+    store.append(Event("123", date(2025, 9, 1), EventType.CHARGE, 5.0, 20))
+    block = EventColumns()
+    block.add_row(date(2025, 9, 2).toordinal(), 0, float("nan"), 20)
+    block.add_row(date(2025, 9, 3).toordinal(), 0, 1.0, 20)
+    with pytest.raises(ValueError):
+        store.extend_month(key, block)
+    with pytest.raises(OverflowError):
+        store.append(Event("123", date(2025, 9, 4), EventType.CHARGE, float("inf"), 20))
+    assert len(store) == 1
+    assert store.month_totals(key) == (1_000_000, 0)
+
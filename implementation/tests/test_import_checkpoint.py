@@ -0,0 +1,116 @@
+import pytest
+from utils.sqlite_utils import SQLiteVPPUtils
+from utils.vpp_utils import VPPUtils
+
+ROWS = 200
+
+@pytest.fixture
+def events_file(tmp_path):
+    path = tmp_path / "events.csv"
+    lines = ["NMI,DATE,EVENT_TYPE,ENERGY,TARIFF"]
+    lines += [f"{'111' if i % 4 else '999'},2025-09-{1 + i % 28:02d},Charge,{i},20" for i in range(ROWS)]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+def setup_sites(utils):
+    utils.create_update_vpp("VPP1", 20.0, 0.3)
+    utils.create_update_site("VPP1", "111", "1 Test St")
+    return utils
+
+def fail_after(obj, method, calls):
+    original = getattr(obj, method)
+    state = {"calls": 0}
+    def failing(*args):
+        state["calls"] += 1
+        if state["calls"] > calls:
+            raise RuntimeError("simulated crash")
+        return original(*args)
+    setattr(obj, method, failing)
+    return original
+
+def test_resumed_import_does_not_duplicate_events(events_file):
+    utils = setup_sites(VPPUtils())
+    original = fail_after(utils, "append_event_batch", 3)
+    with pytest.raises(RuntimeError):
+        utils.import_events(events_file, chunk_bytes=256, resume=True)
+    imported_before_crash = len(utils.sites["111"].events)
+    assert 0 < imported_before_crash < 150
+    checkpoint = utils.checkpoints.load(events_file)
+    assert checkpoint.imported == imported_before_crash
+
+    utils.append_event_batch = original
+    result = utils.import_events(events_file, chunk_bytes=256, resume=True)
+
+    # the counts are this run's, the checkpoint keeps the file's
+    assert result.imported == 150 - imported_before_crash
+    assert utils.checkpoints.load(events_file).imported == 150
+    assert utils.checkpoints.load(events_file).skipped_by_reason == {"unknown_nmi": 50}
+    assert sorted(e.energy_kwh for e in utils.sites["111"].events) == [i for i in range(ROWS) if i % 4]
+
+def test_resume_after_complete_import_is_a_no_op(events_file, capsys):
+    utils = setup_sites(VPPUtils())
+    utils.import_events(events_file, resume=True)
+    result = utils.import_events(events_file, resume=True)
+
+    out = capsys.readouterr().out
+    assert "Resuming" in out and "Imported=150, Skipped=50 over all runs" in out
+    assert result.imported == 0
+    assert len(utils.sites["111"].events) == 150
+
+def test_resume_picks_up_rows_appended_to_the_file(events_file):
+    utils = setup_sites(VPPUtils())
+    utils.import_events(events_file, resume=True)
+    with open(events_file, "a", encoding="utf-8") as fh:
+        fh.write("111,2025-09-01,Discharge,1000,20\n")
+
+    assert utils.import_events(events_file, resume=True).imported == 1
+    assert len(utils.sites["111"].events) == 151
+
+def test_resume_refuses_a_replaced_file(events_file, tmp_path):
+    utils = setup_sites(VPPUtils())
+    utils.import_events(events_file, resume=True)
+    with open(events_file, "w", encoding="utf-8") as fh:
+        fh.write("NMI,DATE,EVENT_TYPE,ENERGY,TARIFF\n111,2025-10-01,Charge,1,1\n")
+
+    with pytest.raises(ValueError) as excinfo:
+        utils.import_events(events_file, resume=True)
+    assert "changed since its last checkpoint" in str(excinfo.value)
+
+def test_resume_in_a_new_process_imports_the_events_again(events_file, tmp_path):
+    utils = setup_sites(VPPUtils())
+    utils.import_events(events_file, resume=True)
+
+    # the events were only in memory, so nothing may be skipped by a new process
+    restarted = setup_sites(VPPUtils())
+    assert restarted.import_events(events_file, resume=True).imported == 150
+    assert len(restarted.sites["111"].events) == 150
+    assert not list(tmp_path.glob("*.checkpoint.json"))
+
+def test_resume_from_a_snapshot_carries_on_after_its_events(events_file, tmp_path):
+    utils = setup_sites(VPPUtils())
+    utils.import_events(events_file, resume=True)
+    snapshot = str(tmp_path / "state.snap")
+    utils.save_snapshot(snapshot)
+    with open(events_file, "a", encoding="utf-8") as fh:
+        fh.write("111,2025-09-01,Discharge,1000,20\n")
+
+    restarted = VPPUtils()
+    restarted.load_snapshot(snapshot)
+    assert restarted.import_events(events_file, resume=True).imported == 1
+    assert len(restarted.sites["111"].events) == 151
+
+def test_sqlite_resume_after_crash(events_file, tmp_path):
+    db_path = str(tmp_path / "vpp.db")
+    utils = setup_sites(SQLiteVPPUtils(db_path))
+    fail_after(utils, "_insert_event_batch", 3)
+    with pytest.raises(RuntimeError):
+        utils.import_events(events_file, chunk_bytes=256, resume=True)
+    utils.close()
+
+    # a new process: the last chunk's events and checkpoint were rolled back together
+    restarted = SQLiteVPPUtils(db_path)
+    result = restarted.import_events(events_file, chunk_bytes=256, resume=True)
+    assert 0 < result.imported < 150
+    (count,) = restarted.conn.execute("SELECT COUNT(*) FROM events").fetchone()
+    assert count == 150
+    restarted.close()
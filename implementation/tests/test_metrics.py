@@ -0,0 +1,73 @@
+import json
+import logging
+from utils.metrics import NULL_METRICS, Metrics, metrics_for
+from utils.vpp_utils import VPPUtils
+
+CSV_CONTENT = """NMI,DATE,EVENT_TYPE,ENERGY,TARIFF
+111,2025-09-01,Charge,5.0,20
+111,2025-09-02,Discharge,3.0,25
+999,2025-09-03,Charge,2.0,15
+111,2025-09-04,Idle,1.0,10
+"""
+
+
+def make_utils(tmp_path, metrics):
+    utils = VPPUtils(metrics=metrics)
+    utils.create_update_vpp("VPP1", 20, 0.3)
+    utils.create_update_site("VPP1", "111", "1 Test St")
+    utils.create_update_battery("111", "Tesla", "B1", 13.5)
+    path = tmp_path / "events.csv"
+    path.write_text(CSV_CONTENT)
+    return utils, str(path)
+
+
+def test_metrics_record_import_and_report_stages(tmp_path):
+    metrics = Metrics()
+    utils, path = make_utils(tmp_path, metrics)
+    utils.import_events(path)
+    utils.create_report("VPP1", "2025-09")
+    utils.create_report("VPP1", "2025-09")
+
+    assert metrics.counter("import_rows_total") == 4
+    assert metrics.counter("import_rows_imported_total") == 2
+    assert metrics.counter("import_rows_skipped_total", reason="unknown_nmi") == 1
+    assert metrics.counter("import_rows_skipped_total", reason="invalid_event_type") == 1
+    assert metrics.counter("report_events_scanned_total") == 2
+    assert metrics.counter("reports_total", cached="false") == 1
+    assert metrics.counter("reports_total", cached="true") == 1
+    assert {"parse", "validate", "append", "aggregate", "split", "fee"} <= set(metrics.stage_seconds)
+    assert metrics.histograms["create_report_seconds"].count == 2
+
+
+def test_metrics_exports_json_and_prometheus(tmp_path):
+    metrics = metrics_for(str(tmp_path / "metrics.prom"), "prometheus")
+    metrics.inc("import_rows_skipped_total", 3, reason="invalid_date")
+    metrics.add_time("parse", 0.5)
+    metrics.observe("create_report_seconds", 0.002)
+    metrics.flush()
+
+    text = (tmp_path / "metrics.prom").read_text()
+    assert 'vpp_import_rows_skipped_total{reason="invalid_date"} 3' in text
+    assert 'vpp_stage_seconds_total{stage="parse"} 0.5' in text
+    assert 'vpp_create_report_seconds_bucket{le="0.0025"} 1' in text
+    assert 'vpp_create_report_seconds_bucket{le="+Inf"} 1' in text
+    assert "vpp_create_report_seconds_count 1" in text
+
+    data = json.loads(json.dumps(metrics.as_dict()))
+    assert data["counters"]["import_rows_skipped_total"] == {"reason=invalid_date": 3}
+    assert data["histograms"]["create_report_seconds"]["count"] == 1
+    assert metrics_for(None) is NULL_METRICS
+
+
+def test_skipped_rows_are_logged_at_debug_only(tmp_path, caplog):
+    utils, path = make_utils(tmp_path, None)
+    with caplog.at_level(logging.INFO, logger="utils.event_ingest"):
+        utils.import_events(path)
+    assert not caplog.records
+
+    utils, path = make_utils(tmp_path, None)
+    with caplog.at_level(logging.DEBUG, logger="utils.event_ingest"):
+        utils.import_events(path)
+    messages = [r.getMessage() for r in caplog.records]
+    assert len(messages) == 2
+    assert "unknown_nmi" in messages[0] and "999,2025-09-03" in messages[0]
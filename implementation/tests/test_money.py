@@ -0,0 +1,44 @@
+import random
+from datetime import date
+from models.data_class import VPP, EventColumns, EventStore, month_key
+from models.money import div_round, event_value_units, units_to_aud, wh_to_kwh
+from utils.report_shards import build_report, stream_report
+
+
+def test_div_round_is_half_to_even():
+    assert [div_round(n, 10) for n in (4, 5, 6, 15, 25, -5, -15, -16)] == [0, 0, 1, 2, 2, 0, -2, -2]
+    assert units_to_aud(12_345_000) == 12.34
+    assert units_to_aud(12_355_000) == 12.36
+    assert wh_to_kwh(13_505) == 13.5
+
+def test_month_totals_do_not_depend_on_event_order():
+    rng = random.Random(3)
+    rows = [(date(2025, 9, rng.randint(1, 30)).toordinal(), rng.randint(0, 1),
+             rng.uniform(0, 20), rng.uniform(-40, 400)) for _ in range(2000)]
+    key = month_key(2025, 9)
+
+    one_by_one = EventColumns()
+    for row in rows:
+        one_by_one.add_row(*row)
+    shuffled = rows[:]
+    rng.shuffle(shuffled)
+    store = EventStore("111")
+    for chunk in range(0, len(shuffled), 300):
+        block = EventColumns()
+        for row in shuffled[chunk:chunk + 300]:
+            block.add_row(*row)
+        store.extend_month(key, block)
+
+    assert store.month_totals(key) == one_by_one.totals()
+    assert sum(store.month_totals(key)) == sum(event_value_units(t, e) for _, _, e, t in rows)
+
+def test_streamed_and_built_reports_agree_bit_for_bit():
+    rng = random.Random(11)
+    rows = [(str(i), f"addr {i}", rng.choice([0, 5_000, 13_500]), rng.randint(-5_000_000, 50_000_000),
+             rng.randint(-3_000_000, 0)) for i in range(300)]
+    vpp = VPP("VPP1", 17.5, 0.33)
+    header, entries = stream_report(vpp, "2025-09", lambda: rows)
+    built = build_report(vpp, "2025-09", rows, workers=1)
+
+    assert header["totals"] == built["totals"]
+    assert list(entries) == list(built["sites"].values())
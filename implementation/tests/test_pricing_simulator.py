@@ -0,0 +1,54 @@
+import random
+import pytest
+from models.data_class import VPP
+from utils.pricing_simulator import PricingSimulation, scenario_grid
+from models.money import units_to_aud
+from utils.report_shards import build_report, compute_shares
+from utils.sqlite_utils import SQLiteVPPUtils
+from utils.vpp_utils import VPPUtils
+
+def make_rows(n, seed=5):
+    rng = random.Random(seed)
+    return [(str(i), f"addr {i}", rng.choice([0, 5_000, 13_500]), rng.randint(-2_000_000, 30_000_000),
+             rng.randint(-3_000_000, 0)) for i in range(n)]
+
+@pytest.mark.parametrize("rows", [make_rows(400), make_rows(50, seed=9), [("1", "a", 0, 0, -1_000_000)]])
+def test_simulation_matches_reports_with_the_same_settings(rows):
+    simulation = PricingSimulation(rows)
+    for revenue_percentage, daily_fee_aud in scenario_grid([0, 12.5, 20, 100], [0, 0.05, 0.3, 2]):
+        report = build_report(VPP("VPP1", revenue_percentage, daily_fee_aud), "2025-09", rows)
+        scenario = simulation.evaluate(revenue_percentage, daily_fee_aud)
+        _, _, shares = compute_shares(rows, revenue_percentage, daily_fee_aud)
+        expected = dict(report["totals"], site_total_daily_fees=units_to_aud(shares.fees))
+        # fees are rounded once per scenario instead of once per site: within a unit per site, so within a cent
+        assert scenario["totals"] == pytest.approx(expected, abs=0.0101)
+        assert scenario["totals"]["vpp_ad_valorem_fee"] == report["totals"]["vpp_ad_valorem_fee"]
+        assert list(simulation.site_entries(revenue_percentage, daily_fee_aud)) == list(report["sites"].values())
+
+def test_simulation_counts_sites_at_the_fee_cap():
+    rows = [("1", "a", 0, 10_000_000, 0), ("2", "b", 0, 1_000_000, 0), ("3", "c", 0, -1_000_000, 0)]
+    simulation = PricingSimulation(rows)
+    # no capacity, so only the 80% part: shares 8, 0.8 and -0.8 of the 10 AUD remainder; month fee 0.05 * 28 = 1.4
+    scenario = simulation.evaluate(0, 0.05)
+    assert scenario["sites_at_fee_cap"] == 1
+    assert scenario["totals"]["site_total_daily_fees"] == 1.4 + 0.8
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_simulate_pricing_leaves_the_vpp_unchanged(backend, tmp_path):
+    utils = VPPUtils() if backend == "memory" else SQLiteVPPUtils(str(tmp_path / "vpp.db"))
+    utils.create_update_vpp("VPP1", 20.0, 0.3)
+    utils.create_update_site("VPP1", "111", "1 Test St")
+    utils.create_update_battery("111", "Tesla", "BAT1", 13.5)
+    events = tmp_path / "events.csv"
+    events.write_text("NMI,DATE,EVENT_TYPE,ENERGY,TARIFF\n111,2025-09-01,Charge,50,20\n", encoding="utf-8")
+    utils.import_events(str(events))
+    report = utils.create_report("VPP1", "2025-09")
+
+    simulation = utils.simulate_pricing("VPP1", "2025-09", scenario_grid([15, 20], [0.25, 0.3]))
+
+    assert [(s["revenue_percentage"], s["daily_fee_aud"]) for s in simulation["scenarios"]] == [
+        (15, 0.25), (15, 0.3), (20, 0.25), (20, 0.3)]
+    assert simulation["scenarios"][3]["totals"]["vpp_total_revenue"] == report["totals"]["vpp_total_revenue"]
+    assert utils.create_report("VPP1", "2025-09") == report
+    with pytest.raises(ValueError):
+        utils.simulate_pricing("VPP9", "2025-09", [(20, 0.3)])
@@ -0,0 +1,30 @@
+from utils.report_cache import ReportCache
+
+
+def test_report_cache_hits_and_misses():
+    cache = ReportCache(max_entries=2)
+    assert cache.get(("VPP1", "2025-09"), 1) is None
+
+    cache.put(("VPP1", "2025-09"), 1, {"vpp": "VPP1"})
+    assert cache.get(("VPP1", "2025-09"), 1) == {"vpp": "VPP1"}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_report_cache_drops_entry_on_version_change():
+    cache = ReportCache()
+    cache.put(("VPP1", "2025-09"), 1, {"vpp": "VPP1"})
+
+    assert cache.get(("VPP1", "2025-09"), 2) is None
+    assert len(cache) == 0
+    assert cache.invalidations == 1
+
+def test_report_cache_evicts_least_recently_used():
+    cache = ReportCache(max_entries=2)
+    cache.put(("A", "2025-09"), 1, {})
+    cache.put(("B", "2025-09"), 1, {})
+    cache.get(("A", "2025-09"), 1)
+    cache.put(("C", "2025-09"), 1, {})
+
+    assert cache.evictions == 1
+    assert cache.get(("B", "2025-09"), 1) is None
+    assert cache.get(("A", "2025-09"), 1) is not None
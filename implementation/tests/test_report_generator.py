@@ -0,0 +1,42 @@
+from service.report_generator import main, run_batch
+from utils.vpp_utils import VPPUtils
+from utils.metrics import NULL_METRICS
+
+
+def test_batch_runs_script_and_summarises(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "sites.csv").write_text("VPP_NAME,NMI,ADDRESS\nVPP1,111,1 Test St\nVPP1,222,2 Test St\n")
+    (tmp_path / "events.csv").write_text("NMI,DATE,EVENT_TYPE,ENERGY,TARIFF\n111,2025-09-01,Charge,5.0,20\n")
+    script = """# provisioning
+Create VPP: VPP1, 20, 0.5
+Load Sites: sites.csv
+Create Battery: 111, Tesla, B1, 13.5
+Create Battery: 999, Tesla, B2, 5
+Import Events: events.csv
+Bogus line
+Create Report: VPP1, 2025-09
+Exit
+Create VPP: Never, 1, 1
+"""
+    utils = VPPUtils()
+
+    failed = run_batch(utils, script.splitlines(), NULL_METRICS)
+
+    out = capsys.readouterr().out
+    assert failed == 2
+    assert "Created VPP" not in out
+    assert "Batch finished: 7 commands" in out
+    assert "  create battery: 1 ok, 1 failed" in out
+    assert "  load sites: 1 ok, 0 failed" in out
+    assert "line 5: Create Battery: 999, Tesla, B2, 5: Site with NMI 999 not found" in out
+    assert "line 7: Bogus line: Invalid command format" in out
+    assert "generated successfully" in out
+    assert "Never" not in utils.vpps
+    assert (tmp_path / "vpp_report.json").exists()
+
+
+def test_batch_mode_from_file(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "commands.txt").write_text("Create VPP: VPP1, 20, 0.5\nCreate Site: VPP1, 111, 1 Test St\n")
+    assert main(["--batch", "commands.txt"]) == 0
+    assert "  create site: 1 ok, 0 failed" in capsys.readouterr().out
@@ -0,0 +1,65 @@
+import random
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from utils import report_shards
+from utils.report_shards import ShardPool, compute_shares, split_shards
+
+
+def make_rows(n, seed=7):
+    rng = random.Random(seed)
+    return [(str(i), f"addr {i}", rng.choice([0, 5_000, 13_500]), rng.randint(-5_000_000, 50_000_000),
+             rng.randint(-3_000_000, 0)) for i in range(n)]
+
+def test_split_shards_keeps_site_order():
+    rows = make_rows(10)
+    shards = split_shards(rows, 3)
+    assert len(shards) == 3
+    assert [r for shard in shards for r in shard] == rows
+    assert split_shards([], 4) == []
+
+def test_sharded_shares_match_sequential_exactly():
+    rows = make_rows(500)
+    totals, margin, shares = compute_shares(rows, 20, 0.3)
+    workers = [ThreadPoolExecutor(max_workers=1) for _ in range(4)]
+    try:
+        p_totals, p_margin, p_shares = compute_shares(rows, 20, 0.3, workers)
+    finally:
+        for worker in workers:
+            worker.shutdown()
+
+    assert p_totals == totals
+    assert p_margin == margin
+    assert p_shares.fees == shares.fees
+    assert p_shares.revenue_after_fees == shares.revenue_after_fees
+    assert p_shares.sites == shares.sites
+    assert list(p_shares.sites) == [r[0] for r in rows]
+    # the workers let go of their shards once phase two is done
+    assert report_shards._resident_shards == {}
+
+def test_sharded_shares_free_the_shards_when_a_phase_fails(monkeypatch):
+    def fail(*args):
+        raise RuntimeError("coordinator failed between the phases")
+    monkeypatch.setattr(report_shards, "split_margin", fail)
+    workers = [ThreadPoolExecutor(max_workers=1) for _ in range(3)]
+    try:
+        with pytest.raises(RuntimeError):
+            compute_shares(make_rows(30), 20, 0.3, workers)
+    finally:
+        for worker in workers:
+            worker.shutdown()
+    assert report_shards._resident_shards == {}
+
+def test_shard_pool_is_only_used_for_large_reports():
+    pool = ShardPool(workers=2, min_sites=100)
+    assert pool.executors(None, 1000) == []
+    assert pool.executors(1, 1000) == []
+    assert pool.executors(2, 99) == []
+    try:
+        executors = pool.executors(2, 100)
+        assert len(executors) == 2
+        assert pool.executors(2, 5000) is executors
+        # a different number of workers restarts the pool
+        assert len(pool.executors(3, 5000)) == 3
+    finally:
+        pool.close()
+    assert pool._executors == []
@@ -0,0 +1,68 @@
+import gzip
+import json
+import pytest
+from utils.report_shards import build_report, stream_report
+from utils.report_writer import write_report
+from utils.vpp_utils import VPPUtils
+from models.data_class import VPP
+
+ROWS = [
+    ("111", "1 Test St", 13_500, 120_000_000, -3_000_000),
+    ("222", 'Unit "2", Test St', 5_000, 0, 0),
+    ("333", "3 Tëst St", 0, 7_250_000, 0),
+]
+
+
+@pytest.mark.parametrize("name", ["report.json", "report.json.gz"])
+def test_streamed_json_matches_built_report(tmp_path, name):
+    vpp = VPP("VPP1", 20.0, 0.3)
+    header, entries = stream_report(vpp, "2025-09", lambda: ROWS)
+    path = str(tmp_path / name)
+
+    assert write_report(path, header, entries) == 3
+
+    opener = gzip.open if name.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as fh:
+        assert json.load(fh) == build_report(vpp, "2025-09", ROWS)
+
+
+def test_streamed_report_reads_the_rows_in_passes_without_keeping_them():
+    vpp = VPP("VPP1", 20.0, 0.3)
+    passes = []
+
+    def rows():
+        passes.append(1)
+        # a generator, so nothing can be read from it twice or indexed
+        return (row for row in ROWS * 1000)
+
+    header, entries = stream_report(vpp, "2025-09", rows)
+    assert len(passes) == 3
+    expected = build_report(vpp, "2025-09", ROWS * 1000)
+    assert header == {"vpp": "VPP1", "month": "2025-09", "totals": expected["totals"]}
+    assert sum(1 for _ in entries) == 3000
+
+
+def test_streamed_ndjson_has_header_then_one_site_per_line(tmp_path):
+    vpp = VPP("VPP1", 20.0, 0.3)
+    path = str(tmp_path / "report.ndjson.gz")
+    write_report(path, *stream_report(vpp, "2025-09", lambda: ROWS))
+
+    with gzip.open(path, "rt", encoding="utf-8") as fh:
+        lines = [json.loads(line) for line in fh]
+    expected = build_report(vpp, "2025-09", ROWS)
+    assert lines[0] == {"vpp": "VPP1", "month": "2025-09", "totals": expected["totals"]}
+    assert lines[1:] == list(expected["sites"].values())
+
+
+def test_export_report_writes_the_same_report(tmp_path, capsys):
+    utils = VPPUtils()
+    utils.create_update_vpp("VPP1", 20.0, 0.3)
+    utils.create_update_site("VPP1", "111", "1 Test St")
+    utils.create_update_battery("111", "Tesla", "B1", 13.5)
+    path = str(tmp_path / "report.json")
+
+    assert utils.export_report("VPP1", "2025-09", path) == 1
+
+    assert "written to" in capsys.readouterr().out
+    with open(path, encoding="utf-8") as fh:
+        assert json.load(fh) == utils.create_report("VPP1", "2025-09")
@@ -0,0 +1,159 @@
+import asyncio
+import json
+from service.rest_api import VPPService
+from utils.metrics import Metrics
+from utils.vpp_utils import VPPUtils
+
+
+async def call(port, method, path, body=b"", headers=""):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    if isinstance(body, dict):
+        body = json.dumps(body).encode()
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: test\r\nConnection: close\r\n{headers}"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    response = await reader.read()
+    writer.close()
+    head, payload = response.split(b"\r\n\r\n", 1)
+    return int(head.split(b" ")[1]), json.loads(payload)
+
+def run_with_server(scenario):
+    async def main():
+        service = VPPService(VPPUtils())
+        server = await asyncio.start_server(service.handle_connection, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return await scenario(port, service)
+        finally:
+            server.close()
+            await server.wait_closed()
+    return asyncio.run(main())
+
+def test_rest_api_end_to_end():
+    async def scenario(port, service):
+        assert (await call(port, "POST", "/vpps", {"name": "VPP1", "revenue_percentage": 20, "daily_fee_aud": 0.3}))[0] == 201
+        assert (await call(port, "POST", "/sites", {"vpp_name": "VPP1", "nmi": "111", "address": "1 Test St"}))[0] == 201
+        status, site = await call(port, "POST", "/sites/111/batteries", {"manufacturer": "Tesla", "serial": "B1", "capacity_kwh": 13.5})
+        assert status == 201 and site["batteries"][0]["serial"] == "B1"
+
+        csv_body = b"NMI,DATE,EVENT_TYPE,ENERGY,TARIFF\n111,2025-09-01,Charge,5.0,20\n999,2025-09-02,Charge,1,1\n"
+        status, result = await call(port, "POST", "/import-events", csv_body)
+        assert status == 200
+        assert result["imported"] == 1 and result["skipped_by_reason"] == {"unknown_nmi": 1}
+
+        status, report = await call(port, "POST", "/generate-report/VPP1?month=2025-09")
+        assert status == 200
+        assert report == service.utils.create_report("VPP1", "2025-09")
+    run_with_server(scenario)
+
+def test_rest_api_updates_and_reassigns():
+    async def scenario(port, service):
+        await call(port, "POST", "/vpps", {"name": "VPP1", "revenue_percentage": 20})
+        await call(port, "POST", "/vpps", {"name": "VPP2", "revenue_percentage": 10})
+        await call(port, "POST", "/sites", {"vpp_name": "VPP1", "nmi": "111", "address": "1 Test St"})
+
+        status, vpp = await call(port, "PUT", "/vpps/VPP1", {"daily_fee_aud": 0.5})
+        assert status == 200 and vpp == {"name": "VPP1", "revenue_percentage": 20.0, "daily_fee_aud": 0.5}
+        status, site = await call(port, "POST", "/sites/111/assign-vpp/VPP2")
+        assert status == 200 and site["vpp_name"] == "VPP2" and site["address"] == "1 Test St"
+    run_with_server(scenario)
+
+def test_rest_api_removes_battery():
+    async def scenario(port, service):
+        await call(port, "POST", "/vpps", {"name": "VPP1", "revenue_percentage": 20})
+        await call(port, "POST", "/sites", {"vpp_name": "VPP1", "nmi": "111", "address": "1 Test St"})
+        await call(port, "POST", "/sites/111/batteries", {"manufacturer": "Tesla", "serial": "B1", "capacity_kwh": 13.5})
+
+        status, site = await call(port, "DELETE", "/sites/111/batteries/B1")
+        assert status == 200 and site["batteries"] == []
+        assert (await call(port, "DELETE", "/sites/111/batteries/B1"))[0] == 404
+        assert (await call(port, "DELETE", "/sites/999/batteries/B1"))[0] == 404
+    run_with_server(scenario)
+
+def test_rest_api_errors():
+    async def scenario(port, service):
+        assert (await call(port, "POST", "/sites", {"vpp_name": "nope", "nmi": "1", "address": "a"}))[0] == 404
+        assert (await call(port, "POST", "/vpps", {"name": "VPP1"}))[0] == 400
+        assert (await call(port, "POST", "/vpps", {"name": "VPP1", "revenue_percentage": float("nan")}))[0] == 400
+        assert (await call(port, "POST", "/vpps", {"name": "VPP1", "revenue_percentage": 20}))[0] == 201
+        assert (await call(port, "PUT", "/vpps/VPP1", {"daily_fee_aud": float("inf")}))[0] == 400
+        assert (await call(port, "POST", "/vpps", b"{not json"))[0] == 400
+        assert (await call(port, "GET", "/vpps"))[0] == 405
+        assert (await call(port, "GET", "/unknown"))[0] == 404
+    run_with_server(scenario)
+
+def test_rest_api_answers_unexpected_errors_with_500(caplog):
+    async def scenario(port, service):
+        await call(port, "POST", "/vpps", {"name": "VPP1", "revenue_percentage": 20})
+
+        def fail(*args, **kwargs):
+            raise OverflowError("cannot convert float infinity to integer")
+        service.utils.create_report = fail
+        status, payload = await call(port, "POST", "/generate-report/VPP1?month=2025-09")
+        assert status == 500 and payload == {"error": "Internal Server Error"}
+        # the service carries on serving requests
+        assert (await call(port, "PUT", "/vpps/VPP1", {"revenue_percentage": 10}))[0] == 200
+    run_with_server(scenario)
+    assert "POST /generate-report/VPP1 failed" in caplog.text
+
+def test_rest_api_streams_chunked_import():
+    async def scenario(port, service):
+        await call(port, "POST", "/vpps", {"name": "VPP1", "revenue_percentage": 20})
+        await call(port, "POST", "/sites", {"vpp_name": "VPP1", "nmi": "111", "address": "1 Test St"})
+        rows = b"NMI,DATE,EVENT_TYPE,ENERGY,TARIFF\n" + b"111,2025-09-01,Charge,1,1\n" * 1000
+        pieces = [rows[i:i + 777] for i in range(0, len(rows), 777)]
+        body = b"".join(b"%x\r\n%s\r\n" % (len(p), p) for p in pieces) + b"0\r\n\r\n"
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"POST /import-events HTTP/1.1\r\nHost: test\r\nTransfer-Encoding: chunked\r\n\r\n" + body)
+        head = await reader.readuntil(b"\r\n\r\n")
+        length = int(head.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+        result = json.loads(await reader.readexactly(length))
+        writer.close()
+        assert result["imported"] == 1000
+        assert len(service.utils.sites["111"].events) == 1000
+    run_with_server(scenario)
+
+def test_rest_api_serves_metrics():
+    async def scenario(port, service):
+        assert (await call(port, "GET", "/metrics"))[0] == 404
+        service.utils.metrics = Metrics()
+        await call(port, "POST", "/vpps", {"name": "VPP1", "revenue_percentage": 20, "daily_fee_aud": 0.3})
+        await call(port, "POST", "/sites", {"vpp_name": "VPP1", "nmi": "111", "address": "1 Test St"})
+        await call(port, "POST", "/import-events", b"NMI,DATE,EVENT_TYPE,ENERGY,TARIFF\n111,2025-09-01,Charge,5.0,20\n")
+        await call(port, "POST", "/generate-report/VPP1?month=2025-09")
+        status, metrics = await call(port, "GET", "/metrics")
+        assert status == 200
+        assert metrics["counters"]["import_rows_imported_total"] == 1
+        assert metrics["histograms"]["create_report_seconds"]["count"] == 1
+    run_with_server(scenario)
+
+def test_rest_api_reports_include_followed_events(tmp_path):
+    events_file = tmp_path / "events.csv"
+    events_file.write_text("NMI,DATE,EVENT_TYPE,ENERGY,TARIFF\n", encoding="utf-8")
+
+    async def scenario(port, service):
+        await call(port, "POST", "/vpps", {"name": "VPP1", "revenue_percentage": 20})
+        await call(port, "POST", "/sites", {"vpp_name": "VPP1", "nmi": "111", "address": "1 Test St"})
+        following = asyncio.create_task(service.follow_events(str(events_file), poll_seconds=0.01))
+        try:
+            with open(events_file, "a", encoding="utf-8") as fh:
+                fh.write("111,2025-09-01,Charge,5.0,20\n")
+            for _ in range(200):
+                status, report = await call(port, "POST", "/generate-report/VPP1?month=2025-09")
+                if report["totals"]["total_revenue"]:
+                    break
+                await asyncio.sleep(0.01)
+            assert report["totals"]["total_revenue"] == 1.0
+        finally:
+            following.cancel()
+    run_with_server(scenario)
+
+def test_rest_api_simulates_pricing():
+    async def scenario(port, service):
+        await call(port, "POST", "/vpps", {"name": "VPP1", "revenue_percentage": 20})
+        await call(port, "POST", "/sites", {"vpp_name": "VPP1", "nmi": "111", "address": "1 Test St"})
+        status, simulation = await call(port, "POST", "/simulate-pricing/VPP1?month=2025-09",
+                                        {"revenue_percentages": [15, 20], "daily_fees_aud": [0.3]})
+        assert status == 200 and len(simulation["scenarios"]) == 2
+        status, _ = await call(port, "POST", "/simulate-pricing/VPP1?month=2025-09", {"revenue_percentages": [15]})
+        assert status == 400
+    run_with_server(scenario)
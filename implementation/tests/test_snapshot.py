@@ -0,0 +1,67 @@
+from datetime import date
+import pytest
+from models.data_class import Event, EventType, month_key
+from utils.vpp_utils import VPPUtils
+
+@pytest.fixture
+def populated(capsys):
+    utils = VPPUtils()
+    utils.create_update_vpp("VPP1", 20.0, 0.3)
+    utils.create_update_vpp("VPP2", 10.0, 0.1)
+    utils.create_update_site("VPP1", "111", "1 Test St, Newcastle")
+    utils.create_update_site("VPP2", "222", "2 Tëst St")
+    utils.create_update_battery("111", "Tesla", "BAT1", 13.5)
+    utils.create_update_battery("222", "Sonnen", "BAT2", 6.5)
+    utils.sites["111"].events.append(Event("111", date(2025, 9, 1), EventType.DISCHARGE, 10, 300))
+    utils.sites["111"].events.append(Event("111", date(2025, 10, 1), EventType.DISCHARGE, 3, -20))
+    utils.sites["222"].events.append(Event("222", date(2025, 9, 2), EventType.CHARGE, 5, 20))
+    return utils
+
+def test_snapshot_round_trip(populated, tmp_path):
+    path = str(tmp_path / "state.snap")
+    populated.save_snapshot(path)
+
+    loaded = VPPUtils()
+    loaded.load_snapshot(path)
+
+    assert loaded.vpps.keys() == populated.vpps.keys()
+    assert loaded.sites["222"].address == "2 Tëst St"
+    assert loaded.sites["111"].batteries == populated.sites["111"].batteries
+    assert list(loaded.sites["111"].events) == list(populated.sites["111"].events)
+    assert loaded.sites["111"].events.totals == populated.sites["111"].events.totals
+    for month in ("2025-09", "2025-10"):
+        assert loaded.create_report("VPP1", month) == populated.create_report("VPP1", month)
+
+def test_snapshot_events_are_memory_mapped_and_copied_on_write(populated, tmp_path):
+    path = str(tmp_path / "state.snap")
+    populated.save_snapshot(path)
+    loaded = VPPUtils()
+    loaded.load_snapshot(path)
+    block = loaded.sites["111"].events.month(month_key(2025, 9))
+    assert isinstance(block.energies, memoryview)
+
+    loaded.sites["111"].events.append(Event("111", date(2025, 9, 3), EventType.CHARGE, 1, 100))
+
+    assert list(block.energies) == [10.0, 1.0]
+    assert loaded.create_report("VPP1", "2025-09")["totals"]["total_revenue"] == 31
+
+def test_snapshot_can_be_saved_over_the_loaded_one(populated, tmp_path):
+    path = str(tmp_path / "state.snap")
+    populated.save_snapshot(path)
+    loaded = VPPUtils()
+    loaded.load_snapshot(path)
+    loaded.sites["111"].events.append(Event("111", date(2025, 9, 3), EventType.CHARGE, 1, 100))
+
+    loaded.save_snapshot(path)
+    reloaded = VPPUtils()
+    reloaded.load_snapshot(path)
+
+    assert list(loaded.sites["111"].events)[0].energy_kwh == 10
+    assert list(reloaded.sites["111"].events) == list(loaded.sites["111"].events)
+    assert reloaded.create_report("VPP1", "2025-09") == loaded.create_report("VPP1", "2025-09")
+
+def test_load_snapshot_rejects_other_files(tmp_path):
+    path = tmp_path / "not_a_snapshot"
+    path.write_bytes(b"\0" * 128)
+    with pytest.raises(ValueError):
+        VPPUtils().load_snapshot(str(path))
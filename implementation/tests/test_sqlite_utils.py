@@ -0,0 +1,125 @@
+import json
+import sqlite3
+import pytest
+from utils.sqlite_utils import SQLiteVPPUtils
+from utils.vpp_utils import VPPUtils
+
+CSV_CONTENT = """NMI,DATE,EVENT_TYPE,ENERGY,TARIFF
+111,2025-09-01,Charge,5.0,20
+111,2025-09-02,Discharge,3.0,-25
+222,2025-09-03,Discharge,12.0,300
+222,2025-10-03,Discharge,12.0,300
+999,2025-09-03,Charge,2.0,15
+111,2025-09-04,InvalidType,1.0,10
+"""
+
+def populate(utils, events_file):
+    utils.create_update_vpp("VPP1", 20.0, 0.3)
+    utils.create_update_vpp("VPP2", 10.0, 0.1)
+    utils.create_update_site("VPP1", "111", "1 Test St")
+    utils.create_update_site("VPP1", "222", "2 Test St")
+    utils.create_update_site("VPP2", "333", "3 Test St")
+    utils.create_update_battery("111", "Tesla", "BAT1", 13.5)
+    utils.create_update_battery("222", "Tesla", "BAT2", 5.0)
+    utils.create_update_battery("222", "TeslaX", "BAT2", 6.5)
+    return utils.import_events(events_file)
+
+@pytest.fixture
+def events_file(tmp_path):
+    path = tmp_path / "events.csv"
+    path.write_text(CSV_CONTENT, encoding="utf-8")
+    return str(path)
+
+@pytest.fixture
+def sqlite_utils(tmp_path):
+    utils = SQLiteVPPUtils(str(tmp_path / "vpp.db"))
+    yield utils
+    utils.close()
+
+def test_sqlite_report_matches_in_memory_report(sqlite_utils, events_file):
+    memory_utils = VPPUtils()
+    assert populate(sqlite_utils, events_file) == populate(memory_utils, events_file)
+
+    for vpp_name in ("VPP1", "VPP2"):
+        assert sqlite_utils.create_report(vpp_name, "2025-09") == memory_utils.create_report(vpp_name, "2025-09")
+    assert sqlite_utils.create_reports("2025-10") == memory_utils.create_reports("2025-10")
+
+def test_backends_skip_the_same_out_of_bounds_event_rows(sqlite_utils, tmp_path):
+    path = tmp_path / "bad.csv"
+    path.write_text(CSV_CONTENT + "111,2025-09-05,Charge,nan,20\n111,2025-09-05,Charge,inf,20\n"
+                                  "111,2025-09-05,Charge,1e20,20\n", encoding="utf-8")
+    memory_utils = VPPUtils()
+    result = populate(memory_utils, str(path))
+    assert populate(sqlite_utils, str(path)) == result
+    assert result.skipped_by_reason["invalid_number"] == 3
+    assert sqlite_utils.create_report("VPP1", "2025-09") == memory_utils.create_report("VPP1", "2025-09")
+    # the accepted values fit the snapshot's integer columns
+    memory_utils.save_snapshot(str(tmp_path / "state.snap"))
+
+def test_sqlite_state_survives_reopening(tmp_path, events_file, capsys):
+    db_path = str(tmp_path / "vpp.db")
+    utils = SQLiteVPPUtils(db_path)
+    populate(utils, events_file)
+    report = utils.create_report("VPP1", "2025-09")
+    utils.close()
+
+    reopened = SQLiteVPPUtils(db_path)
+    assert reopened.create_report("VPP1", "2025-09") == report
+    reopened.create_update_vpp("VPP1", 25.0, 0.3)
+    assert "Updated VPP 'VPP1'" in capsys.readouterr().out
+    reopened.close()
+
+def test_sqlite_validates_parents(sqlite_utils):
+    with pytest.raises(ValueError) as excinfo:
+        sqlite_utils.create_update_site("NonExistentVPP", "1234567890", "Test Address")
+    assert "VPP 'NonExistentVPP' not found" in str(excinfo.value)
+
+    with pytest.raises(ValueError) as excinfo:
+        sqlite_utils.create_update_battery("9999999999", "TestManu", "BAT123", 5.0)
+    assert "Site with NMI 9999999999 not found" in str(excinfo.value)
+
+    with pytest.raises(ValueError) as excinfo:
+        sqlite_utils.create_update_vpp("VPP1", float("nan"), 0.5)
+    assert "Invalid VPP settings" in str(excinfo.value)
+    assert sqlite_utils._vpp("VPP1") is None
+
+def test_sqlite_remove_battery(sqlite_utils, capsys):
+    sqlite_utils.create_update_vpp("VPP1", 20.0, 0.5)
+    sqlite_utils.create_update_site("VPP1", "111", "Test Address")
+    sqlite_utils.create_update_battery("111", "Tesla", "B1", 10.0)
+    sqlite_utils.remove_battery("111", "B1")
+    assert "Removed Battery serial=B1 from site 111" in capsys.readouterr().out
+    assert sqlite_utils.create_report("VPP1", "2025-09")["sites"]["111"]["site_capacity_kwh"] == 0
+    with pytest.raises(ValueError) as excinfo:
+        sqlite_utils.remove_battery("111", "B1")
+    assert "Battery serial=B1 not found at site 111" in str(excinfo.value)
+
+def test_sqlite_range_report_matches_in_memory_report(sqlite_utils, events_file):
+    memory_utils = VPPUtils()
+    populate(memory_utils, events_file)
+    populate(sqlite_utils, events_file)
+    expected = memory_utils.create_range_report("VPP1", "2025-08", "2025-10")
+    assert sqlite_utils.create_range_report("VPP1", "2025-08", "2025-10") == expected
+    assert expected["totals"]["total_revenue"] == sum(m["totals"]["total_revenue"] for m in expected["months"].values())
+
+def test_sqlite_export_report_matches_create_report(sqlite_utils, events_file, tmp_path):
+    populate(sqlite_utils, events_file)
+    path = str(tmp_path / "report.json")
+    assert sqlite_utils.export_report("VPP1", "2025-09", path) == 2
+    with open(path, encoding="utf-8") as fh:
+        assert json.load(fh) == sqlite_utils.create_report("VPP1", "2025-09")
+
+def test_sqlite_fills_event_values_of_an_older_database(tmp_path, events_file):
+    db_path = str(tmp_path / "vpp.db")
+    utils = SQLiteVPPUtils(db_path)
+    populate(utils, events_file)
+    expected = utils.create_report("VPP1", "2025-09")
+    utils.close()
+    # drop the value_units column, as in a database created before it existed
+    conn = sqlite3.connect(db_path)
+    conn.execute("ALTER TABLE events DROP COLUMN value_units")
+    conn.close()
+
+    reopened = SQLiteVPPUtils(db_path)
+    assert reopened.create_report("VPP1", "2025-09") == expected
+    reopened.close()
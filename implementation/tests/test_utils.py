@@ -30,6 +30,15 @@ def test_create_update_vpp(utils, capsys):
     assert utils.vpps["VPP1"].revenue_percentage == 25.0
     assert utils.vpps["VPP1"].daily_fee_aud == 0.8
 
+def test_create_update_vpp_rejects_settings_that_are_not_finite(utils):
+    setup_for_create_report(utils, "VPP1", "111", 10)
+    for revenue_percentage, daily_fee_aud in ((float("nan"), 0.5), (20.0, float("inf"))):
+        with pytest.raises(ValueError) as excinfo:
+            utils.create_update_vpp("VPP1", revenue_percentage, daily_fee_aud)
+        assert "Invalid VPP settings" in str(excinfo.value)
+    assert (utils.vpps["VPP1"].revenue_percentage, utils.vpps["VPP1"].daily_fee_aud) == (10.0, 0.5)
+    assert utils.create_report("VPP1", "2025-09")["vpp"] == "VPP1"
+
 def test_create_update_site_raises_error_for_missing_vpp(utils):
 
     with pytest.raises(ValueError) as excinfo:
@@ -109,11 +118,12 @@ def test_import_events(utils, capsys):
     with open(csv_file, "w", encoding="utf-8") as f:
         f.write(csv_content)
 
-    utils.import_events(str(csv_file))
+    result = utils.import_events(str(csv_file))
 
     captured = capsys.readouterr()
     print(captured.out)
     assert "Imported=2, Skipped=2" in captured.out
+    assert result.as_dict()["skipped_by_reason"] == {"unknown_nmi": 1, "invalid_event_type": 1}
 
     site = utils.sites["1234567890"]
     assert len(site.events) == 2
@@ -205,4 +215,210 @@ def test_create_report_site_has_positive_revenue_after_fees(utils):
 
     assert report["totals"]["total_revenue"] == 50
     assert report["totals"]["vpp_total_revenue"] == 19
-    assert report["sites"]["111"]["site_revenue_after_fees"] == 31
\ No newline at end of file
+    assert report["sites"]["111"]["site_revenue_after_fees"] == 31
+
+
+def test_import_events_from_directory_in_parallel(utils, tmp_path, capsys):
+    utils.create_update_vpp("VPP1", revenue_percentage=10.0, daily_fee_aud=0.5)
+    utils.create_update_site("VPP1", "111", "Test Address")
+    for day in range(1, 5):
+        (tmp_path / f"events_{day}.csv").write_text(
+            "NMI,DATE,EVENT_TYPE,ENERGY,TARIFF\n"
+            f"111,2025-09-0{day},Charge,{day},20\n"
+            f"999,2025-09-0{day},Charge,1,20\n", encoding="utf-8")
+
+    result = utils.import_events(str(tmp_path), workers=2)
+
+    assert "Imported=4, Skipped=4" in capsys.readouterr().out
+    assert result.skipped_by_reason == {"unknown_nmi": 4}
+    # merged in file order whatever worker parsed each file
+    assert [e.energy_kwh for e in utils.sites["111"].events] == [1, 2, 3, 4]
+
+
+def test_create_report_follows_site_reassigned_to_another_vpp(utils):
+    site = setup_for_create_report(utils, "VPP1", "555", 10)
+    site.events.append(Event("555", date(2025, 9, 1), EventType.CHARGE, 10, 500))
+    utils.create_update_vpp("VPP2", revenue_percentage=10.0, daily_fee_aud=0.5)
+
+    utils.create_update_site("VPP2", "555", "Test Addr")
+
+    assert utils.create_report("VPP1", "2025-09") is None
+    assert utils.create_report("VPP2", "2025-09")["totals"]["total_revenue"] == 50
+
+
+def test_create_report_is_cached_until_its_inputs_change(utils):
+    site = setup_for_create_report(utils, "VPP1", "666", 10)
+    other = setup_for_create_report(utils, "VPP2", "777", 10)
+    site.events.append(Event("666", date(2025, 9, 1), EventType.CHARGE, 10, 500))
+
+    first = utils.create_report("VPP1", "2025-09")
+    assert utils.create_report("VPP1", "2025-09") is first
+
+    # events of another VPP or another month leave the cached report alone
+    other.events.append(Event("777", date(2025, 9, 1), EventType.CHARGE, 10, 500))
+    site.events.append(Event("666", date(2025, 10, 1), EventType.CHARGE, 10, 500))
+    assert utils.create_report("VPP1", "2025-09") is first
+    assert utils.report_cache.stats()["hits"] == 2
+
+    site.events.append(Event("666", date(2025, 9, 2), EventType.CHARGE, 10, 500))
+    assert utils.create_report("VPP1", "2025-09")["totals"]["total_revenue"] == 100
+
+    utils.create_update_vpp("VPP1", revenue_percentage=20.0, daily_fee_aud=0.5)
+    assert utils.create_report("VPP1", "2025-09")["totals"]["vpp_ad_valorem_fee"] == 20
+
+
+def test_cached_reports_are_shared_read_only(utils):
+    site = setup_for_create_report(utils, "VPP1", "666", 10)
+    site.events.append(Event("666", date(2025, 9, 1), EventType.CHARGE, 10, 500))
+
+    # no copy is made on a hit, callers and range reports get the cached dict itself
+    report = utils.create_report("VPP1", "2025-09")
+    statement = utils.create_range_report("VPP1", "2025-09", "2025-10")
+    assert statement["months"]["2025-09"] is report
+    assert utils.create_reports("2025-09")["VPP1"] is report
+
+    # so a caller that needs to change a report works on a copy
+    edited = dict(report, totals=dict(report["totals"], total_revenue=0))
+    assert utils.create_report("VPP1", "2025-09")["totals"]["total_revenue"] == 50
+    assert edited["totals"]["total_revenue"] == 0
+
+
+def test_create_reports_for_every_vpp_matches_single_reports(utils):
+    a = setup_for_create_report(utils, "VPP1", "A", 5)
+    b = setup_for_create_report(utils, "VPP2", "B", 15)
+    setup_for_create_report(utils, "VPP2", "C", 10)
+    utils.create_update_vpp("EMPTY", 5, 1.0)
+    a.events.append(Event("A", date(2025, 9, 1), EventType.DISCHARGE, 10, 500))
+    b.events.append(Event("B", date(2025, 9, 1), EventType.CHARGE, 5, 300))
+
+    reports = utils.create_reports("2025-09")
+
+    assert sorted(reports) == ["VPP1", "VPP2"]
+    fresh = VPPUtils()
+    fresh.vpps, fresh.sites = utils.vpps, utils.sites
+    for vpp_name, report in reports.items():
+        assert report == fresh.create_report(vpp_name, "2025-09")
+    assert list(reports["VPP2"]["sites"]) == ["B", "C"]
+    # built once, then served from the cache
+    assert utils.create_reports("2025-09") == reports
+    stats = utils.report_cache.stats()
+    assert (stats["entries"], stats["misses"], stats["hits"]) == (2, 2, 2)
+
+
+def test_create_report_sharded_across_processes_matches_sequential(utils):
+    for i in range(6):
+        site = setup_for_create_report(utils, "VPP1", f"S{i}", 5 + i)
+        site.events.append(Event(f"S{i}", date(2025, 9, 1), EventType.DISCHARGE, 10 + i, 300 + i))
+
+    sequential = utils.create_report("VPP1", "2025-09")
+    utils.report_cache.clear()
+    # below the site threshold the report stays in process
+    assert utils.create_report("VPP1", "2025-09", workers=3) == sequential
+    assert utils.shard_pool._executors == []
+
+    utils.shard_pool.min_sites = 1
+    try:
+        utils.report_cache.clear()
+        assert utils.create_report("VPP1", "2025-09", workers=3) == sequential
+        workers = utils.shard_pool._executors
+        assert len(workers) == 3
+        # the next report reuses the worker processes
+        utils.report_cache.clear()
+        assert utils.create_report("VPP1", "2025-09", workers=3) == sequential
+        assert utils.shard_pool._executors is workers
+    finally:
+        utils.close()
+    assert utils.shard_pool._executors == []
+
+
+def test_site_reassignment_moves_membership_and_capacity(utils):
+    setup_for_create_report(utils, "VPP1", "555", 10)
+    setup_for_create_report(utils, "VPP1", "666", 5)
+    utils.create_update_vpp("VPP2", revenue_percentage=10.0, daily_fee_aud=0.5)
+    assert utils.vpps["VPP1"].capacity_kwh == 15
+
+    utils.create_update_site("VPP2", "555", "Test Addr")
+
+    assert list(utils.vpps["VPP1"].sites) == ["666"]
+    assert list(utils.vpps["VPP2"].sites) == ["555"]
+    assert utils.vpps["VPP1"].capacity_kwh == 5
+    assert utils.vpps["VPP2"].capacity_kwh == 10
+
+
+def test_battery_changes_update_cached_capacity(utils, capsys):
+    utils.create_update_vpp("VPP1", 20.0, 0.5)
+    utils.create_update_site("VPP1", "111", "Test Address")
+    utils.create_update_battery("111", "Tesla", "B1", 10.0)
+    utils.create_update_battery("111", "Tesla", "B2", 5.0)
+    utils.create_update_battery("111", "Tesla", "B1", 12.0)
+    site = utils.sites["111"]
+    assert site.battery("B1").capacity_kwh == 12.0
+    assert site.capacity_kwh == utils.vpps["VPP1"].capacity_kwh == 17.0
+
+    utils.create_update_battery("111", "Tesla", "B3", 1.0)
+    report = utils.create_report("VPP1", "2025-09")
+    assert report["sites"]["111"]["site_capacity_kwh"] == 18.0
+
+    utils.remove_battery("111", "B1")
+    assert "Removed Battery serial=B1 from site 111" in capsys.readouterr().out
+    assert [b.serial for b in site.batteries] == ["B2", "B3"]
+    assert site.battery("B1") is None
+    assert site.capacity_kwh == utils.vpps["VPP1"].capacity_kwh == 6.0
+    # the cached report is invalidated by the removal
+    assert utils.create_report("VPP1", "2025-09")["sites"]["111"]["site_capacity_kwh"] == 6.0
+
+    with pytest.raises(ValueError) as excinfo:
+        utils.remove_battery("111", "B1")
+    assert "Battery serial=B1 not found at site 111" in str(excinfo.value)
+
+
+@pytest.mark.parametrize("capacity_kwh", [float("nan"), float("inf"), -1.0, 1e20])
+def test_invalid_battery_capacity_leaves_the_site_unchanged(utils, capacity_kwh):
+    utils.create_update_vpp("VPP1", 20.0, 0.5)
+    utils.create_update_site("VPP1", "111", "Test Address")
+    utils.create_update_battery("111", "Tesla", "B1", 10.0)
+    with pytest.raises(ValueError) as excinfo:
+        utils.create_update_battery("111", "Tesla", "B2", capacity_kwh)
+    assert "Invalid battery capacity" in str(excinfo.value)
+    with pytest.raises(ValueError):
+        utils.create_update_battery("111", "Tesla", "B1", capacity_kwh)
+    site = utils.sites["111"]
+    assert [(b.serial, b.capacity_kwh) for b in site.batteries] == [("B1", 10.0)]
+
+    # a bad battery put on the list directly is refused before the list changes
+    with pytest.raises(ValueError):
+        site.batteries.append(Battery("Tesla", "B2", float("nan")))
+    with pytest.raises((ValueError, OverflowError)):
+        site.update_battery("B1", "Tesla", float("inf"))
+    assert [(b.serial, b.capacity_kwh) for b in site.batteries] == [("B1", 10.0)]
+
+    # the site still takes changes afterwards
+    utils.create_update_battery("111", "Tesla", "B2", 5.0)
+    utils.remove_battery("111", "B1")
+    assert site.capacity_kwh == utils.vpps["VPP1"].capacity_kwh == 5.0
+
+
+def test_create_range_report_matches_monthly_reports(utils):
+    a = setup_for_create_report(utils, "VPP1", "A", 5)
+    b = setup_for_create_report(utils, "VPP1", "B", 15)
+    a.events.append(Event("A", date(2025, 11, 3), EventType.DISCHARGE, 10, 500))
+    b.events.append(Event("B", date(2025, 12, 30), EventType.CHARGE, 5, 300))
+    b.events.append(Event("B", date(2026, 1, 2), EventType.DISCHARGE, 4, -100))
+    b.events.append(Event("B", date(2026, 2, 1), EventType.CHARGE, 5, 300))
+
+    report = utils.create_range_report("VPP1", "2025-11", "2026-01")
+
+    assert report["month"] == "2025-11..2026-01"
+    assert list(report["months"]) == ["2025-11", "2025-12", "2026-01"]
+    fresh = VPPUtils()
+    fresh.vpps, fresh.sites = utils.vpps, utils.sites
+    monthly = [fresh.create_report("VPP1", month) for month in report["months"]]
+    assert list(report["months"].values()) == monthly
+    assert report["totals"]["total_revenue"] == round(sum(m["totals"]["total_revenue"] for m in monthly), 2) == 65
+    assert report["totals"]["vpp_cost_only"] == -4
+    assert report["sites"]["B"]["site_daily_fee"] == round(sum(m["sites"]["B"]["site_daily_fee"] for m in monthly), 2)
+    assert utils.last_report is report
+
+    with pytest.raises(ValueError) as excinfo:
+        utils.create_range_report("VPP1", "2026-01", "2025-11")
+    assert "first month is after the last" in str(excinfo.value)
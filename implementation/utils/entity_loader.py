@@ -0,0 +1,69 @@
+# Bulk loaders for sites and batteries
+# A sites file has the columns VPP_NAME, NMI, ADDRESS and a batteries file
+# NMI, MANUFACTURER, SERIAL, CAPACITY_KWH (any order, extra columns ignored).
+# Rows are validated up front: rejected rows are tallied by reason on the
+# ImportResult, like event imports, and the accepted rows are returned for the
+# backend to upsert in one go, without a confirmation per entity.
+import csv
+from typing import Container, Iterator, List, Sequence, Tuple
+from models.data_class import ImportResult
+from models.money import valid_capacity_kwh
+
+SITE_COLUMNS = ("VPP_NAME", "NMI", "ADDRESS")
+BATTERY_COLUMNS = ("NMI", "MANUFACTURER", "SERIAL", "CAPACITY_KWH")
+
+SiteLoadRow = Tuple[str, str, str]
+BatteryLoadRow = Tuple[str, str, str, float]
+
+
+def read_entity_rows(file_path: str, columns: Sequence[str], result: ImportResult) -> Iterator[List[str]]:
+    """Yield the stripped `columns` values of every row of a CSV file."""
+    with open(file_path, encoding="utf-8-sig", newline="") as fh:
+        rows = csv.reader(fh)
+        names = [h.strip().upper() for h in next(rows, [])]
+        missing = [c for c in columns if c not in names]
+        if missing:
+            raise ValueError(f"{file_path} is missing columns: {', '.join(missing)}")
+        indexes = [names.index(c) for c in columns]
+        for row in rows:
+            if not row:
+                continue
+            try:
+                yield [row[i].strip() for i in indexes]
+            except IndexError:
+                result.skip("malformed_row")
+
+
+def read_site_rows(file_path: str, vpp_names: Container[str], result: ImportResult) -> List[SiteLoadRow]:
+    accepted = []
+    for vpp_name, nmi, address in read_entity_rows(file_path, SITE_COLUMNS, result):
+        if not nmi:
+            result.skip("missing_nmi")
+        elif vpp_name not in vpp_names:
+            result.skip("unknown_vpp")
+        else:
+            accepted.append((vpp_name, nmi, address))
+    result.imported += len(accepted)
+    return accepted
+
+
+def read_battery_rows(file_path: str, site_nmis: Container[str], result: ImportResult) -> List[BatteryLoadRow]:
+    accepted = []
+    for nmi, manufacturer, serial, capacity in read_entity_rows(file_path, BATTERY_COLUMNS, result):
+        if nmi not in site_nmis:
+            result.skip("unknown_nmi")
+            continue
+        if not serial:
+            result.skip("missing_serial")
+            continue
+        try:
+            capacity_kwh = float(capacity)
+        except ValueError:
+            result.skip("invalid_number")
+            continue
+        if not valid_capacity_kwh(capacity_kwh):
+            result.skip("invalid_number")
+            continue
+        accepted.append((nmi, manufacturer, serial, capacity_kwh))
+    result.imported += len(accepted)
+    return accepted
@@ -0,0 +1,94 @@
+# Follow mode for event imports
+# An EventFollower watches a file, a directory of *.csv files or a glob pattern
+# and, on every `poll`, imports only the rows appended since the previous one.
+# Each file is read through a ResumableImport: its byte position is kept
+# between polls and its checkpoint is committed with every micro-batch to the
+# backend's store, so rows already imported are never read again. The store
+# lives as long as the events: in memory (saved in snapshots) for VPPUtils, in
+# the database for SQLite, so after a restart a follower carries on from the
+# events that survived it, and no files are written to the watched directory.
+# A line is only parsed once its newline has arrived. Files that appear in a
+# watched directory are picked up on the next poll; a file that is replaced or
+# truncated is reported and no longer followed.
+import time
+from typing import Callable, Container, Dict, Iterable, Optional, Set
+from models.data_class import ImportResult
+from utils.event_ingest import EventBatch, resolve_event_files
+from utils.import_checkpoint import ResumableImport
+from utils.metrics import NULL_METRICS
+
+# small reads so each micro-batch reaches the reports quickly
+FOLLOW_CHUNK_BYTES = 256 * 1024
+DEFAULT_POLL_SECONDS = 1.0
+
+# applies a batch and commits the job's checkpoint along with it
+ApplyBatch = Callable[[ResumableImport, EventBatch], None]
+
+
+class EventFollower:
+
+    def __init__(self, path: str, known_nmis: Container[str], store, apply_batch: ApplyBatch,
+                 chunk_bytes: int = FOLLOW_CHUNK_BYTES, metrics=NULL_METRICS):
+        self.path = path
+        self.known_nmis = known_nmis
+        self.store = store
+        self.apply_batch = apply_batch
+        self.chunk_bytes = chunk_bytes
+        self.metrics = metrics
+        self.jobs: Dict[str, ResumableImport] = {}
+        # files that were replaced or truncated under us
+        self.stopped: Set[str] = set()
+
+    def files(self) -> Iterable[str]:
+        try:
+            return resolve_event_files(self.path)
+        except FileNotFoundError:
+            # an empty drop directory, nothing has arrived yet
+            return []
+
+    def poll(self) -> ImportResult:
+        """Import the rows appended since the last poll; returns the counts of this poll only."""
+        result = ImportResult()
+        started = time.perf_counter()
+        for path in self.files():
+            if path in self.stopped:
+                continue
+            try:
+                job = self.jobs.get(path)
+                if job is None:
+                    job = self.jobs[path] = ResumableImport(path, self.known_nmis, self.store, self.chunk_bytes,
+                                                            self.metrics)
+                    if job.resumed_from:
+                        print(f"Following {path} from byte {job.resumed_from} (row {job.checkpoint.rows})")
+                before = ImportResult(job.result.imported, job.result.skipped, dict(job.result.skipped_by_reason))
+                for batch in job.tail():
+                    if job.parser.consumed != job.checkpoint.offset:
+                        self.apply_batch(job, batch)
+            except (FileNotFoundError, ValueError) as e:
+                print(f"Stopped following {path}: {e}")
+                self.stopped.add(path)
+                self.jobs.pop(path, None)
+                continue
+            result.merge(_difference(job.result, before))
+        result.elapsed_s = time.perf_counter() - started
+        return result
+
+    def run(self, on_poll: Callable[[ImportResult], None], poll_seconds: float = DEFAULT_POLL_SECONDS,
+            max_polls: Optional[int] = None):
+        """Poll every `poll_seconds` until interrupted (or `max_polls` polls), handing each result to `on_poll`."""
+        polls = 0
+        try:
+            while max_polls is None or polls < max_polls:
+                on_poll(self.poll())
+                polls += 1
+                if max_polls is None or polls < max_polls:
+                    time.sleep(poll_seconds)
+        except KeyboardInterrupt:
+            pass
+
+
+def _difference(after: ImportResult, before: ImportResult) -> ImportResult:
+    reasons = {reason: count - before.skipped_by_reason.get(reason, 0)
+               for reason, count in after.skipped_by_reason.items()}
+    return ImportResult(after.imported - before.imported, after.skipped - before.skipped,
+                        {reason: count for reason, count in reasons.items() if count})
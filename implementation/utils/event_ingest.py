@@ -0,0 +1,224 @@
+# Streaming parser for charge/discharge event CSV files
+# The file is read as raw bytes in fixed-size chunks and only complete lines are
+# parsed, so memory stays bounded by the chunk size whatever the file size.
+# Parsed rows are returned as columnar batches keyed by (nmi, month key),
+# ready to be appended to each site's EventStore.
+# Several files can be parsed in a process pool: workers only receive the set
+# of known NMIs and send back the parsed batches of a whole file.
+import csv
+import glob
+import logging
+import os
+from datetime import date, datetime
+from typing import Container, Dict, FrozenSet, Iterator, List, Tuple
+from models.data_class import EventColumns, ImportResult, EVENT_TYPE_CODES_BY_NAME, month_key
+from models.money import MAX_EVENT_ENERGY_KWH, MAX_TARIFF_CENTS_PER_KWH
+from utils.metrics import NULL_METRICS
+
+DEFAULT_CHUNK_BYTES = 4 * 1024 * 1024
+REQUIRED_COLUMNS = ("NMI", "DATE", "EVENT_TYPE", "ENERGY", "TARIFF")
+
+EventBatch = Dict[Tuple[str, int], EventColumns]
+
+logger = logging.getLogger(__name__)
+
+
+class EventCsvParser:
+    """Incremental parser: bytes go in through `feed`, event batches come out.
+
+    The first line is the header. Rejected rows are tallied by reason on the
+    `ImportResult`; each one is also logged at DEBUG level when that is enabled.
+    """
+
+    def __init__(self, known_nmis: Container[str], result: ImportResult, metrics=NULL_METRICS):
+        self.known_nmis = known_nmis
+        self.result = result
+        self.metrics = metrics
+        self.header: List[str] = []
+        self.columns = None
+        # bytes of complete lines parsed so far, header included
+        self.consumed = 0
+        self._pending = b""
+        # caches of raw field -> parsed value, dates and event types repeat a lot
+        self._dates: Dict[str, Tuple[int, int]] = {}
+        self._types: Dict[str, int] = {}
+
+    def feed(self, data: bytes) -> EventBatch:
+        data = self._pending + data
+        cut = data.rfind(b"\n") + 1
+        self._pending = data[cut:]
+        return self._parse(data[:cut])
+
+    def finish(self) -> EventBatch:
+        data, self._pending = self._pending, b""
+        return self._parse(data)
+
+    def set_header(self, header: List[str]):
+        names = [h.strip().lstrip("\ufeff").upper() for h in header]
+        missing = [c for c in REQUIRED_COLUMNS if c not in names]
+        if missing:
+            raise ValueError(f"Events file is missing columns: {', '.join(missing)}")
+        self.header = names
+        self.columns = tuple(names.index(c) for c in REQUIRED_COLUMNS)
+
+    def _parse_date(self, raw: str):
+        # the dates accepted are those of strptime("%Y-%m-%d"); fromisoformat is the fast path for
+        # the YYYY-MM-DD shape only, as it also takes forms like 20250901 or 2025-W36-1
+        text = raw.strip()
+        try:
+            if len(text) == 10 and text[4] == text[7] == "-":
+                d = date.fromisoformat(text)
+            else:
+                d = datetime.strptime(text, "%Y-%m-%d").date()
+        except ValueError:
+            return None
+        parsed = self._dates[raw] = (d.toordinal(), month_key(d.year, d.month))
+        return parsed
+
+    def _parse_type(self, raw: str):
+        code = EVENT_TYPE_CODES_BY_NAME.get(raw.strip().lower())
+        if code is not None:
+            self._types[raw] = code
+        return code
+
+    def _skip_logged(self, reason: str, row: List[str]):
+        self.result.skip(reason)
+        logger.debug("Skipped row %d (%s): %s", self.result.imported + self.result.skipped, reason, ",".join(row))
+
+    def _parse(self, data: bytes) -> EventBatch:
+        batch: EventBatch = {}
+        if not data:
+            return batch
+        self.consumed += len(data)
+        metrics = self.metrics
+        # split on newlines only, splitlines() would also break rows at \x0b, \x85, \u2028 and the like
+        rows = csv.reader(data.decode("utf-8").split("\n"))
+        if metrics.enabled:
+            # tokenise the whole chunk up front so parsing and validation are timed apart
+            with metrics.stage("parse"):
+                rows = iter(list(rows))
+        if self.columns is None:
+            for header in rows:
+                if header:
+                    self.set_header(header)
+                    break
+            else:
+                return batch
+
+        with metrics.stage("validate"):
+            self._validate(rows, batch)
+        return batch
+
+    def _validate(self, rows: Iterator[List[str]], batch: EventBatch):
+        result, known_nmis = self.result, self.known_nmis
+        dates, types = self._dates, self._types
+        max_energy, max_tariff = MAX_EVENT_ENERGY_KWH, MAX_TARIFF_CENTS_PER_KWH
+        i_nmi, i_date, i_type, i_energy, i_tariff = self.columns
+        # bound once per chunk, so rows are only formatted for the log when DEBUG is on
+        skip = self._skip_logged if logger.isEnabledFor(logging.DEBUG) else lambda reason, row: result.skip(reason)
+        for row in rows:
+            if not row:
+                continue
+            try:
+                nmi, raw_date, raw_type = row[i_nmi].strip(), row[i_date], row[i_type]
+                raw_energy, raw_tariff = row[i_energy], row[i_tariff]
+            except IndexError:
+                skip("malformed_row", row)
+                continue
+            if nmi not in known_nmis:
+                skip("unknown_nmi", row)
+                continue
+            parsed_date = dates.get(raw_date) or self._parse_date(raw_date)
+            if parsed_date is None:
+                skip("invalid_date", row)
+                continue
+            type_code = types.get(raw_type)
+            if type_code is None:
+                type_code = self._parse_type(raw_type)
+                if type_code is None:
+                    skip("invalid_event_type", row)
+                    continue
+            try:
+                energy, tariff = float(raw_energy), float(raw_tariff)
+            except ValueError:
+                skip("invalid_number", row)
+                continue
+            # also false for nan and inf, whose value cannot be rounded to money units
+            if not (-max_energy <= energy <= max_energy and -max_tariff <= tariff <= max_tariff):
+                skip("invalid_number", row)
+                continue
+            day, key = parsed_date
+            block = batch.get((nmi, key))
+            if block is None:
+                block = batch[(nmi, key)] = EventColumns()
+            block.add_row(day, type_code, energy, tariff)
+            result.imported += 1
+
+
+def read_event_batches(file_path: str, known_nmis: Container[str], result: ImportResult,
+                       chunk_bytes: int = DEFAULT_CHUNK_BYTES, metrics=NULL_METRICS) -> Iterator[EventBatch]:
+    """Yield one event batch per chunk of `file_path`, tallying into `result`."""
+    parser = EventCsvParser(known_nmis, result, metrics)
+    with open(file_path, "rb") as fh:
+        while True:
+            data = fh.read(chunk_bytes)
+            if not data:
+                break
+            yield parser.feed(data)
+    yield parser.finish()
+
+
+def print_import_summary(result: ImportResult):
+    print(f"Imported={result.imported}, Skipped={result.skipped} ({result.rows_per_sec:,.0f} rows/sec)")
+    if result.skipped_by_reason:
+        reasons = ", ".join(f"{reason}={count}" for reason, count in sorted(result.skipped_by_reason.items()))
+        print(f"Skipped rows by reason: {reasons}")
+
+
+def record_import_metrics(metrics, result: ImportResult):
+    if not metrics.enabled:
+        return
+    metrics.inc("import_rows_total", result.imported + result.skipped)
+    metrics.inc("import_rows_imported_total", result.imported)
+    for reason, count in result.skipped_by_reason.items():
+        metrics.inc("import_rows_skipped_total", count, reason=reason)
+
+
+def merge_event_batch(into: EventBatch, batch: EventBatch):
+    for key, block in batch.items():
+        current = into.get(key)
+        if current is None:
+            into[key] = block
+        else:
+            current.extend(block)
+
+
+def resolve_event_files(path: str) -> List[str]:
+    """Expand a file path, a directory (its *.csv files) or a glob pattern into a sorted file list."""
+    if os.path.isdir(path):
+        files = sorted(glob.glob(os.path.join(path, "*.csv")))
+    elif glob.has_magic(path):
+        files = sorted(f for f in glob.glob(path) if os.path.isfile(f))
+    else:
+        return [path]
+    if not files:
+        raise FileNotFoundError(f"No event files found for '{path}'")
+    return files
+
+
+# ===================== process pool workers =====================
+_worker_nmis: FrozenSet[str] = frozenset()
+
+
+def init_event_worker(known_nmis: FrozenSet[str]):
+    global _worker_nmis
+    _worker_nmis = known_nmis
+
+
+def parse_event_file(file_path: str, chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> Tuple[EventBatch, ImportResult]:
+    """Parse a whole file against the worker's known NMIs, see `init_event_worker`."""
+    result = ImportResult()
+    parsed: EventBatch = {}
+    for batch in read_event_batches(file_path, _worker_nmis, result, chunk_bytes):
+        merge_event_batch(parsed, batch)
+    return parsed, result
@@ -0,0 +1,149 @@
+# Checkpointed, resumable event imports
+# A checkpoint records how far an input file has been imported: the byte offset
+# of the next unparsed line, the rows seen and the imported/skipped counts. It is
+# committed after each chunk has been applied, so a restarted import seeks to
+# the offset instead of re-reading and re-appending what is already in.
+# Checkpoints are only as durable as the events they describe: the in-memory
+# backend keeps them in process (MemoryCheckpointStore) and saves them inside
+# its snapshots, the SQLite backend keeps them in the database itself so that a
+# chunk's events and its checkpoint are committed in the same transaction.
+# Files still being written are followed with `tail`, which only ever parses
+# complete lines; the fingerprint then covers the bytes that existed when it
+# was taken, up to FINGERPRINT_BYTES, and grows with the file.
+import hashlib
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Container, Dict, Iterator, List, Optional
+from models.data_class import ImportResult
+from utils.event_ingest import DEFAULT_CHUNK_BYTES, EventBatch, EventCsvParser
+from utils.metrics import NULL_METRICS
+
+FINGERPRINT_BYTES = 4096
+
+
+@dataclass
+class ImportCheckpoint:
+    file: str
+    fingerprint: str
+    header: List[str]
+    offset: int = 0
+    rows: int = 0
+    imported: int = 0
+    skipped: int = 0
+    skipped_by_reason: Dict[str, int] = field(default_factory=dict)
+    # bytes hashed into the fingerprint, fewer than FINGERPRINT_BYTES while the file is shorter
+    fingerprint_bytes: int = FINGERPRINT_BYTES
+
+
+def file_fingerprint(path: str, size: int = FINGERPRINT_BYTES) -> str:
+    """Hash of the first bytes of the file, to notice a different file under the same name."""
+    with open(path, "rb") as fh:
+        return hashlib.sha1(fh.read(size)).hexdigest()
+
+
+class MemoryCheckpointStore:
+    """Keeps checkpoints in process, keyed by absolute path; `dump` and `restore` carry them in a snapshot."""
+
+    def __init__(self):
+        self.checkpoints: Dict[str, ImportCheckpoint] = {}
+
+    def load(self, file_path: str) -> Optional[ImportCheckpoint]:
+        checkpoint = self.checkpoints.get(os.path.abspath(file_path))
+        # a copy, so a job's changes are only kept once it commits them
+        return ImportCheckpoint(**asdict(checkpoint)) if checkpoint else None
+
+    def save(self, checkpoint: ImportCheckpoint):
+        self.checkpoints[os.path.abspath(checkpoint.file)] = ImportCheckpoint(**asdict(checkpoint))
+
+    def clear(self, file_path: str):
+        self.checkpoints.pop(os.path.abspath(file_path), None)
+
+    def dump(self) -> List[dict]:
+        return [asdict(checkpoint) for checkpoint in self.checkpoints.values()]
+
+    def restore(self, states: List[dict]):
+        self.checkpoints = {os.path.abspath(state["file"]): ImportCheckpoint(**state) for state in states}
+
+
+class ResumableImport:
+    """Import of one file that resumes from, and commits, checkpoints in `store`.
+
+    Call `commit()` once each batch from `batches()` has been applied; the
+    checkpoint then points just past that batch. `result` counts the rows of
+    this run, `total` adds those of the runs before it.
+    """
+
+    def __init__(self, file_path: str, known_nmis: Container[str], store, chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                 metrics=NULL_METRICS):
+        self.file_path = file_path
+        self.store = store
+        self.chunk_bytes = chunk_bytes
+        self.result = ImportResult()
+        self.previous = ImportResult()
+        self.parser = EventCsvParser(known_nmis, self.result, metrics)
+        self.checkpoint = store.load(file_path)
+        if self.checkpoint is None:
+            size = min(os.path.getsize(file_path), FINGERPRINT_BYTES)
+            self.checkpoint = ImportCheckpoint(file=file_path, fingerprint=file_fingerprint(file_path, size),
+                                               header=[], fingerprint_bytes=size)
+        elif self.checkpoint.fingerprint != file_fingerprint(file_path, self.checkpoint.fingerprint_bytes):
+            raise ValueError(f"{file_path} changed since its last checkpoint, clear the checkpoint to import it again")
+        else:
+            # keep the counts of the previous runs and skip the header, it was read then
+            self.previous = ImportResult(self.checkpoint.imported, self.checkpoint.skipped,
+                                         dict(self.checkpoint.skipped_by_reason))
+            self.parser.set_header(self.checkpoint.header)
+            self.parser.consumed = self.checkpoint.offset
+        # where `tail` stops reading, past the partial line the parser is holding
+        self.position = self.parser.consumed
+
+    @property
+    def resumed_from(self) -> int:
+        return self.checkpoint.offset
+
+    @property
+    def total(self) -> ImportResult:
+        total = ImportResult(self.previous.imported, self.previous.skipped, dict(self.previous.skipped_by_reason))
+        total.merge(self.result)
+        return total
+
+    def batches(self) -> Iterator[EventBatch]:
+        with open(self.file_path, "rb") as fh:
+            fh.seek(self.parser.consumed)
+            while True:
+                data = fh.read(self.chunk_bytes)
+                if not data:
+                    break
+                yield self.parser.feed(data)
+        yield self.parser.finish()
+
+    def tail(self) -> Iterator[EventBatch]:
+        """Batches of the lines appended since the last call, for a file that is still being written.
+
+        Unlike `batches` a trailing line without its newline is not parsed;
+        it is held until a later call reads the rest of it.
+        """
+        if os.path.getsize(self.file_path) < self.position:
+            raise ValueError(f"{self.file_path} shrank since it was last read, clear its checkpoint to import it again")
+        with open(self.file_path, "rb") as fh:
+            fh.seek(self.position)
+            while True:
+                data = fh.read(self.chunk_bytes)
+                if not data:
+                    break
+                self.position += len(data)
+                yield self.parser.feed(data)
+
+    def commit(self):
+        checkpoint = self.checkpoint
+        checkpoint.header = self.parser.header
+        checkpoint.offset = self.parser.consumed
+        total = self.total
+        checkpoint.rows = total.imported + total.skipped
+        checkpoint.imported = total.imported
+        checkpoint.skipped = total.skipped
+        checkpoint.skipped_by_reason = total.skipped_by_reason
+        if checkpoint.fingerprint_bytes < min(checkpoint.offset, FINGERPRINT_BYTES):
+            checkpoint.fingerprint_bytes = min(checkpoint.offset, FINGERPRINT_BYTES)
+            checkpoint.fingerprint = file_fingerprint(self.file_path, checkpoint.fingerprint_bytes)
+        self.store.save(checkpoint)
@@ -0,0 +1,181 @@
+# Instrumentation for import and report generation
+# Metrics collects, in process:
+#   counters    monotonically increasing totals, optionally labelled (e.g. skips by reason)
+#   stages      wall time and call count per stage (parse, validate, append, aggregate, split, fee, write,
+#               simulate)
+#   histograms  latency distributions with fixed buckets (create_report)
+# Stages are timed per chunk or per report, never per row. Snapshots are
+# exposed as a dict/JSON or as Prometheus text, and `flush` hands the metrics
+# to every configured sink. When metrics are off the code paths get
+# NULL_METRICS, whose methods do nothing.
+import bisect
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        # counts[i] observations <= buckets[i], the last slot is +Inf; not cumulative
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        total, out = 0, []
+        for bound, n in zip([*map(str, self.buckets), "+Inf"], self.counts):
+            total += n
+            out.append((bound, total))
+        return out
+
+
+class Metrics:
+    enabled = True
+
+    def __init__(self, sinks: Sequence = ()):
+        self.sinks = list(sinks)
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.stage_seconds: Dict[str, float] = {}
+        self.stage_calls: Dict[str, int] = {}
+        self.histograms: Dict[str, Histogram] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def add_time(self, stage_name: str, seconds: float):
+        self.stage_seconds[stage_name] = self.stage_seconds.get(stage_name, 0.0) + seconds
+        self.stage_calls[stage_name] = self.stage_calls.get(stage_name, 0) + 1
+
+    @contextmanager
+    def stage(self, stage_name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage_name, time.perf_counter() - started)
+
+    @contextmanager
+    def timed(self, histogram_name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(histogram_name, time.perf_counter() - started)
+
+    def observe(self, name: str, value: float):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(value)
+
+    def counter(self, name: str, **labels) -> float:
+        return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def as_dict(self) -> dict:
+        counters: Dict[str, object] = {}
+        for (name, labels), value in sorted(self.counters.items()):
+            if labels:
+                counters.setdefault(name, {})[",".join(f"{k}={v}" for k, v in labels)] = value
+            else:
+                counters[name] = value
+        return {
+            "counters": counters,
+            "stages": {name: {"seconds": round(seconds, 6), "calls": self.stage_calls[name]}
+                       for name, seconds in sorted(self.stage_seconds.items())},
+            "histograms": {name: {"count": h.count, "sum": round(h.sum, 6), "buckets": dict(h.cumulative())}
+                           for name, h in sorted(self.histograms.items())},
+        }
+
+    def to_prometheus(self, prefix: str = "vpp_") -> str:
+        lines = []
+        for (name, labels), value in sorted(self.counters.items()):
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+            lines.append(f"{prefix}{name}{{{label_text}}} {value}" if labels else f"{prefix}{name} {value}")
+        for name, seconds in sorted(self.stage_seconds.items()):
+            lines.append(f'{prefix}stage_seconds_total{{stage="{name}"}} {seconds}')
+            lines.append(f'{prefix}stage_calls_total{{stage="{name}"}} {self.stage_calls[name]}')
+        for name, h in sorted(self.histograms.items()):
+            for bound, total in h.cumulative():
+                lines.append(f'{prefix}{name}_bucket{{le="{bound}"}} {total}')
+            lines.append(f"{prefix}{name}_sum {h.sum}")
+            lines.append(f"{prefix}{name}_count {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.emit(self)
+
+
+class NullMetrics:
+    """Stands in for Metrics when instrumentation is off; every call is a no-op."""
+    enabled = False
+    _stage = nullcontext()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        pass
+
+    def add_time(self, stage_name: str, seconds: float):
+        pass
+
+    def stage(self, stage_name: str):
+        return self._stage
+
+    def timed(self, histogram_name: str):
+        return self._stage
+
+    def observe(self, name: str, value: float):
+        pass
+
+    def flush(self):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+# ===================== sinks =====================
+class _FileSink:
+    def __init__(self, path: str):
+        self.path = path
+
+    def emit(self, metrics: Metrics):
+        # write then rename so a scraper never reads a half-written file
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            fh.write(self.render(metrics))
+        os.replace(tmp_path, self.path)
+
+
+class JsonFileSink(_FileSink):
+    def render(self, metrics: Metrics) -> str:
+        return json.dumps(metrics.as_dict(), indent=2)
+
+
+class PrometheusFileSink(_FileSink):
+    """Prometheus text format, e.g. for the node exporter's textfile collector."""
+
+    def render(self, metrics: Metrics) -> str:
+        return metrics.to_prometheus()
+
+
+def metrics_for(path: Optional[str], fmt: str = "json"):
+    """Metrics writing to `path` in `fmt` ('json' or 'prometheus'), NULL_METRICS without a path."""
+    if not path:
+        return NULL_METRICS
+    if fmt not in ("json", "prometheus"):
+        raise ValueError(f"Unknown metrics format '{fmt}', expected json or prometheus")
+    return Metrics([JsonFileSink(path) if fmt == "json" else PrometheusFileSink(path)])
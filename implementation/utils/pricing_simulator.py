@@ -0,0 +1,93 @@
+# What-if pricing over revenue percentage and daily fee
+# A month is reduced to its per-site rows once (the same rows a report is built
+# from). Every site's share of the remainder is rem * weight / D, with one
+# exact integer weight per site. The weights are sorted once and prefix-summed,
+# so for each (revenue_percentage, daily_fee_aud) scenario the 28-day fee cap
+# only needs two bisects:
+#   weight <= 0                 share <= 0, no fee is taken
+#   0 < share < month fee       the whole share is taken as fee
+#   share >= month fee          the month fee is taken
+# That makes a scenario O(log sites) instead of a pass over the sites, so a
+# grid of thousands of scenarios costs about as much as one report.
+# Revenue, margin and VPP cost are exact. Fees and revenue after fees are
+# rounded once per scenario instead of once per site, so they are within one
+# unit (1e-6 AUD) per site of `create_report`; `site_entries` gives the exact
+# per-site figures of one scenario.
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, product
+from typing import Iterable, Iterator, List, Sequence, Tuple
+from models.money import div_round, units_to_aud
+from utils.report_shards import (CAPACITY_TENTHS, CONTRIBUTION_TENTHS, ReportTotals, SiteRow, month_fee_units,
+                                 shard_partials, shard_split, site_entries, split_margin)
+
+Scenario = Tuple[float, float]
+
+
+def scenario_grid(revenue_percentages: Iterable[float], daily_fees_aud: Iterable[float]) -> List[Scenario]:
+    """Every (revenue_percentage, daily_fee_aud) combination, percentages first."""
+    return list(product(revenue_percentages, daily_fees_aud))
+
+
+class PricingSimulation:
+    """The month of one VPP reduced for what-if pricing; `rows` are the report's site rows."""
+
+    def __init__(self, rows: Sequence[SiteRow]):
+        self.rows = rows
+        self.totals: ReportTotals = shard_partials(rows)
+        contributions, capacity = self.totals.contributions, self.totals.capacity
+        # share = rem * (8 * contribution / (10 * contributions) + 2 * capacity / (10 * capacity total)),
+        # put over the common denominator so each site has an integer weight
+        if contributions > 0 and capacity > 0:
+            weights = [CONTRIBUTION_TENTHS * c * capacity + CAPACITY_TENTHS * k * contributions
+                       for _, _, k, c, _ in rows]
+            self.denominator = 10 * contributions * capacity
+        elif contributions > 0:
+            weights = [CONTRIBUTION_TENTHS * c for _, _, _, c, _ in rows]
+            self.denominator = 10 * contributions
+        elif capacity > 0:
+            weights = [CAPACITY_TENTHS * k for _, _, k, _, _ in rows]
+            self.denominator = 10 * capacity
+        else:
+            weights = []
+            self.denominator = 1
+        self.weights = sorted(weights)
+        # prefix[i] is the sum of the i smallest weights
+        self.prefix = [0, *accumulate(self.weights)]
+        # sites with a positive share, whatever the remainder
+        self.first_positive = bisect_right(self.weights, 0)
+
+    def evaluate(self, revenue_percentage: float, daily_fee_aud: float) -> dict:
+        totals = self.totals
+        vpp_margin, revenue_reminder = split_margin(totals, revenue_percentage)
+        fee = month_fee_units(daily_fee_aud)
+        fees = shares = capped = 0
+        if revenue_reminder > 0 and self.weights:
+            shares = div_round(revenue_reminder * self.prefix[-1], self.denominator)
+        if revenue_reminder > 0 and self.weights and fee > 0:
+            weights, prefix, lo = self.weights, self.prefix, self.first_positive
+            # share >= fee  <=>  weight >= fee * D / rem, rounded up as weights are integers
+            hi = max(lo, bisect_left(weights, -(-fee * self.denominator // revenue_reminder)))
+            capped = len(weights) - hi
+            fees = div_round(revenue_reminder * (prefix[hi] - prefix[lo]), self.denominator) + fee * capped
+        return {
+            "revenue_percentage": revenue_percentage,
+            "daily_fee_aud": daily_fee_aud,
+            "totals": {
+                "total_revenue": units_to_aud(totals.revenue),
+                "vpp_ad_valorem_fee": units_to_aud(vpp_margin),
+                "vpp_cost_only": units_to_aud(totals.cost_only),
+                "vpp_total_revenue": units_to_aud(vpp_margin + fees + totals.cost_only),
+                "site_total_daily_fees": units_to_aud(fees),
+                "site_total_revenue_after_fees": units_to_aud(shares - fees),
+            },
+            "sites_at_fee_cap": capped,
+        }
+
+    def run(self, scenarios: Iterable[Scenario]) -> List[dict]:
+        return [self.evaluate(revenue_percentage, daily_fee_aud) for revenue_percentage, daily_fee_aud in scenarios]
+
+    def site_entries(self, revenue_percentage: float, daily_fee_aud: float) -> Iterator[dict]:
+        """Per-site entries of one scenario, exactly as a report with these settings would have them."""
+        _, revenue_reminder = split_margin(self.totals, revenue_percentage)
+        splits = shard_split(self.rows, self.totals, revenue_reminder)
+        return (entry for entry, _, _ in site_entries(self.rows, splits, daily_fee_aud))
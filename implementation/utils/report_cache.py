@@ -0,0 +1,63 @@
+# Bounded LRU cache of generated reports
+# Entries are keyed by (vpp_name, month) and stored with the data version they
+# were built from. A lookup with a different version is a miss and drops the
+# stale entry, so invalidation is exact: only reports whose inputs changed are
+# rebuilt.
+# Reports are shared, not copied: every caller served from the cache, and every
+# range report embedding the month under `months`, gets the same dict, so a
+# report is read-only once returned. Copying on each hit would cost as much as
+# the report is large; copy a report before changing it.
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+DEFAULT_REPORT_CACHE_SIZE = 128
+
+
+class ReportCache:
+
+    def __init__(self, max_entries: int = DEFAULT_REPORT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Hashable, dict]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Tuple[str, str], version: Hashable) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] != version:
+            del self._entries[key]
+            self.invalidations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Tuple[str, str], version: Hashable, report: dict):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (version, report)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
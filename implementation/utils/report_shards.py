@@ -0,0 +1,330 @@
+# Two-phase report computation over shards of sites
+# Phase one: every shard returns partial sums (revenue, contributions, VPP cost
+# only, battery capacity) that the coordinator merges into VPP-wide totals.
+# Phase two: every shard computes its sites' 80/20 shares and daily fees from
+# those totals. A sequential report is the single-shard case, so both paths run
+# the same code; with more than one worker each shard runs in its own worker
+# process. A shard's rows are sent once: the worker keeps them between the
+# phases, so phase two only sends the totals and gets the site entries back.
+# The workers are a ShardPool owned by the backend: they are started once and
+# reused by every report, and only reports of at least SHARD_MIN_SITES sites
+# are sent to them, smaller ones are faster in process than their rows are to
+# ship to the workers.
+# `build_report` turns per-site rows into the report dict for every backend,
+# `build_range_report` combines monthly reports into a statement over a range
+# and `stream_report` yields the site entries one at a time for large reports.
+# Stages timed on the metrics: aggregate (phase one), split (80/20 shares) and
+# fee (daily fee cap and site entries); in a process pool all of phase two is
+# timed as split.
+# Every amount is an integer of money units and capacities are integer Wh
+# (models/money.py), so shard partials merge exactly in any order and every
+# path produces the same report; values are converted to AUD and kWh only in
+# the report dicts.
+import contextlib
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import count, tee
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from models.data_class import VPP
+from models.money import aud_to_units, div_round, percent_to_bp, units_to_aud, wh_to_kwh
+from utils.metrics import NULL_METRICS
+
+DAYS_PER_MONTH = 28
+
+# nmi, address, capacity_wh, revenue, vpp_cost_only (money units) of one site for the month
+SiteRow = Tuple[str, str, int, int, int]
+# 80% of the remainder is shared by contribution, 20% by capacity
+CONTRIBUTION_TENTHS = 8
+CAPACITY_TENTHS = 2
+# reports of fewer sites are computed in process even when workers are asked for
+SHARD_MIN_SITES = 100_000
+
+
+@dataclass
+class ReportTotals:
+    revenue: int = 0
+    contributions: int = 0
+    cost_only: int = 0
+    capacity: int = 0
+
+    def merge(self, other: "ReportTotals"):
+        self.revenue += other.revenue
+        self.contributions += other.contributions
+        self.cost_only += other.cost_only
+        self.capacity += other.capacity
+
+
+@dataclass
+class ShardShares:
+    sites: Dict[str, dict]
+    fees: int = 0
+    revenue_after_fees: int = 0
+
+
+def shard_partials(rows: Iterable[SiteRow]) -> ReportTotals:
+    totals = ReportTotals()
+    for _, _, capacity, revenue, cost_only in rows:
+        # discharge negative values are 100% vpp only cost
+        totals.cost_only += cost_only
+        totals.revenue += revenue
+        totals.contributions += revenue
+        totals.capacity += capacity
+    return totals
+
+
+def shard_split(rows: Sequence[SiteRow], totals: ReportTotals, revenue_reminder: int) -> List[int]:
+    """Each site's share of the remainder, before fees, each of the 80% and 20% parts rounded to the unit."""
+    return list(iter_split(rows, totals, revenue_reminder))
+
+
+def iter_split(rows: Iterable[SiteRow], totals: ReportTotals, revenue_reminder: int) -> Iterator[int]:
+    """`shard_split` one site at a time."""
+    # the products stay exact as Python ints, the only rounding is the division
+    by_contribution = CONTRIBUTION_TENTHS * revenue_reminder
+    by_capacity = CAPACITY_TENTHS * revenue_reminder
+    contributions = 10 * totals.contributions
+    capacity_total = 10 * totals.capacity
+    for _, _, capacity, contribution, _ in rows:
+        share = 0
+        if revenue_reminder > 0:
+            # 80% is assigned to the Site that had an event
+            if contributions > 0:
+                share = div_round(by_contribution * contribution, contributions)
+            # 20% is distributed across all Sites, proportionally according to their batteries' capacity
+            if capacity_total > 0:
+                share += div_round(by_capacity * capacity, capacity_total)
+        yield share
+
+
+def month_fee_units(daily_fee_aud: float) -> int:
+    return aud_to_units(daily_fee_aud) * DAYS_PER_MONTH
+
+
+def site_entries(rows: Iterable[SiteRow], splits: Iterable[int], daily_fee_aud: float) -> Iterator[Tuple[dict, int, int]]:
+    """Yield (site entry, daily fee taken, revenue after fees) of every site, in row order."""
+    fee = month_fee_units(daily_fee_aud)
+    for (nmi, address, capacity, _, _), share in zip(rows, splits):
+        # Daily fees are taken from a Site’s revenue and given to the VPP, assuming 28 days every month
+        # Daily fees cannot make a Site’s total revenue for the month go negative
+        actual_fee = min(max(share, 0), fee)
+        share -= actual_fee
+        entry = {
+            "nmi": nmi,
+            "address": address,
+            "site_capacity_kwh": wh_to_kwh(capacity),
+            "site_revenue_before_fees": units_to_aud(share + actual_fee),
+            "site_daily_fee": units_to_aud(actual_fee),
+            "site_revenue_after_fees": units_to_aud(share),
+        }
+        yield entry, actual_fee, share
+
+
+def fee_totals(splits: Iterable[int], daily_fee_aud: float) -> Tuple[int, int]:
+    """(fees, revenue after fees) over all sites, the same sums `site_entries` leads to."""
+    fee = month_fee_units(daily_fee_aud)
+    fees = revenue_after_fees = 0
+    for share in splits:
+        actual_fee = min(max(share, 0), fee)
+        share -= actual_fee
+        fees += actual_fee
+        revenue_after_fees += share
+    return fees, revenue_after_fees
+
+
+def shard_fees(rows: Sequence[SiteRow], splits: Sequence[int], daily_fee_aud: float) -> ShardShares:
+    shares = ShardShares(sites={})
+    for entry, actual_fee, share in site_entries(rows, splits, daily_fee_aud):
+        shares.fees += actual_fee
+        shares.revenue_after_fees += share
+        shares.sites[entry["nmi"]] = entry
+    return shares
+
+
+def shard_shares(rows: Sequence[SiteRow], totals: ReportTotals, revenue_reminder: int, daily_fee_aud: float) -> ShardShares:
+    return shard_fees(rows, shard_split(rows, totals, revenue_reminder), daily_fee_aud)
+
+
+def split_shards(rows: List[SiteRow], shards: int) -> List[List[SiteRow]]:
+    """Split rows into at most `shards` contiguous slices, keeping site order."""
+    size = max(1, -(-len(rows) // max(1, shards)))
+    return [rows[i:i + size] for i in range(0, len(rows), size)]
+
+
+# ===================== resident shards =====================
+# the rows a worker holds between the two phases, by shard job
+_resident_shards: Dict[int, Sequence[SiteRow]] = {}
+_shard_jobs = count()
+
+
+def load_shard(job: int, rows: Sequence[SiteRow]) -> ReportTotals:
+    """Phase one in a worker: keep the shard for phase two and return its partial sums."""
+    _resident_shards[job] = rows
+    return shard_partials(rows)
+
+
+def resident_shard_shares(job: int, totals: ReportTotals, revenue_reminder: int, daily_fee_aud: float) -> ShardShares:
+    """Phase two in a worker, over the shard it loaded in phase one."""
+    return shard_shares(_resident_shards.pop(job), totals, revenue_reminder, daily_fee_aud)
+
+
+def drop_shard(job: int):
+    _resident_shards.pop(job, None)
+
+
+class ShardPool:
+    """Worker processes for sharded reports, started by the first report that needs them.
+
+    Each worker is a single-process executor, so a shard stays in the worker
+    that loaded it. `workers` is the number of shards used when a report asks
+    for none; the workers are restarted only if a report asks for a different
+    number.
+    """
+
+    def __init__(self, workers: Optional[int] = None, min_sites: int = SHARD_MIN_SITES):
+        self.workers = workers
+        self.min_sites = min_sites
+        self._executors: List[Executor] = []
+
+    def executors(self, workers: Optional[int], sites: int) -> List[Executor]:
+        """One executor per shard of a report of `sites` sites, none to compute it in process."""
+        if not workers or workers <= 1 or sites < self.min_sites:
+            return []
+        if len(self._executors) != workers:
+            self.close()
+            self._executors = [ProcessPoolExecutor(max_workers=1) for _ in range(workers)]
+        return self._executors
+
+    def close(self):
+        for executor in self._executors:
+            executor.shutdown()
+        self._executors = []
+
+
+def compute_shares(rows: List[SiteRow], revenue_percentage: float, daily_fee_aud: float,
+                   executors: Sequence[Executor] = (), metrics=NULL_METRICS):
+    """Run both phases and return (totals, vpp_margin, shares) with shares merged in site order.
+
+    With more than one executor the rows are split into one shard per
+    executor, otherwise they are computed in process.
+    """
+    if len(executors) <= 1:
+        with metrics.stage("aggregate"):
+            totals = shard_partials(rows)
+        vpp_margin, revenue_reminder = split_margin(totals, revenue_percentage)
+        with metrics.stage("split"):
+            splits = shard_split(rows, totals, revenue_reminder)
+        with metrics.stage("fee"):
+            shares = shard_fees(rows, splits, daily_fee_aud)
+        return totals, vpp_margin, shares
+
+    shards = split_shards(rows, len(executors))
+    placed = [(executor, next(_shard_jobs), shard) for executor, shard in zip(executors, shards)]
+    try:
+        # phase one: every worker keeps its shard and returns its partial sums, merged by the coordinator
+        totals = ReportTotals()
+        with metrics.stage("aggregate"):
+            for partial in [executor.submit(load_shard, job, shard) for executor, job, shard in placed]:
+                totals.merge(partial.result())
+        vpp_margin, revenue_reminder = split_margin(totals, revenue_percentage)
+        # phase two: only the totals are broadcast, every worker computes its shard's shares and fees
+        merged = ShardShares(sites={})
+        with metrics.stage("split"):
+            for part in [executor.submit(resident_shard_shares, job, totals, revenue_reminder, daily_fee_aud)
+                         for executor, job, _ in placed]:
+                part = part.result()
+                merged.sites.update(part.sites)
+                merged.fees += part.fees
+                merged.revenue_after_fees += part.revenue_after_fees
+    except BaseException:
+        # free the shards the workers may still hold
+        for executor, job, _ in placed:
+            with contextlib.suppress(Exception):
+                executor.submit(drop_shard, job)
+        raise
+    return totals, vpp_margin, merged
+
+
+def split_margin(totals: ReportTotals, revenue_percentage: float) -> Tuple[int, int]:
+    # The VPP is assigned its margin of the revenue first, the remainder is shared with the sites
+    vpp_margin = div_round(totals.revenue * percent_to_bp(revenue_percentage), 100 * 100)
+    return vpp_margin, totals.revenue - vpp_margin
+
+
+def build_report(vpp: VPP, month_yyyy_mm: str, rows: List[SiteRow], workers: Optional[int] = None,
+                 metrics=NULL_METRICS, pool: Optional[ShardPool] = None) -> dict:
+    # phase one sums the VPP totals, phase two splits the remainder 80/20 between sites and takes the daily fees,
+    # sharded across the pool's worker processes when workers > 1 and the VPP is large enough
+    executors = pool.executors(workers or pool.workers, len(rows)) if pool is not None else []
+    totals, vpp_margin, shares = compute_shares(rows, vpp.revenue_percentage, vpp.daily_fee_aud, executors, metrics)
+
+    # construct the report:
+    report = _report_header(vpp, month_yyyy_mm, totals, vpp_margin, shares.fees, shares.revenue_after_fees)
+    report["sites"] = shares.sites
+    return report
+
+
+def stream_report(vpp: VPP, month_yyyy_mm: str, rows: Callable[[], Iterable[SiteRow]]) -> Tuple[dict, Iterator[dict]]:
+    """The report without its sites, and an iterator over the site entries.
+
+    Same figures as `build_report`, but nothing is kept per site: `rows` is
+    called for a fresh pass over the site rows three times, to sum the
+    totals, to sum the fees from the per-site shares, so the header is
+    complete before the first site is written, and to yield the entries.
+    """
+    totals = shard_partials(rows())
+    vpp_margin, revenue_reminder = split_margin(totals, vpp.revenue_percentage)
+    fees, revenue_after_fees = fee_totals(iter_split(rows(), totals, revenue_reminder), vpp.daily_fee_aud)
+    header = _report_header(vpp, month_yyyy_mm, totals, vpp_margin, fees, revenue_after_fees)
+    # the shares are worked out from one of the two copies as the entries are built from the other
+    entry_rows, split_rows = tee(rows())
+    splits = iter_split(split_rows, totals, revenue_reminder)
+    return header, (entry for entry, _, _ in site_entries(entry_rows, splits, vpp.daily_fee_aud))
+
+
+def _report_header(vpp: VPP, month_yyyy_mm: str, totals: ReportTotals, vpp_margin: int, fees: int,
+                   revenue_after_fees: int) -> dict:
+    vpp_total_revenue = vpp_margin + fees + totals.cost_only
+    return {
+        "vpp": vpp.name,
+        "month": month_yyyy_mm,
+        "totals": {
+            "total_revenue": units_to_aud(totals.revenue),
+            "vpp_ad_valorem_fee": units_to_aud(vpp_margin),
+            "vpp_cost_only": units_to_aud(totals.cost_only),
+            "vpp_total_revenue": units_to_aud(vpp_total_revenue),
+            "site_total_revenue_after_fees": units_to_aud(revenue_after_fees),
+        },
+    }
+
+
+RANGE_TOTALS = ("total_revenue", "vpp_ad_valorem_fee", "vpp_cost_only", "vpp_total_revenue", "site_total_revenue_after_fees")
+RANGE_SITE_TOTALS = ("site_revenue_before_fees", "site_daily_fee", "site_revenue_after_fees")
+
+
+def build_range_report(vpp_name: str, first_month: str, last_month: str, reports: List[dict]) -> dict:
+    """Statement over consecutive months: every monthly report plus their totals, overall and per site.
+
+    Range totals add up the monthly figures as whole cents, so they tie out
+    exactly with the monthly statements.
+    """
+    totals = dict.fromkeys(RANGE_TOTALS, 0)
+    sites: Dict[str, dict] = {}
+    for report in reports:
+        for name in RANGE_TOTALS:
+            totals[name] += round(report["totals"][name] * 100)
+        for nmi, entry in report["sites"].items():
+            site = sites.get(nmi)
+            if site is None:
+                site = sites[nmi] = {"nmi": nmi, "address": entry["address"], **dict.fromkeys(RANGE_SITE_TOTALS, 0)}
+            for name in RANGE_SITE_TOTALS:
+                site[name] += round(entry[name] * 100)
+    for entry in sites.values():
+        for name in RANGE_SITE_TOTALS:
+            entry[name] /= 100
+    return {
+        "vpp": vpp_name,
+        "month": f"{first_month}..{last_month}",
+        "totals": {name: cents / 100 for name, cents in totals.items()},
+        "sites": sites,
+        "months": {report["month"]: report for report in reports},
+    }
@@ -0,0 +1,48 @@
+# Streaming report writer
+# Writes a report header and its site entries to a file as they are produced,
+# so only one site entry is held in memory at a time. The format follows the
+# file name:
+#   *.json      the same document as vpp_report.json, without indentation
+#   *.ndjson    the header (vpp, month, totals) on the first line, then one site per line
+#   *.gz        either of the above, gzip compressed, e.g. report.ndjson.gz
+import gzip
+import json
+from typing import Iterable
+
+GZIP_LEVEL = 6
+
+
+def report_format(path: str) -> str:
+    name = path[:-3] if path.endswith(".gz") else path
+    return "ndjson" if name.endswith((".ndjson", ".jsonl")) else "json"
+
+
+def open_report_file(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "wt", encoding="utf-8", compresslevel=GZIP_LEVEL)
+    return open(path, "w", encoding="utf-8")
+
+
+def write_report(path: str, header: dict, entries: Iterable[dict]) -> int:
+    """Write the report to `path`, returns the number of site entries written."""
+    count = 0
+    with open_report_file(path) as fh:
+        if report_format(path) == "ndjson":
+            fh.write(json.dumps(header))
+            fh.write("\n")
+            for entry in entries:
+                fh.write(json.dumps(entry))
+                fh.write("\n")
+                count += 1
+        else:
+            # the header's closing brace is replaced by the sites object, written entry by entry
+            fh.write(json.dumps(header)[:-1])
+            fh.write(', "sites": {')
+            for entry in entries:
+                fh.write(", " if count else "")
+                fh.write(json.dumps(entry["nmi"]))
+                fh.write(": ")
+                fh.write(json.dumps(entry))
+                count += 1
+            fh.write("}}")
+    return count
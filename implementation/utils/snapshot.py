@@ -0,0 +1,150 @@
+# Binary snapshot of the in-memory model for fast warm starts
+# Layout (all integers little-endian, columns in native byte order):
+#   header      magic, byte order, record counts, column offsets and the checkpoints' offset and size
+#   vpps        name string id, revenue_percentage, daily_fee_aud
+#   sites       nmi, vpp name and address string ids
+#   batteries   site index, manufacturer and serial string ids, capacity_kwh
+#   partitions  site index, month key, first event, event count, revenue, vpp_cost_only (int64 money units)
+#   strings     end offsets then the utf-8 blob of every distinct string
+#   columns     dates (int32), types (int8), energies (float64), tariffs (float64),
+#               each 8-byte aligned and ordered by partition
+#   checkpoints JSON list of the event import checkpoints, so a resumed import
+#               or follower carries on from exactly the events in the snapshot
+# Loading memory-maps the file: event columns are memoryview slices of the map,
+# so nothing is parsed and the pages are shared with every process mapping it.
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, List, Sequence, Tuple
+from models.data_class import VPP, Battery, EventColumns, Site
+
+MAGIC = b"VPPSNAP3"
+HEADER = struct.Struct("<8sB3xIIIIIQQQQQQQQ")
+VPP_RECORD = struct.Struct("<Idd")
+SITE_RECORD = struct.Struct("<III")
+BATTERY_RECORD = struct.Struct("<IIId")
+PARTITION_RECORD = struct.Struct("<IiQQqq")
+COLUMNS = (("dates", "i"), ("types", "b"), ("energies", "d"), ("tariffs", "d"))
+LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+class _StringTable:
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+
+    def __call__(self, value) -> int:
+        value = str(value)
+        if value not in self.ids:
+            self.ids[value] = len(self.ids)
+        return self.ids[value]
+
+    def encode(self) -> bytes:
+        blobs = [s.encode("utf-8") for s in self.ids]
+        ends, end = array("Q"), 0
+        for blob in blobs:
+            end += len(blob)
+            ends.append(end)
+        if not LITTLE_ENDIAN:
+            ends.byteswap()
+        return ends.tobytes() + b"".join(blobs)
+
+
+def write_snapshot(path: str, vpps: Dict[str, VPP], sites: Dict[str, Site], checkpoints: Sequence[dict] = ()):
+    strings = _StringTable()
+    vpp_records = [VPP_RECORD.pack(strings(v.name), v.revenue_percentage, v.daily_fee_aud) for v in vpps.values()]
+    site_records, battery_records, partitions = [], [], []
+    n_events = 0
+    for site_index, site in enumerate(sites.values()):
+        site_records.append(SITE_RECORD.pack(strings(site.nmi), strings(site.vpp_name), strings(site.address)))
+        for bat in site.batteries:
+            battery_records.append(BATTERY_RECORD.pack(site_index, strings(bat.manufacturer), strings(bat.serial), bat.capacity_kwh))
+        for key in sorted(site.events.months):
+            block = site.events.months[key]
+            revenue, cost_only = site.events.month_totals(key)
+            partitions.append((block, PARTITION_RECORD.pack(site_index, key, n_events, len(block), revenue, cost_only)))
+            n_events += len(block)
+
+    string_bytes = strings.encode()
+    tables = b"".join(vpp_records + site_records + battery_records + [p[1] for p in partitions])
+    strings_offset = HEADER.size + len(tables)
+    offsets, offset = [], _align(strings_offset + len(string_bytes))
+    for _, typecode in COLUMNS:
+        offsets.append(offset)
+        offset = _align(offset + n_events * array(typecode).itemsize)
+    checkpoint_bytes = json.dumps(list(checkpoints)).encode("utf-8")
+
+    # write then rename: the snapshot being replaced may be the one the event columns are mapped from
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as fh:
+        fh.write(HEADER.pack(MAGIC, LITTLE_ENDIAN, len(strings.ids), len(vpp_records), len(site_records),
+                             len(battery_records), len(partitions), n_events, strings_offset, *offsets,
+                             offset, len(checkpoint_bytes)))
+        fh.write(tables)
+        fh.write(string_bytes)
+        for (name, _), column_offset in zip(COLUMNS, offsets):
+            fh.write(b"\0" * (column_offset - fh.tell()))
+            for block, _ in partitions:
+                fh.write(getattr(block, name))
+        fh.write(b"\0" * (offset - fh.tell()))
+        fh.write(checkpoint_bytes)
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path: str) -> Tuple[Dict[str, VPP], Dict[str, Site], List[dict], mmap.mmap]:
+    """Load a snapshot and its import checkpoints; event columns stay backed by the returned read-only map."""
+    with open(path, "rb") as fh:
+        mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    (magic, little_endian, n_strings, n_vpps, n_sites, n_batteries, n_partitions, n_events,
+     strings_offset, *column_offsets, checkpoints_offset, checkpoints_size) = HEADER.unpack_from(mapped, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a VPP snapshot")
+    if bool(little_endian) != LITTLE_ENDIAN:
+        raise ValueError(f"Snapshot {path} was written on a machine with a different byte order")
+
+    ends = memoryview(mapped)[strings_offset:strings_offset + 8 * n_strings].cast("Q")
+    blob_start, start = strings_offset + 8 * n_strings, 0
+    strings: List[str] = []
+    for end in ends:
+        strings.append(mapped[blob_start + start:blob_start + end].decode("utf-8"))
+        start = end
+    ends.release()
+
+    offset = HEADER.size
+    vpps: Dict[str, VPP] = {}
+    for name, revenue_percentage, daily_fee_aud in VPP_RECORD.iter_unpack(mapped[offset:offset + VPP_RECORD.size * n_vpps]):
+        vpps[strings[name]] = VPP(strings[name], revenue_percentage, daily_fee_aud)
+    offset += VPP_RECORD.size * n_vpps
+
+    site_list: List[Site] = []
+    for nmi, vpp_name, address in SITE_RECORD.iter_unpack(mapped[offset:offset + SITE_RECORD.size * n_sites]):
+        site_list.append(Site(vpp_name=strings[vpp_name], nmi=strings[nmi], address=strings[address]))
+    offset += SITE_RECORD.size * n_sites
+
+    for site_index, manufacturer, serial, capacity in BATTERY_RECORD.iter_unpack(
+            mapped[offset:offset + BATTERY_RECORD.size * n_batteries]):
+        site_list[site_index].add_battery(Battery(strings[manufacturer], strings[serial], capacity))
+    offset += BATTERY_RECORD.size * n_batteries
+    # sites join their VPP once their capacity is known
+    for site in site_list:
+        vpps[site.vpp_name].add_site(site)
+
+    view = memoryview(mapped)
+    columns = [view[column_offset:column_offset + n_events * array(typecode).itemsize].cast(typecode)
+               for (_, typecode), column_offset in zip(COLUMNS, column_offsets)]
+    for site_index, key, first, count, revenue, cost_only in PARTITION_RECORD.iter_unpack(
+            mapped[offset:offset + PARTITION_RECORD.size * n_partitions]):
+        block = EventColumns()
+        block.dates, block.types, block.energies, block.tariffs = (c[first:first + count] for c in columns)
+        store = site_list[site_index].events
+        store.months[key] = block
+        store.totals[key] = (revenue, cost_only)
+
+    checkpoints = json.loads(mapped[checkpoints_offset:checkpoints_offset + checkpoints_size].decode("utf-8"))
+    return vpps, {site.nmi: site for site in site_list}, checkpoints, mapped
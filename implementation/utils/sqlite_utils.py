@@ -0,0 +1,397 @@
+# SQLite backed Utils for report generator
+# Same behaviour as VPPUtils, but VPPs, sites, batteries and events live in an
+# on-disk SQLite database, so state survives restarts. It is the local stand-in
+# for the Postgres design in the Readme.
+# Methods:
+# create/update vpp, site and battery: upserts
+# remove battery method
+# load sites / load batteries methods: one executemany upsert per file
+# import event method: streams the CSV in chunks and inserts each chunk with executemany,
+#   optionally resumable with per-chunk checkpoints committed alongside the events,
+#   or following the files and inserting rows as they are appended
+# create report method: per-site sums come from a GROUP BY over the month's events
+# create range report method: one GROUP BY (site, day) over the whole range, bucketed into months
+# export report method: streams a report to a (gzip) JSON or NDJSON file, one site at a time
+# simulate pricing method: what-if totals over the same per-site sums as a report
+# Every event's value is stored as integer money units (models/money.py) next to
+# its tariff and energy, so the report sums are exact integer SUMs in SQL and
+# match the in-memory backend to the unit.
+import json
+import os
+import sqlite3
+import time
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from itertools import repeat
+from typing import Dict, Iterable, List, Optional
+from models.data_class import VPP, ImportResult, month_key
+from models.money import event_value_units, kwh_to_wh, valid_capacity_kwh, valid_vpp_settings
+from utils.entity_loader import read_battery_rows, read_site_rows
+from utils.event_follower import DEFAULT_POLL_SECONDS, EventFollower
+from utils.event_ingest import (DEFAULT_CHUNK_BYTES, EventBatch, init_event_worker, parse_event_file,
+                                print_import_summary, read_event_batches, record_import_metrics, resolve_event_files)
+from utils.import_checkpoint import ImportCheckpoint, ResumableImport
+from utils.metrics import NULL_METRICS
+from utils.pricing_simulator import PricingSimulation, Scenario
+from utils.report_shards import ShardPool, SiteRow, build_range_report, build_report, stream_report
+from utils.report_writer import write_report
+from utils.vpp_utils import Utils, VPPUtils
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS vpps (
+    name TEXT PRIMARY KEY,
+    revenue_percentage REAL NOT NULL,
+    daily_fee_aud REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sites (
+    nmi TEXT PRIMARY KEY,
+    vpp_name TEXT NOT NULL REFERENCES vpps(name),
+    address TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sites_vpp_name ON sites (vpp_name);
+CREATE TABLE IF NOT EXISTS batteries (
+    site_nmi TEXT NOT NULL REFERENCES sites(nmi),
+    serial TEXT NOT NULL,
+    manufacturer TEXT NOT NULL,
+    capacity_kwh REAL NOT NULL,
+    PRIMARY KEY (site_nmi, serial)
+);
+CREATE TABLE IF NOT EXISTS events (
+    nmi TEXT NOT NULL,
+    date INTEGER NOT NULL,
+    event_type INTEGER NOT NULL,
+    energy_kwh REAL NOT NULL,
+    tariff_cents_per_kwh REAL NOT NULL,
+    value_units INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS events_nmi_date ON events (nmi, date);
+CREATE TABLE IF NOT EXISTS import_checkpoints (
+    file TEXT PRIMARY KEY,
+    state TEXT NOT NULL
+);
+"""
+
+# one row per site of a VPP: capacity, then revenue and discharge-negative cost of the events
+# dated between the two day ordinals; the join walks the (nmi, date) index for each site
+SITE_ROWS_SQL = """
+SELECT s.nmi, s.address,
+       COALESCE((SELECT SUM(kwh_to_wh(b.capacity_kwh)) FROM batteries b WHERE b.site_nmi = s.nmi), 0),
+       COALESCE(SUM(CASE WHEN e.event_type = 1 AND e.value_units < 0 THEN 0 ELSE e.value_units END), 0),
+       COALESCE(SUM(CASE WHEN e.event_type = 1 AND e.value_units < 0 THEN e.value_units ELSE 0 END), 0),
+       s.vpp_name
+FROM sites s
+LEFT JOIN events e ON e.nmi = s.nmi AND e.date BETWEEN ? AND ?
+{where}
+GROUP BY s.rowid
+ORDER BY s.rowid
+"""
+
+UPSERT_SITE_SQL = ("INSERT INTO sites (vpp_name, nmi, address) VALUES (?, ?, ?) "
+                   "ON CONFLICT(nmi) DO UPDATE SET vpp_name = excluded.vpp_name, address = excluded.address")
+UPSERT_BATTERY_SQL = ("INSERT INTO batteries (site_nmi, manufacturer, serial, capacity_kwh) VALUES (?, ?, ?, ?) "
+                      "ON CONFLICT(site_nmi, serial) DO UPDATE SET manufacturer = excluded.manufacturer, "
+                      "capacity_kwh = excluded.capacity_kwh")
+# the sums of RANGE_SUMS_SQL per site and day, bucketed into months in Python
+RANGE_SITES_SQL = """
+SELECT s.nmi, s.address, COALESCE((SELECT SUM(kwh_to_wh(b.capacity_kwh)) FROM batteries b WHERE b.site_nmi = s.nmi), 0)
+FROM sites s WHERE s.vpp_name = ? ORDER BY s.rowid
+"""
+RANGE_SUMS_SQL = """
+SELECT e.nmi, e.date,
+       SUM(CASE WHEN e.event_type = 1 AND e.value_units < 0 THEN 0 ELSE e.value_units END),
+       SUM(CASE WHEN e.event_type = 1 AND e.value_units < 0 THEN e.value_units ELSE 0 END)
+FROM sites s JOIN events e ON e.nmi = s.nmi AND e.date BETWEEN ? AND ?
+WHERE s.vpp_name = ?
+GROUP BY e.nmi, e.date
+"""
+
+INSERT_EVENT_SQL = ("INSERT INTO events (nmi, date, event_type, energy_kwh, tariff_cents_per_kwh, value_units) "
+                    "VALUES (?, ?, ?, ?, ?, ?)")
+
+
+class SQLiteCheckpointStore:
+    """Import checkpoints kept in the database; `save` joins the caller's transaction."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def load(self, file_path: str) -> Optional[ImportCheckpoint]:
+        row = self.conn.execute("SELECT state FROM import_checkpoints WHERE file = ?",
+                                (os.path.abspath(file_path),)).fetchone()
+        return ImportCheckpoint(**json.loads(row[0])) if row else None
+
+    def save(self, checkpoint: ImportCheckpoint):
+        self.conn.execute(
+            "INSERT INTO import_checkpoints (file, state) VALUES (?, ?) "
+            "ON CONFLICT(file) DO UPDATE SET state = excluded.state",
+            (os.path.abspath(checkpoint.file), json.dumps(asdict(checkpoint))))
+
+    def clear(self, file_path: str):
+        with self.conn:
+            self.conn.execute("DELETE FROM import_checkpoints WHERE file = ?", (os.path.abspath(file_path),))
+
+
+class SQLiteVPPUtils(Utils):
+
+    def __init__(self, db_path: str = "vpp.db", metrics=None, report_workers: Optional[int] = None):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        # the same rounding as the in-memory backend, so both give the same report
+        self.conn.create_function("kwh_to_wh", 1, kwh_to_wh, deterministic=True)
+        self.conn.create_function("event_value_units", 2, event_value_units, deterministic=True)
+        self._migrate_events()
+        self.conn.executescript(SCHEMA)
+        self.last_report: dict = {}
+        self.metrics = metrics or NULL_METRICS
+        self.shard_pool = ShardPool(report_workers)
+
+    def close(self):
+        self.shard_pool.close()
+        self.conn.close()
+
+    def _migrate_events(self):
+        # databases created before value_units: add the column and fill it from the stored tariffs and energies
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(events)")]
+        if columns and "value_units" not in columns:
+            with self.conn:
+                self.conn.execute("ALTER TABLE events ADD COLUMN value_units INTEGER NOT NULL DEFAULT 0")
+                self.conn.execute("UPDATE events SET value_units = event_value_units(tariff_cents_per_kwh, energy_kwh)")
+
+    def _vpp(self, name: str) -> Optional[VPP]:
+        row = self.conn.execute(
+            "SELECT name, revenue_percentage, daily_fee_aud FROM vpps WHERE name = ?", (name,)).fetchone()
+        return VPP(*row) if row else None
+
+    def create_update_vpp(self, name: str, revenue_percentage: float, daily_fee_aud: float):
+        if not valid_vpp_settings(revenue_percentage, daily_fee_aud):
+            raise ValueError(f"Invalid VPP settings: revenue percentage {revenue_percentage}, "
+                             f"daily fee {daily_fee_aud} AUD")
+        with self.conn:
+            exists = self._vpp(name) is not None
+            self.conn.execute(
+                "INSERT INTO vpps (name, revenue_percentage, daily_fee_aud) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET revenue_percentage = excluded.revenue_percentage, "
+                "daily_fee_aud = excluded.daily_fee_aud",
+                (name, revenue_percentage, daily_fee_aud))
+        print(f"{'Updated' if exists else 'Created'} VPP '{name}'")
+
+    def create_update_site(self, vpp_name: str, nmi: str, address: str):
+        # assert if site's vpp exists first if not raise an error
+        if self._vpp(vpp_name) is None:
+            raise ValueError(f"VPP '{vpp_name}' not found")
+        with self.conn:
+            exists = self.conn.execute("SELECT 1 FROM sites WHERE nmi = ?", (nmi,)).fetchone() is not None
+            self.conn.execute(UPSERT_SITE_SQL, (vpp_name, nmi, address))
+        print(f"{'Updated' if exists else 'Created'} Site NMI={nmi}")
+
+    def create_update_battery(self, site_nmi: str, manufacturer: str, serial: str, capacity_kwh: float):
+        # assert if battery's site exist
+        if not valid_capacity_kwh(capacity_kwh):
+            raise ValueError(f"Invalid battery capacity {capacity_kwh} kWh")
+        if self.conn.execute("SELECT 1 FROM sites WHERE nmi = ?", (site_nmi,)).fetchone() is None:
+            raise ValueError(f"Site with NMI {site_nmi} not found")
+        with self.conn:
+            exists = self.conn.execute(
+                "SELECT 1 FROM batteries WHERE site_nmi = ? AND serial = ?", (site_nmi, serial)).fetchone() is not None
+            self.conn.execute(UPSERT_BATTERY_SQL, (site_nmi, manufacturer, serial, capacity_kwh))
+        print(f"{'Updated' if exists else 'Created'} Battery serial={serial} at site {site_nmi}")
+
+    def remove_battery(self, site_nmi: str, serial: str):
+        if self.conn.execute("SELECT 1 FROM sites WHERE nmi = ?", (site_nmi,)).fetchone() is None:
+            raise ValueError(f"Site with NMI {site_nmi} not found")
+        with self.conn:
+            deleted = self.conn.execute(
+                "DELETE FROM batteries WHERE site_nmi = ? AND serial = ?", (site_nmi, serial)).rowcount
+        if not deleted:
+            raise ValueError(f"Battery serial={serial} not found at site {site_nmi}")
+        print(f"Removed Battery serial={serial} from site {site_nmi}")
+
+    def load_sites(self, file_path: str) -> ImportResult:
+        result = ImportResult()
+        started = time.perf_counter()
+        vpp_names = frozenset(name for (name,) in self.conn.execute("SELECT name FROM vpps"))
+        rows = read_site_rows(file_path, vpp_names, result)
+        with self.conn:
+            self.conn.executemany(UPSERT_SITE_SQL, rows)
+        result.elapsed_s = time.perf_counter() - started
+        print_import_summary(result)
+        return result
+
+    def load_batteries(self, file_path: str) -> ImportResult:
+        result = ImportResult()
+        started = time.perf_counter()
+        site_nmis = frozenset(nmi for (nmi,) in self.conn.execute("SELECT nmi FROM sites"))
+        rows = read_battery_rows(file_path, site_nmis, result)
+        with self.conn:
+            self.conn.executemany(UPSERT_BATTERY_SQL, rows)
+        result.elapsed_s = time.perf_counter() - started
+        print_import_summary(result)
+        return result
+
+    def import_events(self, file_path: str, chunk_bytes: int = DEFAULT_CHUNK_BYTES, workers: Optional[int] = None,
+                      resume: bool = False, follow: bool = False, poll_seconds: float = DEFAULT_POLL_SECONDS) -> ImportResult:
+        # same parser as the in-memory backend; each file is inserted in a single transaction
+        if follow:
+            return self.follow_events(file_path, poll_seconds)
+        files = resolve_event_files(file_path)
+        known_nmis = frozenset(nmi for (nmi,) in self.conn.execute("SELECT nmi FROM sites"))
+        result = ImportResult()
+        started = time.perf_counter()
+        if resume:
+            # each chunk is committed together with its checkpoint, so a crash never loses or repeats a chunk
+            store = SQLiteCheckpointStore(self.conn)
+            for path in files:
+                job = ResumableImport(path, known_nmis, store, chunk_bytes, self.metrics)
+                if job.resumed_from:
+                    print(f"Resuming {path} from byte {job.resumed_from} (row {job.checkpoint.rows})")
+                for batch in job.batches():
+                    self._insert_checkpointed_batch(job, batch)
+                result.merge(job.result)
+                if job.previous.imported or job.previous.skipped:
+                    # this run's rows are in the summary below, these are the file's since its first import
+                    total = job.total
+                    print(f"{path}: Imported={total.imported}, Skipped={total.skipped} over all runs")
+        elif len(files) == 1 or workers == 1:
+            for path in files:
+                with self.conn:
+                    for batch in read_event_batches(path, known_nmis, result, chunk_bytes, self.metrics):
+                        self._insert_event_batch(batch)
+        else:
+            # files are parsed in a process pool, the single SQLite writer inserts them in file order
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_event_worker, initargs=(known_nmis,)) as pool:
+                for batch, file_result in pool.map(parse_event_file, files, repeat(chunk_bytes)):
+                    with self.conn:
+                        self._insert_event_batch(batch)
+                    result.merge(file_result)
+        result.elapsed_s = time.perf_counter() - started
+        self.metrics.inc("import_files_total", len(files))
+        record_import_metrics(self.metrics, result)
+        print_import_summary(result)
+        return result
+
+    def _insert_event_batch(self, batch: EventBatch):
+        with self.metrics.stage("append"):
+            for (nmi, _), block in batch.items():
+                self.conn.executemany(INSERT_EVENT_SQL, zip(
+                    repeat(nmi), block.dates, block.types, block.energies, block.tariffs,
+                    map(event_value_units, block.tariffs, block.energies)))
+
+    def _insert_checkpointed_batch(self, job: ResumableImport, batch: EventBatch):
+        with self.conn:
+            self._insert_event_batch(batch)
+            job.commit()
+
+    def event_follower(self, file_path: str) -> EventFollower:
+        """A follower inserting the rows appended to `file_path` on each `poll`; checkpoints are kept in the database.
+
+        Rows are checked against the sites that exist when the follower is created.
+        """
+        known_nmis = frozenset(nmi for (nmi,) in self.conn.execute("SELECT nmi FROM sites"))
+        return EventFollower(file_path, known_nmis, SQLiteCheckpointStore(self.conn), self._insert_checkpointed_batch,
+                             metrics=self.metrics)
+
+    def _site_rows(self, month_yyyy_mm: str, vpp_name: Optional[str] = None):
+        VPPUtils.parse_month(month_yyyy_mm)
+        start, end = VPPUtils.find_month_start_end(month_yyyy_mm)
+        params = [start.toordinal(), end.toordinal()]
+        where = ""
+        if vpp_name is not None:
+            where = "WHERE s.vpp_name = ?"
+            params.append(vpp_name)
+        return self.conn.execute(SITE_ROWS_SQL.format(where=where), params)
+
+    def create_report(self, vpp_name, month_yyyy_mm, workers: Optional[int] = None):
+        with self.metrics.timed("create_report_seconds"):
+            return self._create_report(vpp_name, month_yyyy_mm, workers)
+
+    def _create_report(self, vpp_name, month_yyyy_mm, workers: Optional[int] = None):
+        # assert if vpp exist
+        vpp = self._vpp(vpp_name)
+        if vpp is None:
+            raise ValueError(f"VPP '{vpp_name}' not found")
+        with self.metrics.stage("aggregate"):
+            rows: List[SiteRow] = [row[:5] for row in self._site_rows(month_yyyy_mm, vpp_name)]
+        if not rows:
+            print(f"VPP has not sites to generate reports")
+            return
+        self.metrics.inc("reports_total", cached="false")
+        self.metrics.inc("report_sites_total", len(rows))
+        report = build_report(vpp, month_yyyy_mm, rows, workers, self.metrics, self.shard_pool)
+        self.last_report = report
+        return report
+
+    def export_report(self, vpp_name: str, month_yyyy_mm: str, file_path: str) -> int:
+        vpp = self._vpp(vpp_name)
+        if vpp is None:
+            raise ValueError(f"VPP '{vpp_name}' not found")
+        # each pass re-runs the query rather than keeping the rows, see stream_report
+        header, entries = stream_report(vpp, month_yyyy_mm,
+                                        lambda: (row[:5] for row in self._site_rows(month_yyyy_mm, vpp_name)))
+        with self.metrics.stage("write"):
+            count = write_report(file_path, header, entries)
+        self.last_report = header
+        print(f"Report for VPP '{vpp_name}' for month '{month_yyyy_mm}' written to {file_path} ({count} sites)")
+        return count
+
+    def simulate_pricing(self, vpp_name: str, month_yyyy_mm: str, scenarios: Iterable[Scenario]) -> dict:
+        if self._vpp(vpp_name) is None:
+            raise ValueError(f"VPP '{vpp_name}' not found")
+        rows: List[SiteRow] = [row[:5] for row in self._site_rows(month_yyyy_mm, vpp_name)]
+        with self.metrics.stage("simulate"):
+            results = PricingSimulation(rows).run(scenarios)
+        return {"vpp": vpp_name, "month": month_yyyy_mm, "scenarios": results}
+
+    def create_range_report(self, vpp_name: str, first_month: str, last_month: str, workers: Optional[int] = None):
+        vpp = self._vpp(vpp_name)
+        if vpp is None:
+            raise ValueError(f"VPP '{vpp_name}' not found")
+        months = VPPUtils.month_range(first_month, last_month)
+        sites = self.conn.execute(RANGE_SITES_SQL, (vpp_name,)).fetchall()
+        if not sites:
+            print(f"VPP has not sites to generate reports")
+            return
+        start = VPPUtils.find_month_start_end(months[0][0])[0].toordinal()
+        end = VPPUtils.find_month_start_end(months[-1][0])[1].toordinal()
+        # (nmi, month key) -> [revenue, vpp_cost_only] units, from a single scan of the range
+        sums: Dict[tuple, List[int]] = {}
+        month_of_day: Dict[int, int] = {}
+        with self.metrics.stage("aggregate"):
+            for nmi, day, revenue, cost_only in self.conn.execute(RANGE_SUMS_SQL, (start, end, vpp_name)):
+                key = month_of_day.get(day)
+                if key is None:
+                    d = date.fromordinal(day)
+                    key = month_of_day[day] = month_key(d.year, d.month)
+                total = sums.setdefault((nmi, key), [0, 0])
+                total[0] += revenue
+                total[1] += cost_only
+        reports = []
+        for month, key in months:
+            rows: List[SiteRow] = [(nmi, address, capacity, *sums.get((nmi, key), (0, 0)))
+                                   for nmi, address, capacity in sites]
+            with self.metrics.timed("create_report_seconds"):
+                reports.append(build_report(vpp, month, rows, workers, self.metrics, self.shard_pool))
+        report = build_range_report(vpp_name, months[0][0], months[-1][0], reports)
+        self.last_report = report
+        return report
+
+    def create_reports(self, month_yyyy_mm: str) -> Dict[str, dict]:
+        """Reports of every VPP with sites for the month, keyed by VPP name, from one query."""
+        rows_by_vpp: Dict[str, List[SiteRow]] = {}
+        with self.metrics.stage("aggregate"):
+            for row in self._site_rows(month_yyyy_mm):
+                rows_by_vpp.setdefault(row[5], []).append(row[:5])
+        reports = {}
+        for vpp_name, rows in rows_by_vpp.items():
+            with self.metrics.timed("create_report_seconds"):
+                reports[vpp_name] = self.last_report = build_report(self._vpp(vpp_name), month_yyyy_mm, rows,
+                                                                    metrics=self.metrics, pool=self.shard_pool)
+        return reports
+
+    def exit(self):
+        if self.last_report:
+            print(f"Report for VPP '{self.last_report['vpp']}' for month '{self.last_report['month']}' generated successfully. Exiting.")
+        else:
+            print("No report was generated. Exiting.")
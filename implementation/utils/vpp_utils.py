@@ -3,16 +3,34 @@
 # create/update vpp method
 # create/update site method
 # create/update battery method
-# import event method
+# remove battery method
+# load sites / load batteries methods: bulk upserts from CSV files
+# import event method, optionally following the files for rows appended to them
 # create report method
+# create range report method: monthly reports of a range of months and their totals
+# export report method: streams a report to a (gzip) JSON or NDJSON file, one site at a time
+# simulate pricing method: what-if totals of a month over a grid of revenue percentages and daily fees
 # exit method: just logs the report generated successfully message
 from abc import ABC, abstractmethod
-from typing import Dict
-from models.data_class import VPP, EventType, Site, Battery, Event
-import csv
-from datetime import datetime, date
+from typing import Dict, Iterable, List, Optional, Tuple
+from models.data_class import VPP, Site, Battery, ImportResult, month_key
+from models.money import valid_capacity_kwh, valid_vpp_settings
+from utils.event_ingest import (DEFAULT_CHUNK_BYTES, EventBatch, init_event_worker, parse_event_file,
+                                print_import_summary, read_event_batches, record_import_metrics, resolve_event_files)
+from utils.entity_loader import read_battery_rows, read_site_rows
+from utils.event_follower import DEFAULT_POLL_SECONDS, EventFollower
+from utils.import_checkpoint import MemoryCheckpointStore, ResumableImport
+from utils.metrics import NULL_METRICS
+from utils.pricing_simulator import PricingSimulation, Scenario
+from utils.report_shards import ShardPool, SiteRow, build_range_report, build_report, stream_report
+from utils.report_writer import write_report
+from utils.snapshot import read_snapshot, write_snapshot
+from utils.report_cache import DEFAULT_REPORT_CACHE_SIZE, ReportCache
+from concurrent.futures import ProcessPoolExecutor
+from itertools import count, repeat
+from datetime import date
 import calendar
-import json
+import time
 
 class Utils(ABC):
     @abstractmethod
@@ -27,6 +45,10 @@ class Utils(ABC):
     def create_update_battery(self, site_nmi: str, manufacturer: str, serial: str, capacity_kwh: float):
         pass
 
+    @abstractmethod
+    def remove_battery(self, site_nmi: str, serial: str):
+        pass
+
     @abstractmethod
     def import_events(self, file_path: str):
         pass
@@ -35,15 +57,58 @@ class Utils(ABC):
     def create_report(self, vpp_name: str, month_yyyy_mm: str):
         pass
 
+    @abstractmethod
+    def simulate_pricing(self, vpp_name: str, month_yyyy_mm: str, scenarios: Iterable[Scenario]) -> dict:
+        pass
+
+    @abstractmethod
+    def event_follower(self, file_path: str) -> EventFollower:
+        pass
+
+    def follow_events(self, file_path: str, poll_seconds: float = DEFAULT_POLL_SECONDS,
+                      max_polls: Optional[int] = None) -> ImportResult:
+        """Import new rows every `poll_seconds` until interrupted; the appended events update the reports straight away."""
+        follower = self.event_follower(file_path)
+        total = ImportResult()
+
+        def on_poll(result: ImportResult):
+            total.merge(result)
+            total.elapsed_s += result.elapsed_s
+            record_import_metrics(self.metrics, result)
+            if result.imported or result.skipped:
+                print_import_summary(result)
+                self.metrics.flush()
+
+        print(f"Following {file_path}, new rows are imported every {poll_seconds:g}s (Ctrl-C to stop)")
+        follower.run(on_poll, poll_seconds, max_polls)
+        return total
+
     @abstractmethod
     def exit(self,vpp_name: str, month_yyyy_mm: str):
         pass
 class VPPUtils(Utils):
 
-    def __init__(self):
+    def __init__(self, report_cache_size: int = DEFAULT_REPORT_CACHE_SIZE, metrics=None,
+                 report_workers: Optional[int] = None):
         self.vpps: Dict[str, VPP] = {}
         self.sites: Dict[str, Site] = {}
         self.last_report: dict ={}
+        # reports are cached per (vpp, month) against the data versions below
+        self.report_cache = ReportCache(report_cache_size)
+        self._versions = count(1)
+        # bumped when a VPP's settings, sites or batteries change
+        self._vpp_versions: Dict[str, int] = {}
+        # bumped when events of a (vpp, month key) change
+        self._event_versions: Dict[Tuple[str, int], int] = {}
+        # stage timers, counters and report latencies, see utils/metrics.py; no-ops unless a Metrics is given
+        self.metrics = metrics or NULL_METRICS
+        # import checkpoints live as long as the events they describe: in process, and in snapshots
+        self.checkpoints = MemoryCheckpointStore()
+        # worker processes for reports of very large VPPs, kept until `close`; see utils/report_shards.py
+        self.shard_pool = ShardPool(report_workers)
+
+    def close(self):
+        self.shard_pool.close()
 
     @staticmethod
     def find_month_start_end(yyyymm: str):
@@ -52,8 +117,47 @@ class VPPUtils(Utils):
         last_day = calendar.monthrange(year, month)[1]
         end = date(year, month, last_day)
         return start, end
-    
+
+    @staticmethod
+    def parse_month(yyyymm: str) -> int:
+        year, month = [int(x) for x in yyyymm.split("-", 1)]
+        if not 1 <= month <= 12:
+            raise ValueError(f"Invalid month '{yyyymm}', expected YYYY-MM")
+        return month_key(year, month)
+
+    @staticmethod
+    def site_row(site: Site, key: int) -> SiteRow:
+        """The site's row for the report maths of month `key`: its capacity and the month's sums it keeps."""
+        return site.nmi, site.address, site.capacity_wh, *site.events.month_totals(key)
+
+    @staticmethod
+    def month_range(first_yyyymm: str, last_yyyymm: str) -> List[Tuple[str, int]]:
+        """(YYYY-MM, month key) of every month from first to last, inclusive."""
+        first, last = VPPUtils.parse_month(first_yyyymm), VPPUtils.parse_month(last_yyyymm)
+        if first > last:
+            raise ValueError(f"Invalid month range '{first_yyyymm}..{last_yyyymm}', the first month is after the last")
+        return [(f"{key // 12:04d}-{key % 12 + 1:02d}", key) for key in range(first, last + 1)]
+
+    def _touch_vpp(self, vpp_name: str):
+        self._vpp_versions[vpp_name] = next(self._versions)
+
+    def _capacity_changed(self, nmi: str, delta_wh: int):
+        site = self.sites[nmi]
+        self._touch_vpp(site.vpp_name)
+        self.vpps[site.vpp_name].capacity_changed(delta_wh)
+
+    def _events_changed(self, nmi: str, key: int):
+        self._event_versions[(self.sites[nmi].vpp_name, key)] = next(self._versions)
+
+    def report_version(self, vpp_name: str, key: int) -> Tuple[int, int]:
+        """Version of the data a (vpp, month key) report is built from."""
+        return self._vpp_versions.get(vpp_name, 0), self._event_versions.get((vpp_name, key), 0)
+
     def create_update_vpp(self, name: str, revenue_percentage: float, daily_fee_aud: float):
+        if not valid_vpp_settings(revenue_percentage, daily_fee_aud):
+            raise ValueError(f"Invalid VPP settings: revenue percentage {revenue_percentage}, "
+                             f"daily fee {daily_fee_aud} AUD")
+        self._touch_vpp(name)
         #  update
         if name in self.vpps:
             vpp = self.vpps[name]
@@ -69,156 +173,270 @@ class VPPUtils(Utils):
         # assert if site's vpp exists first if not raise an error
         if vpp_name not in self.vpps:
             raise ValueError(f"VPP '{vpp_name}' not found")
+        created = self._upsert_site(vpp_name, nmi, address)
+        print(f"{'Created' if created else 'Updated'} Site NMI={nmi}")
+
+    def _upsert_site(self, vpp_name: str, nmi: str, address: str) -> bool:
         # update the site if exists
         if nmi in self.sites:
             site = self.sites[nmi]
+            if site.vpp_name != vpp_name:
+                # the site moves to the new VPP and leaves its previous VPP's reports as well
+                self._touch_vpp(site.vpp_name)
+                self.vpps[site.vpp_name].remove_site(nmi)
+                self.vpps[vpp_name].add_site(site)
             site.address = address
             site.vpp_name = vpp_name
-            print(f"Updated Site NMI={nmi}")
+            created = False
         # else create it
         else:
             site = Site(vpp_name=vpp_name, nmi=nmi, address=address)
+            site.events.on_change = self._events_changed
+            site.on_capacity_change = self._capacity_changed
             self.sites[nmi] = site
-            self.vpps[vpp_name].sites.append(site)
-            print(f"Created Site NMI={nmi}")
+            self.vpps[vpp_name].add_site(site)
+            created = True
+        self._touch_vpp(vpp_name)
+        return created
 
     def create_update_battery(self, site_nmi: str, manufacturer: str, serial: str, capacity_kwh: float):
         # assert if battery's site exist
         if site_nmi not in self.sites:
             raise ValueError(f"Site with NMI {site_nmi} not found")
-        #  update or add the battery to the site
+        created = self._upsert_battery(site_nmi, manufacturer, serial, capacity_kwh)
+        print(f"{'Created' if created else 'Updated'} Battery serial={serial} at site {site_nmi}")
+
+    def _upsert_battery(self, site_nmi: str, manufacturer: str, serial: str, capacity_kwh: float) -> bool:
+        #  update or add the battery to the site, the site and its VPP keep their capacity up to date
+        if not valid_capacity_kwh(capacity_kwh):
+            raise ValueError(f"Invalid battery capacity {capacity_kwh} kWh")
         site = self.sites[site_nmi]
-        for bat in site.batteries:
-            if bat.serial == serial:
-                bat.manufacturer = manufacturer
-                bat.capacity_kwh = capacity_kwh
-                print(f"Updated Battery serial={serial} at site {site_nmi}")
-                return
-        bat = Battery(manufacturer=manufacturer, serial=serial, capacity_kwh=capacity_kwh)
-        site.batteries.append(bat)
-        print(f"Created Battery serial={serial} at site {site_nmi}")
-    
-    def import_events(self, file_path: str):
-        imported, skipped = 0, 0
-        try:
-            with open(file_path, newline='', encoding='utf-8') as fh:
-                reader = csv.DictReader(fh)
-                for row in reader:
-                    try:
-                        nmi = row['NMI'].strip()
-                        if nmi not in self.sites:
-                            skipped += 1
-                            continue
-                        dt = datetime.strptime(row['DATE'].strip(), "%Y-%m-%d").date()
-                        ev_type_str = row['EVENT_TYPE'].strip().title()
-                        
-                        if ev_type_str not in [e.value for e in EventType]:
-                            skipped += 1
-                            continue
-                        ev_type = EventType[ev_type_str.upper()]
-                        energy = float(row['ENERGY'])
-                        tariff = float(row['TARIFF'])
-                        event = Event(nmi=nmi, date=dt, event_type=ev_type, energy_kwh=energy, tariff_cents_per_kwh=tariff)
-                        self.sites[nmi].events.append(event)
-                        imported += 1
-                    except Exception as e:
-                        skipped += 1
-                        print(f"Skipping event, Error: {e}")
-        except FileNotFoundError:
-            raise
-        print(f"Imported={imported}, Skipped={skipped}")
+        self._touch_vpp(site.vpp_name)
+        if site.battery(serial) is not None:
+            site.update_battery(serial, manufacturer, capacity_kwh)
+            return False
+        site.add_battery(Battery(manufacturer=manufacturer, serial=serial, capacity_kwh=capacity_kwh))
+        return True
+
+    def remove_battery(self, site_nmi: str, serial: str):
+        # assert if the site and its battery exist
+        if site_nmi not in self.sites:
+            raise ValueError(f"Site with NMI {site_nmi} not found")
+        site = self.sites[site_nmi]
+        if site.battery(serial) is None:
+            raise ValueError(f"Battery serial={serial} not found at site {site_nmi}")
+        self._touch_vpp(site.vpp_name)
+        site.remove_battery(serial)
+        print(f"Removed Battery serial={serial} from site {site_nmi}")
     
-    def create_report(self, vpp_name, month_yyyy_mm):
+    def load_sites(self, file_path: str) -> ImportResult:
+        """Upsert every valid row of a sites CSV (VPP_NAME, NMI, ADDRESS); one summary, no per-site output."""
+        result = ImportResult()
+        started = time.perf_counter()
+        for vpp_name, nmi, address in read_site_rows(file_path, self.vpps, result):
+            self._upsert_site(vpp_name, nmi, address)
+        result.elapsed_s = time.perf_counter() - started
+        print_import_summary(result)
+        return result
+
+    def load_batteries(self, file_path: str) -> ImportResult:
+        """Upsert every valid row of a batteries CSV (NMI, MANUFACTURER, SERIAL, CAPACITY_KWH)."""
+        result = ImportResult()
+        started = time.perf_counter()
+        for site_nmi, manufacturer, serial, capacity_kwh in read_battery_rows(file_path, self.sites, result):
+            self._upsert_battery(site_nmi, manufacturer, serial, capacity_kwh)
+        result.elapsed_s = time.perf_counter() - started
+        print_import_summary(result)
+        return result
+
+    def import_events(self, file_path: str, chunk_bytes: int = DEFAULT_CHUNK_BYTES, workers: Optional[int] = None,
+                      resume: bool = False, follow: bool = False,
+                      poll_seconds: float = DEFAULT_POLL_SECONDS) -> ImportResult:
+        # file_path can be a single file, a directory of *.csv files or a glob pattern
+        if follow:
+            return self.follow_events(file_path, poll_seconds)
+        files = resolve_event_files(file_path)
+        result = ImportResult()
+        started = time.perf_counter()
+        if resume:
+            # one file at a time, a checkpoint is committed after each chunk so a re-run picks up where this one stopped
+            for path in files:
+                job = ResumableImport(path, self.sites, self.checkpoints, chunk_bytes, self.metrics)
+                if job.resumed_from:
+                    print(f"Resuming {path} from byte {job.resumed_from} (row {job.checkpoint.rows})")
+                for batch in job.batches():
+                    self.append_checkpointed_batch(job, batch)
+                result.merge(job.result)
+                if job.previous.imported or job.previous.skipped:
+                    # this run's rows are in the summary below, these are the file's since its first import
+                    total = job.total
+                    print(f"{path}: Imported={total.imported}, Skipped={total.skipped} over all runs")
+        elif len(files) == 1 or workers == 1:
+            # stream the file in fixed-size chunks, each chunk comes back as columnar batches per (site, month)
+            for path in files:
+                for batch in read_event_batches(path, self.sites, result, chunk_bytes, self.metrics):
+                    self.append_event_batch(batch)
+        else:
+            # parse files in a process pool, batches are merged back in file order so the result is deterministic
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_event_worker,
+                                     initargs=(frozenset(self.sites),)) as pool:
+                for batch, file_result in pool.map(parse_event_file, files, repeat(chunk_bytes)):
+                    self.append_event_batch(batch)
+                    result.merge(file_result)
+        result.elapsed_s = time.perf_counter() - started
+        self.metrics.inc("import_files_total", len(files))
+        record_import_metrics(self.metrics, result)
+        print_import_summary(result)
+        return result
+
+    def append_event_batch(self, batch: EventBatch):
+        with self.metrics.stage("append"):
+            for (nmi, key), block in batch.items():
+                self.sites[nmi].events.extend_month(key, block)
+
+    def append_checkpointed_batch(self, job: ResumableImport, batch: EventBatch):
+        self.append_event_batch(batch)
+        job.commit()
+
+    def event_follower(self, file_path: str) -> EventFollower:
+        """A follower importing the rows appended to `file_path` on each `poll`, see utils/event_follower.py."""
+        return EventFollower(file_path, self.sites, self.checkpoints, self.append_checkpointed_batch,
+                             metrics=self.metrics)
+
+    def create_report(self, vpp_name, month_yyyy_mm, workers: Optional[int] = None):
+        """The month's report; it may be shared with other callers through the report cache, so it is read-only."""
+        with self.metrics.timed("create_report_seconds"):
+            return self._create_report(vpp_name, month_yyyy_mm, workers)
+
+    def _create_report(self, vpp_name, month_yyyy_mm, workers: Optional[int] = None):
         # ===================== Assertion =====================
         # assert if vpp exist
         if vpp_name not in self.vpps:
             raise ValueError(f"VPP '{vpp_name}' not found")
+        key = self.parse_month(month_yyyy_mm)
+
+        # serve the cached report while none of its inputs changed
+        version = self.report_version(vpp_name, key)
+        cached = self.report_cache.get((vpp_name, month_yyyy_mm), version)
+        if cached is not None:
+            self.metrics.inc("reports_total", cached="true")
+            self.last_report = cached
+            return cached
         
         # get the sites for the vpp and if not sites then skip generating the report
-        sites = [s for s in self.sites.values() if s.vpp_name == vpp_name]
+        sites = list(self.vpps[vpp_name].sites.values())
         if not sites:
             print(f"VPP has not sites to generate reports")
             return
-        
-        # ===================== constraints =====================
-        start, end = self.find_month_start_end(month_yyyy_mm)
-        capacity_per_site= {s.nmi: sum(b.capacity_kwh for b in s.batteries) for s in sites}
-        total_capacity= sum(capacity_per_site.values())
+
+        report = self._build_report(self.vpps[vpp_name], sites, month_yyyy_mm, key, workers)
+        self.report_cache.put((vpp_name, month_yyyy_mm), version, report)
+        self.last_report = report
+        return report
+
+    def create_reports(self, month_yyyy_mm: str) -> Dict[str, dict]:
+        """Reports of every VPP with sites for the month, keyed by VPP name."""
+        key = self.parse_month(month_yyyy_mm)
+        reports = {}
+        for vpp_name, vpp in self.vpps.items():
+            if not vpp.sites:
+                continue
+            sites = list(vpp.sites.values())
+            version = self.report_version(vpp_name, key)
+            report = self.report_cache.get((vpp_name, month_yyyy_mm), version)
+            if report is None:
+                with self.metrics.timed("create_report_seconds"):
+                    report = self._build_report(self.vpps[vpp_name], sites, month_yyyy_mm, key)
+                self.report_cache.put((vpp_name, month_yyyy_mm), version, report)
+            else:
+                self.metrics.inc("reports_total", cached="true")
+            reports[vpp_name] = self.last_report = report
+        return reports
+
+    def create_range_report(self, vpp_name: str, first_month: str, last_month: str, workers: Optional[int] = None):
+        """Report of every month from first_month to last_month plus the range totals."""
+        if vpp_name not in self.vpps:
+            raise ValueError(f"VPP '{vpp_name}' not found")
+        months = self.month_range(first_month, last_month)
         vpp = self.vpps[vpp_name]
-        contributed_sites = {s.nmi: 0.0 for s in sites}
-        vpp_cost_only= 0.0
-        total_revenue= 0.0
-        days= 28
-
-        # ===================== Core logic to calculate the revenue per site and for VPP =====================
-        # total revenue for sites for the given month
-        for s in sites:
-            for ev in s.events:
-                if not(start <= ev.date <= end):
-                    print(f"event date {ev.date} is not valid for this report");
-                    continue
-                value = (ev.tariff_cents_per_kwh* ev.energy_kwh) / 100
-                if(value <0 and ev.event_type == EventType.DISCHARGE):
-                    # discharge negative values are 100% vpp only cost
-                    vpp_cost_only +=value
-                else:
-                    total_revenue +=value
-                    contributed_sites[ev.nmi] += value
-        
-        # The VPP is assigned its margin of the revenue first
-        vpp_margin = total_revenue * (vpp.revenue_percentage / 100)
-        # Of the remainder of the revenue
-        revenue_reminder = total_revenue - vpp_margin
-        share_per_site = {s.nmi: 0.0 for s in sites}
-        if(revenue_reminder > 0 ):
-            # 80% is assigned to the Site that had an event
-            total_contributions = sum(contributed_sites.values())
-            if total_contributions > 0:
-                for sid, contrib in contributed_sites.items():
-                    share_per_site[sid] = 0.8 * revenue_reminder * (contrib / total_contributions)
-
-            # 20% is distributed across all Sites, proportionally according to their batteries' capacity
-            if total_capacity > 0:
-                for sid, cap in capacity_per_site.items():
-                    share_per_site[sid] += 0.2 * revenue_reminder * (cap / total_capacity)
-
-                        
-        # Daily fees are taken from a Site’s revenue and given to the VPP, assuming 28 days every month
-        # Daily fees cannot make a Site’s total revenue for the month go negative
-        site_fees = {}
-        for sid, amount in share_per_site.items():
-            fee = vpp.daily_fee_aud * days
-            actual_fee = min(max(amount, 0), fee)
-            share_per_site[sid] -= actual_fee
-            site_fees[sid] = actual_fee
-
-        # construct the report:
-        vpp_total_revenue = vpp_margin + sum(site_fees.values()) + vpp_cost_only
-        report = {
-            "vpp": vpp.name,
-            "month": month_yyyy_mm,
-            "totals": {
-                "total_revenue": round(total_revenue, 2),
-                "vpp_ad_valorem_fee": round(vpp_margin, 2),
-                "vpp_cost_only": round(vpp_cost_only, 2),
-                "vpp_total_revenue":round(vpp_total_revenue, 2),
-                "site_total_revenue_after_fees": round(sum(share_per_site.values()), 2),
-            },
-            "sites": {
-                s.nmi: {
-                    "nmi": s.nmi,
-                    "address": s.address,
-                    "site_capacity_kwh": round(capacity_per_site[s.nmi], 2),
-                    "site_revenue_before_fees": round(share_per_site[s.nmi] + site_fees[s.nmi], 2),
-                    "site_daily_fee": round(site_fees[s.nmi], 2),
-                    "site_revenue_after_fees": round(share_per_site[s.nmi], 2),
-                }
-                for s in sites
-            }
-        }
+        sites = list(vpp.sites.values())
+        if not sites:
+            print(f"VPP has not sites to generate reports")
+            return
+
+        # months already in the cache are reused, the others are built from one pass over the sites
+        reports, missing = {}, []
+        for month, key in months:
+            version = self.report_version(vpp_name, key)
+            cached = self.report_cache.get((vpp_name, month), version)
+            if cached is None:
+                missing.append((month, key, version))
+            else:
+                reports[month] = cached
+        if missing:
+            with self.metrics.stage("aggregate"):
+                rows_by_key = {key: [] for _, key, _ in missing}
+                for s in sites:
+                    for key, rows in rows_by_key.items():
+                        rows.append(self.site_row(s, key))
+            for month, key, version in missing:
+                with self.metrics.timed("create_report_seconds"):
+                    reports[month] = build_report(vpp, month, rows_by_key[key], workers, self.metrics, self.shard_pool)
+                self.report_cache.put((vpp_name, month), version, reports[month])
+
+        report = build_range_report(vpp_name, months[0][0], months[-1][0], [reports[month] for month, _ in months])
         self.last_report = report
         return report
 
+    def export_report(self, vpp_name: str, month_yyyy_mm: str, file_path: str) -> int:
+        """Write the month's report to `file_path` without building it in memory; returns the sites written."""
+        if vpp_name not in self.vpps:
+            raise ValueError(f"VPP '{vpp_name}' not found")
+        key = self.parse_month(month_yyyy_mm)
+        vpp = self.vpps[vpp_name]
+        header, entries = stream_report(vpp, month_yyyy_mm, lambda: (self.site_row(s, key) for s in vpp.sites.values()))
+        with self.metrics.stage("write"):
+            count = write_report(file_path, header, entries)
+        self.last_report = header
+        print(f"Report for VPP '{vpp_name}' for month '{month_yyyy_mm}' written to {file_path} ({count} sites)")
+        return count
+
+    def simulate_pricing(self, vpp_name: str, month_yyyy_mm: str, scenarios: Iterable[Scenario]) -> dict:
+        """Totals of the month under every (revenue_percentage, daily_fee_aud) scenario; the VPP is left unchanged."""
+        if vpp_name not in self.vpps:
+            raise ValueError(f"VPP '{vpp_name}' not found")
+        key = self.parse_month(month_yyyy_mm)
+        rows = [self.site_row(s, key) for s in self.vpps[vpp_name].sites.values()]
+        with self.metrics.stage("simulate"):
+            results = PricingSimulation(rows).run(scenarios)
+        return {"vpp": vpp_name, "month": month_yyyy_mm, "scenarios": results}
+
+    def _build_report(self, vpp: VPP, sites: List[Site], month_yyyy_mm: str, key: int, workers: Optional[int] = None) -> dict:
+        # one row per site: the capacity and the month's sums each site keeps up to date
+        metrics = self.metrics
+        with metrics.stage("aggregate"):
+            rows = [self.site_row(s, key) for s in sites]
+        if metrics.enabled:
+            metrics.inc("reports_total", cached="false")
+            # the events are covered through their monthly sums, none is re-read
+            metrics.inc("report_events_scanned_total", sum(len(s.events.months.get(key, ())) for s in sites))
+            metrics.inc("report_sites_total", len(rows))
+        return build_report(vpp, month_yyyy_mm, rows, workers, metrics, self.shard_pool)
+
+
+    def save_snapshot(self, path: str):
+        write_snapshot(path, self.vpps, self.sites, self.checkpoints.dump())
+        print(f"Saved snapshot of {len(self.vpps)} VPPs and {len(self.sites)} sites to {path}")
+
+    def load_snapshot(self, path: str):
+        # replaces the current state; event columns stay memory-mapped from the file
+        self.vpps, self.sites, checkpoints, self._snapshot_map = read_snapshot(path)
+        self.checkpoints.restore(checkpoints)
+        for site in self.sites.values():
+            site.events.on_change = self._events_changed
+            site.on_capacity_change = self._capacity_changed
+        self.report_cache.clear()
+        print(f"Loaded snapshot of {len(self.vpps)} VPPs and {len(self.sites)} sites from {path}")
 
     def exit(self):
         if self.last_report: